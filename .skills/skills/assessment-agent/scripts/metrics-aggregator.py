@@ -3,7 +3,37 @@
 Metrics Aggregator - Reads quality metrics from JSON input and produces formatted summary reports.
 
 Usage:
-    python metrics-aggregator.py <input.json> [output.md]
+    python metrics-aggregator.py <input.json> [output.md] [--history <path>...] [--window N]
+    python metrics-aggregator.py --batch <manifest|dir|glob>... --output-dir <dir> [--jobs N]
+    python metrics-aggregator.py --sketch <latency files>... [--output sketch.json]
+
+With --history (or a "history" list of earlier snapshots in the input), the
+report adds trend sections: rolling means, deltas against the previous
+snapshot and a week earlier, and regressions of the latest snapshot against
+its rolling window. Snapshots are ordered by "timestamp" or the end date of
+"reporting_period".
+
+Batch mode renders many projects in one run. Inputs are metric JSON files,
+directories (searched recursively for *.json), glob patterns, or manifests:
+text files listing one metrics path per line, relative to the manifest.
+Files are read on a thread pool, reports are rendered on a process pool, and
+besides one <name>.md per project an index.md and index.json portfolio with
+each project's status is written to the output directory.
+
+With --latency, raw latency samples are streamed into a DDSketch and the
+performance section reports p50, p95, p99 and p99.9 against targets (set with
+--latency-target or "latency_targets_ms"). Samples come from CSVs with a
+latency column, access logs ending in the request time, Prometheus histogram
+dumps, or sketches saved by --sketch. Sketches are a few kilobytes whatever
+the sample count and merge exactly, so shards can be sketched on each host
+and combined later; a sketch stored as "latency_sketch" in the input's
+performance metrics is merged in as well.
+
+With --junit, JUnit and xUnit.net XML results (files, directories or globs)
+are parsed on a process pool and replace the input's test counts: passed,
+failed, skipped and duration per suite type, plus the --slowest N tests.
+Files under a path containing "integration" or "it" count as integration
+tests; write TYPE=PATH to choose the suite type explicitly.
 
 Input Format:
     {
@@ -34,23 +64,524 @@ Input Format:
     }
 """
 
+import argparse
+import bisect
+import csv
+import glob
+import heapq
 import json
+import math
+import os
+import re
 import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from itertools import repeat
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional, TextIO, Tuple
+from xml.etree import ElementTree as ET
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; rolling statistics fall back to pure Python
+    np = None
+
+
+# Metrics where a lower value is better; every other numeric metric is
+# treated as higher-is-better.
+LOWER_IS_BETTER = {
+    "complexity", "duplication", "api_response_time_ms", "error_rate_percent",
+    "critical_vulnerabilities", "high_vulnerabilities", "medium_vulnerabilities",
+    "low_vulnerabilities", "unit_tests_failed", "integration_tests_failed",
+    "unit_tests_skipped", "integration_tests_skipped", "unit_tests_duration_s",
+    "integration_tests_duration_s",
+}
+
+# Number of snapshots in the rolling window
+ROLLING_WINDOW = 7
+
+# A snapshot is a regression when it is this many standard deviations worse
+# than the rolling window before it, and worse by at least the relative change.
+REGRESSION_Z_SCORE = 3.0
+REGRESSION_MIN_CHANGE = 0.05
+
+WEEK_SECONDS = 7 * 24 * 3600
+
+# Latency percentiles reported from a sketch, and their default targets in ms
+LATENCY_PERCENTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("p99.9", 0.999))
+LATENCY_TARGETS_MS = {"p50": 200.0, "p95": 500.0, "p99": 1000.0, "p99.9": 2000.0}
+
+# Relative accuracy of latency sketches and the bucket count they are capped at
+SKETCH_ACCURACY = 0.01
+SKETCH_MAX_BUCKETS = 2048
+
+# Samples buffered before they are added to a sketch in one batch
+SKETCH_BATCH_SIZE = 65536
+
+# CSV columns tried, in order, when no latency field is given
+LATENCY_FIELDS = ("latency_ms", "response_time_ms", "duration_ms", "elapsed",
+                  "latency", "response_time", "duration")
+
+# Slowest test cases listed in the testing section
+SLOWEST_TESTS = 10
+
+# JUnit files parsed per worker task; results are merged inside each task so
+# only one summary per batch travels back to the parent process
+JUNIT_FILES_PER_TASK = 64
+
+# Result files whose path matches this are integration suites unless a suite
+# type is given explicitly (TYPE=PATH)
+INTEGRATION_PATTERN = re.compile(r'integration|failsafe|[/_.-]it[/_.-]', re.IGNORECASE)
+
+# Outcomes of xUnit.net <test result="..."> elements (see JUnitResults.add_case)
+XUNIT_RESULTS = {"Pass": 0, "Fail": 1, "Skip": 2}
+
+# Histogram bucket samples in a Prometheus text exposition dump
+PROMETHEUS_BUCKET = re.compile(r'([A-Za-z_:][A-Za-z0-9_:]*)_bucket\{(.*)\}\s+(\S+)')
+PROMETHEUS_LE = re.compile(r',?\s*le="([^"]*)"')
+
+
+class TimeSeries:
+    """Array-backed series of one metric with rolling statistics.
+
+    Rolling mean and standard deviation over the last ``window`` points are
+    kept in arrays alongside the values and updated in O(1) per appended
+    point from running sums. Bulk loading into an empty series computes them
+    with cumulative sums in NumPy when it is installed.
+    """
+
+    def __init__(self, name: str, window: int = ROLLING_WINDOW):
+        self.name = name
+        self.window = window
+        self.times = array('d')
+        self.values = array('d')
+        self.rolling_mean = array('d')
+        self.rolling_std = array('d')
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def append(self, timestamp: float, value: float) -> None:
+        """Add one point, which must not be older than the last one."""
+        if self.times and timestamp < self.times[-1]:
+            raise ValueError(f"Point at {timestamp} is older than the last point of "
+                             f"{self.name} at {self.times[-1]}")
+        self.times.append(timestamp)
+        self.values.append(value)
+        self._sum += value
+        self._sum_sq += value * value
+        if len(self.values) > self.window:
+            dropped = self.values[-self.window - 1]
+            self._sum -= dropped
+            self._sum_sq -= dropped * dropped
+
+        count = min(len(self.values), self.window)
+        mean = self._sum / count
+        self.rolling_mean.append(mean)
+        self.rolling_std.append(math.sqrt(max(self._sum_sq / count - mean * mean, 0.0)))
+
+    def extend(self, times: List[float], values: List[float]) -> None:
+        """Add many points in time order."""
+        if np is None or self.values or len(values) < 2:
+            for timestamp, value in zip(times, values):
+                self.append(timestamp, value)
+            return
+
+        data = np.asarray(values, dtype=np.float64)
+        sums = np.concatenate(([0.0], np.cumsum(data)))
+        sums_sq = np.concatenate(([0.0], np.cumsum(data * data)))
+        end = np.arange(1, len(data) + 1)
+        start = np.maximum(end - self.window, 0)
+        count = end - start
+        mean = (sums[end] - sums[start]) / count
+        std = np.sqrt(np.maximum((sums_sq[end] - sums_sq[start]) / count - mean * mean, 0.0))
+
+        self.times.extend(times)
+        self.values.frombytes(data.tobytes())
+        self.rolling_mean.frombytes(mean.tobytes())
+        self.rolling_std.frombytes(std.tobytes())
+        tail = self.values[-self.window:]
+        self._sum = math.fsum(tail)
+        self._sum_sq = math.fsum(value * value for value in tail)
+
+    def value_before(self, timestamp: float) -> Optional[float]:
+        """Return the last value recorded at or before ``timestamp``."""
+        index = bisect.bisect_right(self.times, timestamp) - 1
+        return self.values[index] if index >= 0 else None
+
+    def regression(self) -> Optional[float]:
+        """Return the z-score of the latest point if it is a regression."""
+        if len(self.values) < 3:
+            return None
+        latest = self.values[-1]
+        # Baseline: the window ending just before the latest point
+        mean = self.rolling_mean[-2]
+        std = self.rolling_std[-2]
+        worse = mean - latest if self.name.split('.')[-1] not in LOWER_IS_BETTER else latest - mean
+        if worse <= abs(mean) * REGRESSION_MIN_CHANGE or worse <= 0:
+            return None
+        if std == 0:
+            return math.inf
+        z_score = worse / std
+        return z_score if z_score >= REGRESSION_Z_SCORE else None
+
+
+def _snapshot_time(snapshot: Dict[str, Any]) -> Optional[float]:
+    """Return a snapshot's time from ``timestamp`` or the end of ``reporting_period``."""
+    text = snapshot.get("timestamp")
+    if text:
+        try:
+            return datetime.fromisoformat(str(text)).timestamp()
+        except ValueError:
+            pass
+    dates = re.findall(r'\d{4}-\d{2}(?:-\d{2})?', str(snapshot.get("reporting_period", "")))
+    if not dates:
+        return None
+    date = dates[-1]
+    return datetime.strptime(date, '%Y-%m-%d' if len(date) == 10 else '%Y-%m').timestamp()
+
+
+def _numeric_metrics(metrics: Dict[str, Any]) -> Dict[str, float]:
+    """Flatten a snapshot's metrics into ``section.metric`` numbers."""
+    flat = {}
+    for section, values in metrics.items():
+        if not isinstance(values, dict):
+            continue
+        for name, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                flat[f"{section}.{name}"] = float(value)
+    return flat
+
+
+class MetricsHistory:
+    """Time series of every numeric metric across a project's snapshots.
+
+    All points share one time base, chosen before the series are built:
+    snapshot dates when every snapshot, ``current`` included, has one and
+    ``current`` is not older than the history, and otherwise the position
+    of each snapshot in the given order. ``current`` is always the latest
+    point.
+    """
+
+    def __init__(self, snapshots: List[Dict[str, Any]], window: int = ROLLING_WINDOW,
+                 current: Optional[Dict[str, Any]] = None):
+        self.window = window
+        self.series: Dict[str, TimeSeries] = {}
+
+        snapshots = list(snapshots) + ([current] if current is not None else [])
+        times = [_snapshot_time(snapshot) for snapshot in snapshots]
+        self.dated = None not in times
+        if self.dated and current is not None and times[:-1] and times[-1] < max(times[:-1]):
+            self.dated = False
+        if not self.dated:
+            times = [float(index) for index in range(len(snapshots))]
+        ordered = sorted(zip(times[:len(times) - (current is not None)], range(len(snapshots))))
+        if current is not None:
+            ordered.append((times[-1], len(snapshots) - 1))
+        self.num_snapshots = len(ordered)
+
+        points: Dict[str, Tuple[List[float], List[float]]] = {}
+        for timestamp, index in ordered:
+            for name, value in _numeric_metrics(snapshots[index].get("metrics", {})).items():
+                series_times, series_values = points.setdefault(name, ([], []))
+                series_times.append(timestamp)
+                series_values.append(value)
+        for name, (series_times, series_values) in points.items():
+            self.series[name] = TimeSeries(name, window)
+            self.series[name].extend(series_times, series_values)
+
+    def add_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """Append a newer snapshot, updating every series incrementally.
+
+        Raises ValueError if the snapshot does not fit the time base of the
+        history: an undated snapshot after dated ones, or an older date.
+        """
+        if self.dated:
+            timestamp = _snapshot_time(snapshot)
+            if timestamp is None:
+                raise ValueError("Snapshot has no timestamp or reporting_period date, "
+                                 "but the history is dated")
+        else:
+            timestamp = float(self.num_snapshots)
+        values = _numeric_metrics(snapshot.get("metrics", {}))
+        for name in values:
+            series = self.series.get(name)
+            if series is not None and series.times and timestamp < series.times[-1]:
+                raise ValueError("Snapshot is older than the latest snapshot in the history")
+        self.num_snapshots += 1
+        for name, value in values.items():
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = TimeSeries(name, self.window)
+            series.append(timestamp, value)
+
+    def trends(self) -> List[Dict[str, Any]]:
+        """Latest value, rolling mean and deltas of every metric with history."""
+        rows = []
+        for name, series in sorted(self.series.items()):
+            if len(series) < 2:
+                continue
+            latest = series.values[-1]
+            week_ago = series.value_before(series.times[-1] - WEEK_SECONDS)
+            rows.append({
+                "metric": name,
+                "latest": latest,
+                "rolling_mean": series.rolling_mean[-1],
+                "baseline_mean": series.rolling_mean[-2],
+                "delta_previous": latest - series.values[-2],
+                "delta_week": None if week_ago is None else latest - week_ago,
+                "z_score": series.regression(),
+            })
+        return rows
+
+
+class DDSketch:
+    """Mergeable quantile sketch with relative accuracy guarantees.
+
+    Each positive sample is counted in the logarithmic bucket
+    ``ceil(log_gamma(value))``, so every quantile is returned within
+    ``relative_accuracy`` of the true sample value. Memory depends on the
+    range of the samples rather than their number: at 1% accuracy, 1 µs to an
+    hour fits in about 1,100 buckets. Sketches of the same accuracy merge by
+    adding bucket counts, so shards can be combined without their samples.
+    Beyond ``max_buckets`` the lowest buckets are collapsed into one, keeping
+    the upper quantiles exact to the accuracy.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_ACCURACY,
+                 max_buckets: int = SKETCH_MAX_BUCKETS):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Add ``count`` occurrences of ``value``."""
+        if value > 0:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        else:
+            self.zero_count += count
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def add_many(self, values: List[float]) -> None:
+        """Add a batch of samples, bucketing them with NumPy when it is installed."""
+        if not values:
+            return
+        if np is None:
+            buckets = self.buckets
+            log_gamma = self._log_gamma
+            zero_count = 0
+            for value in values:
+                if value > 0:
+                    index = math.ceil(math.log(value) / log_gamma)
+                    buckets[index] = buckets.get(index, 0) + 1
+                else:
+                    zero_count += 1
+            self.zero_count += zero_count
+            self.count += len(values)
+            self.sum += math.fsum(values)
+            self.min = min(self.min, min(values))
+            self.max = max(self.max, max(values))
+        else:
+            data = np.asarray(values, dtype=np.float64)
+            positive = data[data > 0]
+            indexes, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma),
+                                        return_counts=True)
+            buckets = self.buckets
+            for index, count in zip(indexes.astype(np.int64).tolist(), counts.tolist()):
+                buckets[index] = buckets.get(index, 0) + count
+            self.zero_count += len(data) - len(positive)
+            self.count += len(data)
+            self.sum += float(data.sum())
+            self.min = min(self.min, float(data.min()))
+            self.max = max(self.max, float(data.max()))
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def merge(self, other: 'DDSketch') -> None:
+        """Add the samples counted by another sketch of the same accuracy."""
+        if not math.isclose(other.relative_accuracy, self.relative_accuracy):
+            raise ValueError(f"Cannot merge sketches of relative accuracy "
+                             f"{other.relative_accuracy} and {self.relative_accuracy}")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        """Fold the lowest buckets into one to stay within max_buckets."""
+        indexes = sorted(self.buckets)
+        excess = len(indexes) - self.max_buckets + 1
+        folded = sum(self.buckets.pop(index) for index in indexes[:excess])
+        target = indexes[excess]
+        self.buckets[target] += folded
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the ``q`` quantile (0 <= q <= 1), or None for an empty sketch."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return min(max(0.0, self.min), self.max)
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the sketch to JSON-compatible data."""
+        indexes = sorted(self.buckets)
+        return {
+            "type": "ddsketch",
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "zero_count": self.zero_count,
+            "indexes": indexes,
+            "counts": [self.buckets[index] for index in indexes],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'DDSketch':
+        """Rebuild a sketch serialized by to_dict()."""
+        sketch = cls(data.get("relative_accuracy", SKETCH_ACCURACY))
+        sketch.buckets = dict(zip(data.get("indexes", []), data.get("counts", [])))
+        sketch.zero_count = data.get("zero_count", 0)
+        sketch.count = data.get("count", 0)
+        sketch.sum = data.get("sum", 0.0)
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
+
+
+class JUnitResults:
+    """Pass, fail, skip and duration totals per suite type, with the slowest tests.
+
+    Only the ``limit`` slowest test cases are kept, in a min-heap, so results
+    of any number of files merge in bounded memory.
+    """
+
+    def __init__(self, limit: int = SLOWEST_TESTS):
+        self.limit = limit
+        # Suite type -> [passed, failed, skipped, duration in seconds]
+        self.suites: Dict[str, List[float]] = {}
+        self.slowest: List[Tuple[float, str, str]] = []
+        self.files = 0
+
+    def add_case(self, suite_type: str, status: int, duration: float, name: str) -> None:
+        """Count one test case; ``status`` is 0 passed, 1 failed or 2 skipped."""
+        totals = self.suites.get(suite_type)
+        if totals is None:
+            totals = self.suites[suite_type] = [0, 0, 0, 0.0]
+        totals[status] += 1
+        totals[3] += duration
+        self._push(duration, name, suite_type)
+
+    def _push(self, duration: float, name: str, suite_type: str) -> None:
+        """Offer a test case to the heap of slowest tests."""
+        if len(self.slowest) < self.limit:
+            heapq.heappush(self.slowest, (duration, name, suite_type))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, name, suite_type))
+
+    def merge(self, other: 'JUnitResults') -> None:
+        """Add the results of another set of files."""
+        for suite_type, other_totals in other.suites.items():
+            totals = self.suites.setdefault(suite_type, [0, 0, 0, 0.0])
+            for index, value in enumerate(other_totals):
+                totals[index] += value
+        for duration, name, suite_type in other.slowest:
+            self._push(duration, name, suite_type)
+        self.files += other.files
+
+    def slowest_tests(self) -> List[Tuple[float, str, str]]:
+        """Return (duration, test, suite type) of the slowest tests, slowest first."""
+        return sorted(self.slowest, reverse=True)
+
+    def testing_metrics(self) -> Dict[str, float]:
+        """Return the totals as ``<type>_tests_*`` testing metrics."""
+        metrics: Dict[str, float] = {}
+        for suite_type, (passed, failed, skipped, duration) in self.suites.items():
+            metrics[f"{suite_type}_tests_passed"] = passed
+            metrics[f"{suite_type}_tests_failed"] = failed
+            metrics[f"{suite_type}_tests_skipped"] = skipped
+            metrics[f"{suite_type}_tests_duration_s"] = round(duration, 3)
+        return metrics
 
 
 class MetricsAggregator:
     """Aggregates metrics and generates formatted reports."""
 
-    def __init__(self, metrics_data: Dict[str, Any]):
-        """Initialize with metrics data."""
+    def __init__(self, metrics_data: Dict[str, Any],
+                 history: Optional[List[Dict[str, Any]]] = None,
+                 window: int = ROLLING_WINDOW,
+                 latency: Optional[DDSketch] = None,
+                 latency_targets: Optional[Dict[str, float]] = None,
+                 junit: Optional[JUnitResults] = None):
+        """Initialize with metrics data.
+
+        Earlier snapshots come from ``history`` or the input's own "history"
+        list; with at least one, the report gains trend sections. Latency
+        percentiles come from the ``latency`` sketch merged with any sketch
+        stored under performance.latency_sketch. ``junit`` results replace the
+        input's test counts.
+        """
         self.data = metrics_data
         self.project = metrics_data.get("project", "Unknown")
         self.period = metrics_data.get("reporting_period", "Unknown")
         self.metrics = metrics_data.get("metrics", {})
 
+        self.junit = junit
+        if junit is not None:
+            # Suite types missing from the results are not carried over
+            self.metrics = dict(self.metrics, testing=junit.testing_metrics())
+
+        perf = self.metrics.get("performance", {})
+        self.latency = None
+        if perf.get("latency_sketch"):
+            self.latency = DDSketch.from_dict(perf["latency_sketch"])
+        if latency is not None:
+            if self.latency is None:
+                self.latency = DDSketch(latency.relative_accuracy, latency.max_buckets)
+            self.latency.merge(latency)
+        self.latency_targets = dict(LATENCY_TARGETS_MS)
+        self.latency_targets.update(perf.get("latency_targets_ms", {}))
+        self.latency_targets.update(latency_targets or {})
+
+        snapshots = list(history if history is not None else metrics_data.get("history", []))
+        self.history = None
+        if snapshots:
+            self.history = MetricsHistory(snapshots, window,
+                                          current=dict(metrics_data, metrics=self.metrics))
+
     def generate_summary(self) -> str:
         """Generate a markdown formatted summary report."""
         report = []
@@ -68,13 +599,18 @@ class MetricsAggregator:
             report.append(self._format_testing())
 
         # Performance Section
-        if "performance" in self.metrics:
+        if "performance" in self.metrics or self.latency is not None:
             report.append(self._format_performance())
 
         # Security Section
         if "security" in self.metrics:
             report.append(self._format_security())
 
+        # Trend Sections
+        if self.history is not None:
+            report.append(self._format_trends())
+            report.append(self._format_regressions())
+
         # Summary & Recommendations
         report.append(self._format_summary())
 
@@ -128,12 +664,34 @@ class MetricsAggregator:
         section.append(f"| Integration Tests | {integration_passed} | {integration_failed} | {integration_rate:.1f}% |")
         section.append("")
 
+        if self.junit is not None:
+            section.append(self._format_junit())
+
+        return "\n".join(section)
+
+    def _format_junit(self) -> str:
+        """Format per-suite-type totals and the slowest tests from JUnit results."""
+        section = [f"### Test Suites ({self.junit.files} result files)\n"]
+        section.append("| Suite Type | Passed | Failed | Skipped | Duration (s) |")
+        section.append("|------------|--------|--------|---------|--------------|")
+        for suite_type, (passed, failed, skipped, duration) in sorted(self.junit.suites.items()):
+            section.append(f"| {suite_type} | {passed} | {failed} | {skipped} | {duration:.1f} |")
+        section.append("")
+
+        slowest = self.junit.slowest_tests()
+        if slowest:
+            section.append("### Slowest Tests\n")
+            section.append("| Test | Suite Type | Duration (s) |")
+            section.append("|------|------------|--------------|")
+            for duration, name, suite_type in slowest:
+                section.append(f"| {name} | {suite_type} | {duration:.2f} |")
+            section.append("")
         return "\n".join(section)
 
     def _format_performance(self) -> str:
         """Format performance metrics section."""
         section = ["## Performance Metrics\n"]
-        perf = self.metrics["performance"]
+        perf = self.metrics.get("performance", {})
 
         section.append("| Metric | Value | Target | Status |")
         section.append("|--------|-------|--------|--------|")
@@ -150,9 +708,26 @@ class MetricsAggregator:
             status = self._get_status(error_rate, 0.1, inverse=True)
             section.append(f"| Error Rate (%) | {error_rate}% | <0.1% | {status} |")
 
+        # Latency percentiles
+        percentiles = self.latency_percentiles()
+        for label, value, target in percentiles:
+            status = self._get_status(value, target, inverse=True)
+            section.append(f"| {label} Latency (ms) | {value:.1f}ms | <{target:g}ms | {status} |")
+
         section.append("")
+        if percentiles:
+            section.append(f"Latency percentiles from {self.latency.count:,} samples, "
+                           f"accurate to ±{self.latency.relative_accuracy * 100:g}%.")
+            section.append("")
         return "\n".join(section)
 
+    def latency_percentiles(self) -> List[Tuple[str, float, float]]:
+        """Return (label, value in ms, target in ms) for each reported percentile."""
+        if self.latency is None or self.latency.count == 0:
+            return []
+        return [(label, self.latency.quantile(q), self.latency_targets[label])
+                for label, q in LATENCY_PERCENTILES]
+
     def _format_security(self) -> str:
         """Format security metrics section."""
         section = ["## Security Metrics\n"]
@@ -178,10 +753,54 @@ class MetricsAggregator:
         section.append("")
         return "\n".join(section)
 
+    def _format_trends(self) -> str:
+        """Format rolling statistics and deltas of each metric."""
+        section = ["## Trends\n"]
+        section.append(f"Across {self.history.num_snapshots} snapshots; rolling mean over the "
+                       f"last {self.history.window}.\n")
+
+        section.append("| Metric | Latest | Rolling Mean | Δ Previous | Δ 7 Days |")
+        section.append("|--------|--------|--------------|------------|----------|")
+        for row in self.history.trends():
+            delta_week = "n/a" if row["delta_week"] is None else f"{row['delta_week']:+g}"
+            section.append(f"| {row['metric']} | {row['latest']:g} | {row['rolling_mean']:.2f} | "
+                           f"{row['delta_previous']:+g} | {delta_week} |")
+
+        section.append("")
+        return "\n".join(section)
+
+    def _format_regressions(self) -> str:
+        """Format metrics whose latest snapshot is a regression."""
+        section = ["## Regressions\n"]
+        regressions = [row for row in self.history.trends() if row["z_score"] is not None]
+        if not regressions:
+            section.append("No metric regressed against its rolling window.")
+        for row in regressions:
+            z_score = "flat baseline" if math.isinf(row["z_score"]) else f"z = {row['z_score']:.1f}"
+            section.append(f"- 🔴 {row['metric']}: {row['latest']:g} vs rolling mean "
+                           f"{row['baseline_mean']:.2f} before it ({z_score})")
+
+        section.append("")
+        return "\n".join(section)
+
     def _format_summary(self) -> str:
         """Format summary and recommendations."""
         section = ["## Summary & Recommendations\n"]
 
+        recommendations = self._recommendations()
+        if recommendations:
+            section.append("### Action Items\n")
+            for rec in recommendations:
+                section.append(rec)
+        else:
+            section.append("### Status\n")
+            section.append("All key metrics are within acceptable ranges. Continue monitoring trends.")
+
+        section.append("")
+        return "\n".join(section)
+
+    def _recommendations(self) -> List[str]:
+        """List the action items for metrics outside their targets."""
         recommendations = []
 
         # Check code quality
@@ -203,6 +822,10 @@ class MetricsAggregator:
         perf = self.metrics.get("performance", {})
         if perf.get("error_rate_percent", 0) > 0.1:
             recommendations.append("- Investigate elevated error rate in production")
+        slow = [f"{label} {value:.0f}ms > {target:g}ms"
+                for label, value, target in self.latency_percentiles() if value > target]
+        if slow:
+            recommendations.append(f"- Reduce latency above target: {', '.join(slow)}")
 
         # Check security
         sec = self.metrics.get("security", {})
@@ -211,16 +834,46 @@ class MetricsAggregator:
         if sec.get("high_vulnerabilities", 0) > 0:
             recommendations.append("- Priority: Remediate high-severity vulnerabilities")
 
-        if recommendations:
-            section.append("### Action Items\n")
-            for rec in recommendations:
-                section.append(rec)
+        return recommendations
+
+    def get_status(self) -> Dict[str, Any]:
+        """Summarize the project's health for a portfolio index.
+
+        The overall status is the worst indicator shown in the report's
+        tables: red, yellow or green.
+        """
+        indicators = []
+        cq = self.metrics.get("code_quality")
+        if cq is not None:
+            indicators.append(self._get_status(cq.get("coverage", 0), 80))
+            indicators.append(self._get_status(cq.get("complexity", 0), 10, inverse=True))
+            indicators.append(self._get_status(cq.get("duplication", 0), 5, inverse=True))
+        perf = self.metrics.get("performance", {})
+        if "api_response_time_ms" in perf:
+            indicators.append(self._get_status(perf["api_response_time_ms"], 200, inverse=True))
+        if "error_rate_percent" in perf:
+            indicators.append(self._get_status(perf["error_rate_percent"], 0.1, inverse=True))
+        for _, value, target in self.latency_percentiles():
+            indicators.append(self._get_status(value, target, inverse=True))
+        sec = self.metrics.get("security")
+        if sec is not None:
+            indicators.append("🔴" if sec.get("critical_vulnerabilities", 0) > 0 else "🟢")
+            indicators.append("🟡" if sec.get("high_vulnerabilities", 0) > 5 else "🟢")
+
+        if "🔴" in indicators:
+            status = "red"
+        elif "🟡" in indicators:
+            status = "yellow"
         else:
-            section.append("### Status\n")
-            section.append("All key metrics are within acceptable ranges. Continue monitoring trends.")
+            status = "green"
 
-        section.append("")
-        return "\n".join(section)
+        return {
+            "project": self.project,
+            "period": self.period,
+            "status": status,
+            "coverage": self.metrics.get("code_quality", {}).get("coverage"),
+            "action_items": len(self._recommendations()),
+        }
 
     @staticmethod
     def _get_status(value: float, target: float, inverse: bool = False) -> str:
@@ -275,24 +928,592 @@ def save_report(report: str, filepath: Optional[str] = None) -> None:
         print(report)
 
 
+def expand_metric_inputs(inputs: Iterable[str],
+                         exclude_dir: Optional[Path] = None) -> List[Path]:
+    """Expand metric files, directories, glob patterns and manifests into paths.
+
+    A manifest is any input that is not JSON: a text file listing one metrics
+    path (or glob) per line, relative to the manifest, with # comments.
+    Files inside ``exclude_dir`` (batch mode's own output) are skipped.
+    """
+    paths: List[Path] = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.extend(sorted(path.rglob('*.json')))
+        elif any(char in item for char in '*?['):
+            paths.extend(Path(match) for match in sorted(glob.glob(item, recursive=True)))
+        elif path.suffix.lower() == '.json' or not path.is_file():
+            paths.append(path)
+        else:
+            with open(path, 'r') as f:
+                lines = [line.split('#', 1)[0].strip() for line in f]
+            paths.extend(expand_metric_inputs((str(path.parent / line) for line in lines if line),
+                                              exclude_dir))
+
+    excluded = os.path.join(os.path.abspath(exclude_dir), '') if exclude_dir else None
+    # Keep the first occurrence of each file
+    seen = set()
+    unique = []
+    for path in paths:
+        key = os.path.abspath(path)
+        if excluded is not None and key.startswith(excluded):
+            continue
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def read_metrics(filepath: Path) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Load one metrics file for batch mode, returning (data, error)."""
+    try:
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None, f"File not found: {filepath}"
+    except json.JSONDecodeError:
+        return None, f"Invalid JSON in file: {filepath}"
+    except OSError as e:
+        return None, f"Cannot read {filepath}: {e}"
+    if not isinstance(data, dict):
+        return None, f"Expected a JSON object in file: {filepath}"
+    return data, None
+
+
+def expand_latency_inputs(inputs: Iterable[str]) -> List[Path]:
+    """Expand latency files, directories and glob patterns into file paths."""
+    paths: List[Path] = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.extend(sorted(child for child in path.rglob('*') if child.is_file()))
+        elif any(char in item for char in '*?['):
+            paths.extend(Path(match) for match in sorted(glob.glob(item, recursive=True)))
+        else:
+            paths.append(path)
+    return list(dict.fromkeys(paths))
+
+
+def _iter_csv_latencies(f: TextIO, delimiter: str, field: Optional[str],
+                        scale: float) -> Iterator[float]:
+    """Yield the latency column of a CSV file with a header row."""
+    reader = csv.reader(f, delimiter=delimiter)
+    header = [name.strip() for name in next(reader, [])]
+    candidates = [field] if field else LATENCY_FIELDS
+    column = next((header.index(name) for name in candidates if name in header), None)
+    if column is None:
+        raise ValueError(f"no latency column ({', '.join(candidates)}) in the header")
+    for row in reader:
+        try:
+            yield float(row[column]) * scale
+        except (IndexError, ValueError):
+            continue
+
+
+def _iter_log_latencies(f: TextIO, scale: float) -> Iterator[float]:
+    """Yield the last field of every line that is a number, such as an access
+    log whose format ends in the request time, or one sample per line."""
+    for line in f:
+        fields = line.rsplit(None, 1)
+        if fields:
+            try:
+                yield float(fields[-1]) * scale
+            except ValueError:
+                continue
+
+
+def _iter_prometheus_buckets(f: TextIO, metric: Optional[str],
+                             scale: float) -> Iterator[Tuple[float, int]]:
+    """Yield (upper bound, count) for every bucket of the latency histograms
+    in a Prometheus text exposition dump.
+
+    Histograms named ``metric``, or by default any with "latency" or
+    "duration" in their name, are read; cumulative counts are differenced per
+    series. Samples are placed at their bucket's upper bound, and ``_seconds``
+    histograms are converted to milliseconds.
+    """
+    series: Dict[Tuple[str, str], List[Tuple[float, float]]] = {}
+    for line in f:
+        match = PROMETHEUS_BUCKET.match(line)
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        wanted = name == metric if metric else re.search('latency|duration', name)
+        if not wanted:
+            continue
+        bound = PROMETHEUS_LE.search(labels)
+        if bound is None:
+            continue
+        key = (name, PROMETHEUS_LE.sub('', labels, count=1))
+        series.setdefault(key, []).append((float(bound.group(1)), float(value)))
+
+    for (name, _), buckets in series.items():
+        unit = 1000.0 if name.endswith('_seconds') else scale
+        previous = 0.0
+        upper = 0.0
+        for bound, cumulative in sorted(buckets):
+            if not math.isinf(bound):
+                upper = bound
+            count = int(cumulative - previous)
+            previous = cumulative
+            if count > 0:
+                yield upper * unit, count
+
+
+def sketch_latency_file(path: Path, field: Optional[str] = None, scale: float = 1.0,
+                        relative_accuracy: float = SKETCH_ACCURACY
+                        ) -> Tuple[Optional[DDSketch], Optional[str]]:
+    """Stream one latency file into a sketch, returning (sketch, error).
+
+    ``.json`` files are sketches saved by ``--sketch``; ``.csv``/``.tsv``
+    files are read by column, Prometheus dumps by histogram, and anything
+    else as log lines. Samples are multiplied by ``scale`` to get ms.
+    """
+    sketch = DDSketch(relative_accuracy)
+    suffix = path.suffix.lower()
+    try:
+        with open(path, 'r', newline='') as f:
+            if suffix == '.json':
+                return DDSketch.from_dict(json.load(f)), None
+
+            first_line = f.readline()
+            f.seek(0)
+            if suffix == '.prom' or first_line.startswith(('# HELP', '# TYPE')):
+                for value, count in _iter_prometheus_buckets(f, field, scale):
+                    sketch.add(value, count)
+                return sketch, None
+
+            if suffix in ('.csv', '.tsv'):
+                samples = _iter_csv_latencies(f, '\t' if suffix == '.tsv' else ',', field, scale)
+            else:
+                samples = _iter_log_latencies(f, scale)
+            batch: List[float] = []
+            for value in samples:
+                batch.append(value)
+                if len(batch) >= SKETCH_BATCH_SIZE:
+                    sketch.add_many(batch)
+                    batch = []
+            sketch.add_many(batch)
+    except FileNotFoundError:
+        return None, f"File not found: {path}"
+    except (OSError, ValueError, KeyError) as e:
+        return None, f"Cannot read latencies from {path}: {e}"
+    return sketch, None
+
+
+def build_latency_sketch(inputs: List[str], field: Optional[str] = None, scale: float = 1.0,
+                         jobs: Optional[int] = None,
+                         relative_accuracy: float = SKETCH_ACCURACY
+                         ) -> Tuple[DDSketch, List[str]]:
+    """Merge the sketches of every latency input, returning (sketch, errors).
+
+    Files are sketched on a process pool; only the sketches travel back.
+    """
+    merged = DDSketch(relative_accuracy)
+    paths = expand_latency_inputs(inputs)
+    if not paths:
+        return merged, [f"No latency files found in: {', '.join(inputs)}"]
+
+    jobs = jobs or os.cpu_count() or 1
+    args = (paths, repeat(field), repeat(scale), repeat(relative_accuracy))
+    if jobs == 1 or len(paths) <= 1:
+        results = list(map(sketch_latency_file, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as processes:
+            results = list(processes.map(sketch_latency_file, *args))
+
+    errors = []
+    for sketch, error in results:
+        if error is not None:
+            errors.append(error)
+            continue
+        try:
+            merged.merge(sketch)
+        except ValueError as e:
+            errors.append(str(e))
+    return merged, errors
+
+
+def parse_latency_target(text: str) -> Tuple[str, float]:
+    """Parse a PERCENTILE=MS latency target such as 'p99=800'."""
+    label, _, value = text.partition('=')
+    if label not in LATENCY_TARGETS_MS:
+        raise argparse.ArgumentTypeError(
+            f"expected one of {', '.join(LATENCY_TARGETS_MS)}=MS, got '{text}'")
+    try:
+        return label, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid latency target '{text}'")
+
+
+def expand_junit_inputs(inputs: Iterable[str]) -> List[Tuple[Path, Optional[str]]]:
+    """Expand JUnit result files, directories and globs into (path, suite type).
+
+    An input written as TYPE=PATH assigns its files to suite type TYPE;
+    otherwise the type is guessed from each file's path.
+    """
+    files: List[Tuple[Path, Optional[str]]] = []
+    for item in inputs:
+        suite_type = None
+        match = re.match(r'([A-Za-z][\w-]*)=(.+)$', item)
+        if match and not Path(item).exists():
+            suite_type, item = match.groups()
+        path = Path(item)
+        if path.is_dir():
+            found = sorted(path.rglob('*.xml'))
+        elif any(char in item for char in '*?['):
+            found = [Path(match) for match in sorted(glob.glob(item, recursive=True))]
+        else:
+            found = [path]
+        files.extend((found_path, suite_type) for found_path in found)
+    return list(dict.fromkeys(files))
+
+
+def _junit_suite_type(path: Path) -> str:
+    """Guess the suite type of a result file from its path."""
+    return "integration" if INTEGRATION_PATTERN.search(str(path)) else "unit"
+
+
+def _junit_seconds(text: str) -> float:
+    """Parse a ``time`` attribute, accepting a decimal comma such as ``0,5``.
+
+    A single comma without a dot is a decimal separator; otherwise commas
+    are thousands separators (``1,234.5``).
+    """
+    text = text.strip()
+    if text.count(',') == 1 and '.' not in text:
+        text = text.replace(',', '.')
+    else:
+        text = text.replace(',', '')
+    return float(text or 0)
+
+
+def _read_junit_file(path: Path, suite_type: str, results: JUnitResults) -> None:
+    """Count the test cases of a JUnit or xUnit.net XML file.
+
+    The file is parsed incrementally and every element is detached from the
+    tree once it closes, test cases once counted, so memory stays flat
+    however large the file and its captured output are.
+    """
+    # Stack of currently open elements; the parent of a closing element is
+    # always stack[-1] once the element itself has been popped.
+    stack: List[ET.Element] = []
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        stack.pop()
+        # The children of a test case are looked at when it closes
+        if stack and stack[-1].tag not in ('testcase', 'test'):
+            stack[-1].remove(elem)
+
+        if elem.tag == 'testcase':
+            status = 0
+            for child in elem:
+                if child.tag in ('failure', 'error'):
+                    status = 1
+                    break
+                if child.tag == 'skipped':
+                    status = 2
+            classname = elem.get('classname')
+            name = elem.get('name', '')
+        elif elem.tag == 'test' and elem.get('result') in XUNIT_RESULTS:
+            status = XUNIT_RESULTS[elem.get('result')]
+            classname = None
+            name = elem.get('name', '')
+        else:
+            elem.clear()
+            continue
+        duration = _junit_seconds(elem.get('time', ''))
+        results.add_case(suite_type, status, duration,
+                         f"{classname}.{name}" if classname else name)
+        elem.clear()
+
+
+def parse_junit_files(files: List[Tuple[Path, Optional[str]]], limit: int = SLOWEST_TESTS
+                      ) -> Tuple[JUnitResults, List[str]]:
+    """Parse a batch of JUnit files into one result; runs in a worker process."""
+    results = JUnitResults(limit)
+    errors = []
+    for path, suite_type in files:
+        file_results = JUnitResults(limit)
+        try:
+            _read_junit_file(path, suite_type or _junit_suite_type(path), file_results)
+        except FileNotFoundError:
+            errors.append(f"File not found: {path}")
+            continue
+        except (ET.ParseError, OSError, ValueError) as e:
+            errors.append(f"Invalid JUnit XML in {path}: {e}")
+            continue
+        file_results.files = 1
+        results.merge(file_results)
+    return results, errors
+
+
+def build_junit_results(inputs: List[str], limit: int = SLOWEST_TESTS,
+                        jobs: Optional[int] = None) -> Tuple[JUnitResults, List[str]]:
+    """Parse every JUnit input on a process pool, returning (results, errors).
+
+    Files are handed out in batches of JUNIT_FILES_PER_TASK and each batch is
+    reduced in its worker, so tens of thousands of small files cost a few
+    hundred round trips.
+    """
+    merged = JUnitResults(limit)
+    files = expand_junit_inputs(inputs)
+    if not files:
+        return merged, [f"No JUnit results found in: {', '.join(inputs)}"]
+
+    batches = [files[start:start + JUNIT_FILES_PER_TASK]
+               for start in range(0, len(files), JUNIT_FILES_PER_TASK)]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(batches) <= 1:
+        results = list(map(parse_junit_files, batches, repeat(limit)))
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(batches))) as processes:
+            results = list(processes.map(parse_junit_files, batches, repeat(limit)))
+
+    errors = []
+    for batch_results, batch_errors in results:
+        merged.merge(batch_results)
+        errors.extend(batch_errors)
+    return merged, errors
+
+
+def render_project(metrics_data: Dict[str, Any]
+                   ) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    """Render one project's report and status; runs in a worker process.
+
+    Returns (report, status, error); a malformed project yields an error
+    instead of failing the whole batch.
+    """
+    try:
+        aggregator = MetricsAggregator(metrics_data)
+        return aggregator.generate_summary(), aggregator.get_status(), None
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        return None, None, f"{type(e).__name__}: {e}"
+
+
+def _report_names(paths: List[Path]) -> List[str]:
+    """Give each input a unique report file name based on its file name."""
+    names = []
+    used = set()
+    for path in paths:
+        base = re.sub(r'[^A-Za-z0-9._-]+', '-', path.stem) or 'project'
+        name = base
+        suffix = 2
+        while name.lower() in used:
+            name = f"{base}-{suffix}"
+            suffix += 1
+        used.add(name.lower())
+        names.append(name)
+    return names
+
+
+def format_portfolio_index(statuses: List[Dict[str, Any]], errors: List[str]) -> str:
+    """Format the portfolio index linking every project report."""
+    icons = {"red": "🔴", "yellow": "🟡", "green": "🟢"}
+    counts = {status: sum(1 for entry in statuses if entry["status"] == status)
+              for status in icons}
+
+    index = ["# Quality Metrics Portfolio\n"]
+    index.append(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    index.append(f"**Projects:** {len(statuses)} "
+                 f"(🔴 {counts['red']} · 🟡 {counts['yellow']} · 🟢 {counts['green']})\n")
+
+    index.append("| Project | Period | Status | Coverage | Action Items | Report |")
+    index.append("|---------|--------|--------|----------|--------------|--------|")
+    order = {"red": 0, "yellow": 1, "green": 2}
+    for entry in sorted(statuses, key=lambda e: (order[e["status"]], str(e["project"]))):
+        coverage = "n/a" if entry["coverage"] is None else f"{entry['coverage']}%"
+        index.append(f"| {entry['project']} | {entry['period']} | {icons[entry['status']]} | "
+                     f"{coverage} | {entry['action_items']} | [{entry['report']}]({entry['report']}) |")
+    index.append("")
+
+    if errors:
+        index.append("## Errors\n")
+        for error in errors:
+            index.append(f"- {error}")
+        index.append("")
+
+    return "\n".join(index)
+
+
+def run_batch(inputs: List[str], output_dir: str, jobs: Optional[int] = None) -> int:
+    """Render every project in ``inputs`` into ``output_dir``; return the exit code."""
+    out = Path(output_dir)
+    paths = expand_metric_inputs(inputs, exclude_dir=out)
+    if not paths:
+        print(f"Error: No metrics files found in: {', '.join(inputs)}")
+        return 1
+
+    jobs = jobs or os.cpu_count() or 1
+    out.mkdir(parents=True, exist_ok=True)
+
+    # Reading is I/O bound, rendering CPU bound: threads for one, processes for the other
+    with ThreadPoolExecutor(max_workers=min(32, len(paths))) as threads:
+        loaded = list(threads.map(read_metrics, paths))
+
+    errors = [error for _, error in loaded if error is not None]
+    projects = [(path, name, data) for path, name, (data, _)
+                in zip(paths, _report_names(paths), loaded) if data is not None]
+
+    datasets = [data for _, _, data in projects]
+    if jobs == 1 or len(datasets) <= 1:
+        rendered = list(map(render_project, datasets))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as processes:
+            chunksize = max(1, len(datasets) // (jobs * 4))
+            rendered = list(processes.map(render_project, datasets, chunksize=chunksize))
+
+    statuses = []
+    writes = []
+    for (path, name, _), (report, status, error) in zip(projects, rendered):
+        if error is not None:
+            errors.append(f"Cannot render {path}: {error}")
+            continue
+        status.update(report=f"{name}.md", source=str(path))
+        statuses.append(status)
+        writes.append((out / f"{name}.md", report))
+    writes.append((out / "index.md", format_portfolio_index(statuses, errors)))
+    writes.append((out / "index.json",
+                   json.dumps({"projects": statuses, "errors": errors}, indent=2)))
+
+    with ThreadPoolExecutor(max_workers=min(32, len(writes))) as threads:
+        list(threads.map(lambda item: item[0].write_text(item[1]), writes))
+
+    for error in errors:
+        print(f"Error: {error}")
+    print(f"Rendered {len(statuses)} report(s) to: {out}")
+    return 1 if errors else 0
+
+
+def batch_main(argv: List[str]) -> None:
+    """Entry point of batch mode."""
+    parser = argparse.ArgumentParser(
+        prog='metrics-aggregator.py --batch',
+        description='Render quality metrics reports for many projects in one run'
+    )
+    parser.add_argument('inputs', nargs='+',
+                        help='Metrics JSON files, directories, glob patterns or manifests')
+    parser.add_argument('--output-dir', required=True,
+                        help='Directory for the per-project reports and the portfolio index')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Number of rendering processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+    sys.exit(run_batch(args.inputs, args.output_dir, args.jobs))
+
+
+def sketch_main(argv: List[str]) -> None:
+    """Entry point of sketch mode."""
+    parser = argparse.ArgumentParser(
+        prog='metrics-aggregator.py --sketch',
+        description='Build a mergeable latency sketch from raw latency samples'
+    )
+    parser.add_argument('inputs', nargs='+',
+                        help='Latency CSVs, logs, Prometheus dumps or sketches; '
+                             'directories and globs are expanded')
+    parser.add_argument('--output', default=None,
+                        help='Sketch JSON to write (default: stdout)')
+    parser.add_argument('--latency-field', default=None, metavar='NAME',
+                        help='CSV column or Prometheus histogram holding the latencies')
+    parser.add_argument('--latency-scale', type=float, default=1.0, metavar='FACTOR',
+                        help='Multiply samples by FACTOR to get milliseconds (default: 1)')
+    parser.add_argument('--accuracy', type=float, default=SKETCH_ACCURACY,
+                        help=f'Relative accuracy of the sketch (default: {SKETCH_ACCURACY})')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Number of parsing processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+
+    sketch, errors = build_latency_sketch(args.inputs, args.latency_field, args.latency_scale,
+                                          args.jobs, args.accuracy)
+    for error in errors:
+        print(f"Error: {error}", file=sys.stderr)
+    document = json.dumps(sketch.to_dict())
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(document)
+        print(f"Sketch of {sketch.count:,} samples saved to: {args.output}")
+    else:
+        print(document)
+    sys.exit(1 if errors else 0)
+
+
 def main():
     """Main entry point."""
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        batch_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == '--sketch':
+        sketch_main(sys.argv[2:])
+        return
+
     if len(sys.argv) < 2:
         print("Usage: python metrics-aggregator.py <input.json> [output.md]")
+        print("       python metrics-aggregator.py --batch <manifest|dir|glob>... --output-dir <dir>")
+        print("       python metrics-aggregator.py --sketch <latency files>... [--output sketch.json]")
         print("\nExample:")
         print("  python metrics-aggregator.py metrics.json report.md")
         sys.exit(1)
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    parser = argparse.ArgumentParser(description='Summarize quality metrics as a markdown report')
+    parser.add_argument('input_file', help='Metrics JSON file')
+    parser.add_argument('output_file', nargs='?', default=None,
+                        help='Markdown report to write (default: stdout)')
+    parser.add_argument('--history', nargs='+', default=None, metavar='PATH',
+                        help='Earlier snapshots: JSON files, directories, globs or manifests')
+    parser.add_argument('--window', type=int, default=ROLLING_WINDOW,
+                        help=f'Snapshots in the rolling window (default: {ROLLING_WINDOW})')
+    parser.add_argument('--latency', nargs='+', default=None, metavar='PATH',
+                        help='Latency CSVs, logs, Prometheus dumps or saved sketches to '
+                             'report percentiles from')
+    parser.add_argument('--latency-field', default=None, metavar='NAME',
+                        help='CSV column or Prometheus histogram holding the latencies')
+    parser.add_argument('--latency-scale', type=float, default=1.0, metavar='FACTOR',
+                        help='Multiply samples by FACTOR to get milliseconds (default: 1)')
+    parser.add_argument('--latency-target', type=parse_latency_target, action='append',
+                        default=None, metavar='PERCENTILE=MS',
+                        help='Target for p50, p95, p99 or p99.9, e.g. p99=800; repeatable')
+    parser.add_argument('--junit', nargs='+', default=None, metavar='[TYPE=]PATH',
+                        help='JUnit/xUnit XML files, directories or globs to count tests '
+                             'from; TYPE names the suite type (default: from the path)')
+    parser.add_argument('--slowest', type=int, default=SLOWEST_TESTS, metavar='N',
+                        help=f'Slowest tests to list from --junit (default: {SLOWEST_TESTS})')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Number of processes parsing latency and JUnit files '
+                             '(default: one per CPU)')
+    args = parser.parse_args()
 
     # Load and process metrics
-    metrics = load_metrics(input_file)
-    aggregator = MetricsAggregator(metrics)
+    metrics = load_metrics(args.input_file)
+    history = None
+    if args.history:
+        history = [load_metrics(str(path)) for path in expand_metric_inputs(args.history)
+                   if os.path.abspath(path) != os.path.abspath(args.input_file)]
+    latency = None
+    if args.latency:
+        latency, errors = build_latency_sketch(args.latency, args.latency_field,
+                                               args.latency_scale, args.jobs)
+        for error in errors:
+            print(f"Error: {error}")
+        if errors:
+            sys.exit(1)
+    junit = None
+    if args.junit:
+        junit, errors = build_junit_results(args.junit, args.slowest, args.jobs)
+        # Unreadable files are skipped; only fail when none could be parsed
+        if not junit.files:
+            for error in errors:
+                print(f"Error: {error}")
+            sys.exit(1)
+        for error in errors:
+            print(f"Warning: {error}; skipped", file=sys.stderr)
+    aggregator = MetricsAggregator(metrics, history, args.window, latency,
+                                   dict(args.latency_target or []), junit)
     report = aggregator.generate_summary()
 
     # Save or print report
-    save_report(report, output_file)
+    save_report(report, args.output_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,459 @@
+"""Tests for metrics-aggregator.py.
+
+Run with: python -m pytest test_metrics_aggregator.py
+"""
+
+import importlib.util
+import json
+import math
+import random
+import re
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+AGGREGATOR_PATH = Path(__file__).with_name('metrics-aggregator.py')
+
+
+def load_aggregator():
+    """Import metrics-aggregator.py as a module despite the dash in its name."""
+    module = sys.modules.get('metrics_aggregator')
+    if module is None:
+        spec = importlib.util.spec_from_file_location('metrics_aggregator', AGGREGATOR_PATH)
+        module = importlib.util.module_from_spec(spec)
+        # Registered before running so that worker processes can unpickle tasks
+        sys.modules['metrics_aggregator'] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+aggregator = load_aggregator()
+
+
+def run_cli(*args) -> subprocess.CompletedProcess:
+    """Run metrics-aggregator.py with ``args`` and capture its output as text."""
+    return subprocess.run([sys.executable, str(AGGREGATOR_PATH), *map(str, args)],
+                          capture_output=True, text=True)
+
+
+def project(name: str, coverage: float = 85, **metrics) -> dict:
+    """A metrics input for ``name`` with the given code coverage."""
+    sections = {
+        "code_quality": {"coverage": coverage, "complexity": 7.2, "duplication": 3.5},
+        "testing": {"unit_tests_passed": 250, "unit_tests_failed": 5},
+        "security": {"critical_vulnerabilities": 0, "high_vulnerabilities": 2},
+    }
+    sections.update(metrics)
+    return {"project": name, "reporting_period": "2024-02-01 to 2024-02-28",
+            "metrics": sections}
+
+
+def without_generated(report: str) -> str:
+    """Drop the generation time line, the only part of a report that varies."""
+    return re.sub(r'\*\*Generated:\*\* .*\n', '', report)
+
+
+def write_json(path: Path, data) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data))
+    return path
+
+
+@pytest.fixture
+def portfolio(tmp_path):
+    """A directory of projects with a manifest, a duplicate name and bad inputs."""
+    root = tmp_path / 'projects'
+    write_json(root / 'alpha.json', project('alpha', 92))
+    write_json(root / 'team' / 'beta.json', project('beta', 60))
+    write_json(root / 'team' / 'nested' / 'alpha.json', project('delta', 75))
+    write_json(root / 'list.json', [1, 2, 3])
+    (root / 'broken.json').write_text('{"project":')
+    write_json(tmp_path / 'extra' / 'gamma.json',
+               project('gamma', 81, security={"critical_vulnerabilities": 1}))
+    manifest = tmp_path / 'projects.txt'
+    manifest.write_text('# Portfolio\nextra/gamma.json\nprojects/alpha.json  # listed twice\n')
+    return root, manifest
+
+
+def test_batch_renders_every_project(tmp_path, portfolio):
+    root, manifest = portfolio
+    out = root / 'reports'
+    for _ in range(2):
+        # The second run must not pick up the reports written by the first
+        result = run_cli('--batch', root, manifest, '--output-dir', out, '--jobs', '2')
+        assert result.returncode == 1
+        assert 'Rendered 4 report(s)' in result.stdout
+
+    index = json.loads((out / 'index.json').read_text())
+    assert [(entry['project'], entry['report'], entry['status']) for entry in index['projects']] \
+        == [('alpha', 'alpha.md', 'green'), ('beta', 'beta.md', 'red'),
+            ('delta', 'alpha-2.md', 'yellow'), ('gamma', 'gamma.md', 'red')]
+    assert len(index['errors']) == 2
+    assert any('Invalid JSON' in error and 'broken.json' in error for error in index['errors'])
+    assert any('Expected a JSON object' in error for error in index['errors'])
+    assert sorted(path.name for path in out.iterdir()) == \
+        ['alpha-2.md', 'alpha.md', 'beta.md', 'gamma.md', 'index.json', 'index.md']
+
+    expected = aggregator.MetricsAggregator(project('beta', 60)).generate_summary()
+    assert without_generated((out / 'beta.md').read_text()) == without_generated(expected)
+    assert '[gamma.md](gamma.md)' in (out / 'index.md').read_text()
+
+
+def test_batch_output_does_not_depend_on_jobs(tmp_path, portfolio):
+    root, manifest = portfolio
+    outputs = []
+    for jobs in (1, 3):
+        out = tmp_path / f'out{jobs}'
+        aggregator.run_batch([str(root), str(manifest)], str(out), jobs)
+        outputs.append({path.name: without_generated(path.read_text())
+                        for path in sorted(out.iterdir())})
+    assert outputs[0] == outputs[1]
+
+
+def test_batch_reports_malformed_projects(tmp_path):
+    write_json(tmp_path / 'in' / 'good.json', project('good'))
+    write_json(tmp_path / 'in' / 'bad.json', {"project": "bad", "metrics": {"code_quality": 5}})
+    assert aggregator.run_batch([str(tmp_path / 'in')], str(tmp_path / 'out'), 1) == 1
+    index = json.loads((tmp_path / 'out' / 'index.json').read_text())
+    assert [entry['project'] for entry in index['projects']] == ['good']
+    assert len(index['errors']) == 1 and 'bad.json' in index['errors'][0]
+
+
+def snapshot(day: int, coverage: float, **extra) -> dict:
+    """A snapshot on 2024-03-``day`` with the given coverage."""
+    return dict({"timestamp": f"2024-03-{day:02d}T12:00:00",
+                 "metrics": {"code_quality": {"coverage": coverage}}}, **extra)
+
+
+def test_history_is_ordered_by_date():
+    history = aggregator.MetricsHistory([snapshot(9, 82), snapshot(1, 80), snapshot(8, 81)],
+                                        current=snapshot(10, 84))
+    assert history.dated and history.num_snapshots == 4
+    series = history.series['code_quality.coverage']
+    assert list(series.values) == [80, 81, 82, 84]
+    [row] = history.trends()
+    assert row['delta_previous'] == 2
+    # A week before the 10th the latest value was the one from the 1st
+    assert row['delta_week'] == 4
+    assert row['rolling_mean'] == pytest.approx(81.75)
+
+
+def test_history_falls_back_to_positions():
+    undated = {"metrics": {"code_quality": {"coverage": 70}}}
+    history = aggregator.MetricsHistory([snapshot(5, 80), undated], current=snapshot(6, 90))
+    assert not history.dated
+    assert list(history.series['code_quality.coverage'].times) == [0.0, 1.0, 2.0]
+    assert list(history.series['code_quality.coverage'].values) == [80, 70, 90]
+
+    # The current snapshot is always the latest point, even when dated earlier
+    history = aggregator.MetricsHistory([snapshot(5, 80)], current=snapshot(1, 90))
+    assert not history.dated
+    assert history.series['code_quality.coverage'].values[-1] == 90
+
+
+def test_time_series_rejects_older_points():
+    series = aggregator.TimeSeries('code_quality.coverage')
+    series.append(2.0, 80)
+    with pytest.raises(ValueError, match='older'):
+        series.append(1.0, 81)
+
+    history = aggregator.MetricsHistory([snapshot(1, 80)], current=snapshot(5, 81))
+    with pytest.raises(ValueError, match='older'):
+        history.add_snapshot(snapshot(3, 82))
+    with pytest.raises(ValueError, match='dated'):
+        history.add_snapshot({"metrics": {"code_quality": {"coverage": 82}}})
+    history.add_snapshot(snapshot(6, 83))
+    assert history.num_snapshots == 3
+
+
+def test_extend_matches_append():
+    values = [80, 82, 79, 85, 90, 60, 75, 77, 81, 88, 70]
+    bulk = aggregator.TimeSeries('code_quality.coverage', window=4)
+    bulk.extend([float(i) for i in range(len(values))], values)
+    single = aggregator.TimeSeries('code_quality.coverage', window=4)
+    for i, value in enumerate(values):
+        single.append(float(i), value)
+    assert list(bulk.rolling_mean) == pytest.approx(list(single.rolling_mean))
+    assert list(bulk.rolling_std) == pytest.approx(list(single.rolling_std))
+
+    # Appending after a bulk load continues from the same running sums
+    bulk.append(20.0, 50)
+    single.append(20.0, 50)
+    assert bulk.rolling_mean[-1] == pytest.approx(single.rolling_mean[-1])
+    assert bulk.rolling_std[-1] == pytest.approx(single.rolling_std[-1])
+
+
+def test_regressions_respect_metric_direction():
+    snapshots = [{"timestamp": f"2024-03-{day:02d}",
+                  "metrics": {"code_quality": {"coverage": 80 + day % 2,
+                                               "complexity": 7 + day % 2 / 10}}}
+                 for day in range(1, 8)]
+    # Coverage drops and complexity rises: both are worse
+    current = {"timestamp": "2024-03-08",
+               "metrics": {"code_quality": {"coverage": 60, "complexity": 12}}}
+    rows = {row['metric']: row for row in aggregator.MetricsHistory(snapshots, current=current)
+            .trends()}
+    assert rows['code_quality.coverage']['z_score'] > aggregator.REGRESSION_Z_SCORE
+    assert rows['code_quality.complexity']['z_score'] > aggregator.REGRESSION_Z_SCORE
+
+    # The same moves in the other direction are improvements
+    current = {"timestamp": "2024-03-08",
+               "metrics": {"code_quality": {"coverage": 99, "complexity": 3}}}
+    rows = aggregator.MetricsHistory(snapshots, current=current).trends()
+    assert all(row['z_score'] is None for row in rows)
+
+
+def test_history_cli(tmp_path):
+    history_dir = tmp_path / 'history'
+    for day, coverage in ((1, 84), (8, 85), (15, 86)):
+        write_json(history_dir / f'{day:02d}.json',
+                   dict(project('alpha', coverage), reporting_period=f"2024-02-01 to 2024-03-{day:02d}"))
+    # The input itself lives in the history directory and must not count twice
+    current = write_json(history_dir / '22.json',
+                         dict(project('alpha', 50), reporting_period="2024-02-01 to 2024-03-22"))
+    result = run_cli(current, '--history', history_dir)
+    assert result.returncode == 0, result.stderr
+    assert 'Across 4 snapshots; rolling mean over the last 7.' in result.stdout
+    assert '| code_quality.coverage | 50 | 76.25 | -36 | -36 |' in result.stdout
+    assert '🔴 code_quality.coverage: 50 vs rolling mean 85.00 before it (z = ' in result.stdout
+
+    # Without --history the report has no trend sections
+    assert '## Trends' not in run_cli(current).stdout
+
+
+QUANTILES = (0.0, 0.5, 0.95, 0.99, 0.999, 1.0)
+
+
+def latencies(seed: int, count: int = 20000):
+    """Lognormal latencies in milliseconds, with a few zero samples."""
+    rng = random.Random(seed)
+    return [0.0 if rng.random() < 0.001 else rng.lognormvariate(3, 1.5) for _ in range(count)]
+
+
+def exact_quantile(ordered, q):
+    """The sample of rank ``q * (n - 1)``, as DDSketch.quantile defines it."""
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def assert_within_accuracy(sketch, samples, accuracy):
+    ordered = sorted(samples)
+    for q in QUANTILES:
+        expected = exact_quantile(ordered, q)
+        actual = sketch.quantile(q)
+        assert abs(actual - expected) <= accuracy * expected + 1e-12, (q, actual, expected)
+
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.02, 0.05])
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_quantiles_within_relative_accuracy(accuracy, seed):
+    samples = latencies(seed)
+    sketch = aggregator.DDSketch(accuracy)
+    for value in samples:
+        sketch.add(value)
+    assert sketch.count == len(samples)
+    assert sketch.min == min(samples) and sketch.max == max(samples)
+    assert_within_accuracy(sketch, samples, accuracy)
+
+
+def test_add_many_matches_add():
+    samples = latencies(4)
+    one_by_one = aggregator.DDSketch()
+    for value in samples:
+        one_by_one.add(value)
+    batched = aggregator.DDSketch()
+    for start in range(0, len(samples), 3000):
+        batched.add_many(samples[start:start + 3000])
+    assert batched.count == one_by_one.count
+    assert batched.zero_count == one_by_one.zero_count
+    assert math.isclose(batched.sum, one_by_one.sum)
+    assert_within_accuracy(batched, samples, batched.relative_accuracy)
+    if aggregator.np is None:
+        assert batched.buckets == one_by_one.buckets
+
+
+def test_merge_matches_one_sketch_of_all_samples():
+    shards = [latencies(seed, 5000) for seed in range(5, 9)]
+    whole = aggregator.DDSketch()
+    merged = aggregator.DDSketch()
+    for shard in shards:
+        part = aggregator.DDSketch()
+        for value in shard:
+            part.add(value)
+            whole.add(value)
+        merged.merge(part)
+    assert merged.buckets == whole.buckets
+    assert (merged.count, merged.zero_count, merged.min, merged.max) == \
+        (whole.count, whole.zero_count, whole.min, whole.max)
+    assert [merged.quantile(q) for q in QUANTILES] == [whole.quantile(q) for q in QUANTILES]
+
+
+def test_merge_rejects_other_accuracy():
+    with pytest.raises(ValueError):
+        aggregator.DDSketch(0.01).merge(aggregator.DDSketch(0.02))
+
+
+def test_serialization_round_trips():
+    sketch = aggregator.DDSketch(0.02)
+    for value in latencies(9, 2000):
+        sketch.add(value)
+    restored = aggregator.DDSketch.from_dict(sketch.to_dict())
+    assert restored.to_dict() == sketch.to_dict()
+    assert [restored.quantile(q) for q in QUANTILES] == [sketch.quantile(q) for q in QUANTILES]
+
+
+def test_empty_sketch():
+    sketch = aggregator.DDSketch()
+    assert sketch.quantile(0.5) is None
+    assert aggregator.DDSketch.from_dict(sketch.to_dict()).count == 0
+
+
+def test_collapse_keeps_upper_quantiles():
+    samples = [1.01 ** exponent for exponent in range(5000)]
+    sketch = aggregator.DDSketch(0.01, max_buckets=200)
+    for value in samples:
+        sketch.add(value)
+    assert len(sketch.buckets) <= 200
+    ordered = sorted(samples)
+    for q in (0.99, 0.999, 1.0):
+        expected = exact_quantile(ordered, q)
+        assert abs(sketch.quantile(q) - expected) <= 0.01 * expected
+
+
+def test_latency_files_are_sketched_by_format(tmp_path):
+    samples = latencies(10, 3000)
+    csv_path = tmp_path / 'load.csv'
+    csv_path.write_text('url,duration_ms\n' + ''.join(f'/a,{value}\n' for value in samples)
+                        + '/b,n/a\n')
+    log_path = tmp_path / 'access.log'
+    log_path.write_text(''.join(f'GET /a 200 {value / 1000}\n' for value in samples))
+    for path, scale in ((csv_path, 1.0), (log_path, 1000.0)):
+        sketch, error = aggregator.sketch_latency_file(path, scale=scale)
+        assert error is None and sketch.count == len(samples)
+        assert_within_accuracy(sketch, samples, sketch.relative_accuracy + 1e-9)
+
+    prom_path = tmp_path / 'metrics.prom'
+    prom_path.write_text(
+        '# TYPE http_request_duration_seconds histogram\n'
+        'http_request_duration_seconds_bucket{route="/a",le="0.1"} 90\n'
+        'http_request_duration_seconds_bucket{route="/a",le="0.5"} 99\n'
+        'http_request_duration_seconds_bucket{route="/a",le="+Inf"} 100\n'
+        'http_request_duration_seconds_bucket{route="/b",le="0.1"} 100\n'
+        'http_request_duration_seconds_bucket{route="/b",le="+Inf"} 100\n')
+    sketch, error = aggregator.sketch_latency_file(prom_path)
+    assert error is None and sketch.count == 200
+    # Samples sit at their bucket's upper bound, in milliseconds
+    assert sketch.quantile(0.5) == pytest.approx(100, rel=0.01)
+    assert sketch.quantile(0.999) == pytest.approx(500, rel=0.01)
+
+    sketch, error = aggregator.sketch_latency_file(csv_path, field='latency')
+    assert sketch is None and 'no latency column' in error
+
+
+def test_saved_sketches_merge_into_the_report(tmp_path):
+    shards = [latencies(seed, 4000) for seed in (11, 12)]
+    sketches = []
+    for index, shard in enumerate(shards):
+        path = tmp_path / f'shard{index}.log'
+        path.write_text(''.join(f'{value}\n' for value in shard))
+        sketch_path = tmp_path / f'shard{index}.json'
+        result = run_cli('--sketch', path, '--output', sketch_path)
+        assert result.returncode == 0, result.stderr
+        sketches.append(sketch_path)
+
+    metrics = write_json(tmp_path / 'metrics.json', project(
+        'alpha', performance={"latency_targets_ms": {"p99": 5000}}))
+    result = run_cli(metrics, '--latency', *sketches, '--latency-target', 'p50=10')
+    assert result.returncode == 0, result.stderr
+    assert 'Latency percentiles from 8,000 samples, accurate to ±1%.' in result.stdout
+    assert '| p50 Latency (ms) |' in result.stdout and '<10ms | 🔴 |' in result.stdout
+    assert '<5000ms |' in result.stdout
+
+    assert run_cli(metrics, '--latency-target', 'p42=10').returncode == 2
+
+
+@pytest.mark.parametrize('text, seconds', [
+    ('0.5', 0.5), ('0,5', 0.5), (' 12 ', 12.0), ('1,234.5', 1234.5),
+    ('1,234,567', 1234567.0), ('', 0.0),
+])
+def test_junit_seconds(text, seconds):
+    assert aggregator._junit_seconds(text) == seconds
+
+
+def test_unreadable_junit_file_is_reported_and_skipped(tmp_path):
+    good = tmp_path / 'unit.xml'
+    good.write_text('<testsuite><testcase name="a" time="0,25"/>'
+                    '<testcase name="b" time="1.5"><failure/></testcase></testsuite>')
+    bad = tmp_path / 'broken.xml'
+    bad.write_text('<testsuite><testcase')
+    results, errors = aggregator.parse_junit_files(
+        [(good, None), (bad, None), (tmp_path / 'missing.xml', None)])
+    assert results.files == 1
+    assert len(errors) == 2
+    assert [duration for duration, _, _ in results.slowest_tests()] == [1.5, 0.25]
+
+
+def write_junit(path: Path, cases: str) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f'<testsuites><testsuite name="s">{cases}</testsuite></testsuites>')
+    return path
+
+
+def test_junit_results_replace_the_testing_counts(tmp_path):
+    write_junit(tmp_path / 'results' / 'unit' / 'a.xml',
+                '<testcase classname="A" name="fast" time="0.1"/>'
+                '<testcase classname="A" name="slow" time="2.5"><failure/></testcase>'
+                '<testcase classname="A" name="off"><skipped/></testcase>')
+    (tmp_path / 'results' / 'xunit.xml').write_text(
+        '<assemblies><assembly><collection>'
+        '<test name="X.works" result="Pass" time="0.3"/>'
+        '<test name="X.broken" result="Fail" time="1,5"><failure/></test>'
+        '</collection></assembly></assemblies>')
+    write_junit(tmp_path / 'it' / 'b.xml', '<testcase classname="B" name="db" time="4"/>')
+
+    results, errors = aggregator.build_junit_results(
+        [str(tmp_path / 'results'), f"e2e={tmp_path / 'it'}"], limit=2, jobs=1)
+    assert errors == [] and results.files == 3
+    assert results.suites == {"unit": [2, 2, 1, 4.4], "e2e": [1, 0, 0, 4.0]}
+    assert results.slowest_tests() == [(4.0, 'B.db', 'e2e'), (2.5, 'A.slow', 'unit')]
+
+    # Suite types missing from the results do not keep the input's counts
+    metrics = aggregator.MetricsAggregator(project('alpha'), junit=results).metrics
+    assert metrics["testing"] == {
+        "unit_tests_passed": 2, "unit_tests_failed": 2, "unit_tests_skipped": 1,
+        "unit_tests_duration_s": 4.4, "e2e_tests_passed": 1, "e2e_tests_failed": 0,
+        "e2e_tests_skipped": 0, "e2e_tests_duration_s": 4.0}
+
+
+def test_junit_cli(tmp_path):
+    write_junit(tmp_path / 'integration' / 'a.xml',
+                '<testcase name="one" time="0.5"/><testcase name="two" time="1"><error/></testcase>')
+    metrics = write_json(tmp_path / 'metrics.json', project('alpha'))
+    result = run_cli(metrics, '--junit', tmp_path / 'integration', tmp_path / 'missing.xml',
+                     '--jobs', '1')
+    assert result.returncode == 0
+    assert 'missing.xml; skipped' in result.stderr
+    assert '| Unit Tests | 0 | 0 | 0.0% |' in result.stdout
+    assert '| Integration Tests | 1 | 1 | 50.0% |' in result.stdout
+    assert '### Test Suites (1 result files)' in result.stdout
+    assert '| two | integration | 1.00 |' in result.stdout
+
+    assert run_cli(metrics, '--junit', tmp_path / 'missing.xml').returncode == 1
+
+
+def test_junit_file_is_read_in_flat_memory(tmp_path):
+    path = write_junit(tmp_path / 'big.xml', ''.join(
+        f'<testcase name="t{index}" time="0.01"><system-out>{index}</system-out></testcase>'
+        for index in range(50000)))
+    results = aggregator.JUnitResults()
+    tracemalloc.start()
+    try:
+        aggregator._read_junit_file(path, 'unit', results)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert results.suites["unit"][0] == 50000
+    # Test cases left attached to their suite, even cleared, take several MB
+    assert peak < 2 * 1024 * 1024
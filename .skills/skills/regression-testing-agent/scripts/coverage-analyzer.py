@@ -8,32 +8,258 @@ Supports:
   - Cobertura XML format (coverage.xml)
 
 Usage:
-  python coverage-analyzer.py <coverage-report-file> [options]
+  python coverage-analyzer.py <coverage-report-file>... [options]
+  python coverage-analyzer.py query --db <path> {trend,rollup,regressions} [options]
+  python coverage-analyzer.py index {build,select} --index <path> [options]
+  python coverage-analyzer.py compare --base <report>... --head <report>... [options]
+
+Report files may also be directories or glob patterns, and '-' reads a report
+from stdin. gzip, bz2, xz and (with the zstandard module) zstd compressed
+reports are decompressed on the fly. All inputs are parsed in parallel and
+merged into a single report.
 
 Options:
   --format {auto,lcov,coverage-py,cobertura}
-      Specify the format explicitly (default: auto-detect from file extension)
+      Specify the format explicitly (default: auto-detect from file contents)
+  --lcov-engine {mmap,text}
+      LCOV parsing engine (default: mmap)
+  --jobs <n>
+      Number of parser processes (default: one per CPU)
+  --cache-dir <dir>
+      Cache parsed reports in <dir> (default: $COVERAGE_ANALYZER_CACHE_DIR)
+  --cache-max-size <bytes>
+      Evict least recently used cache entries beyond this size (default: 1 GiB)
+  --cache-hash
+      Also key cache entries by a hash of the report contents
+  --memory-budget <size>
+      Keep the merge of all inputs within about <size> bytes (suffixes K, M
+      and G are accepted) by spilling sorted runs of merged files to
+      temporary files and merging them back at the end. Each input must
+      still fit in memory on its own, and the merged per-file totals (a few
+      dozen bytes per file) are held on top of the budget
+  --diff <patch>
+      Only parse and report coverage of lines changed in a unified diff
+  --summary-only
+      Take each file's coverage from the totals in the report (LCOV LF/LH,
+      Cobertura line-rate, coverage.py summaries) and skip its line data. Records without totals are parsed in full, with a
+      warning. Repeated records of a file are not merged line by line
   --threshold <percentage>
       Show warning if coverage is below threshold (default: 80)
-  --output {text,json,csv}
-      Output format (default: text)
+  --output {text,json,csv}[=<file>]
+      Output format (default: text), written to <file> instead of stdout if
+      given. Repeat to write several formats from one parse
   --min-line-coverage <percentage>
       Minimum required line coverage per file (default: 70)
   --exclude-pattern <regex>
       Exclude files matching regex pattern
+  --include <pattern>, --exclude <pattern>
+      Only report files matching / skip files matching a glob such as
+      'src/**' or 'node_modules/**', or a regex written as 're:<regex>'.
+      Repeatable; excluded records are skipped while parsing
   --sort {file,coverage,lines}
       Sort output by file name, coverage %, or lines (default: coverage)
+  --rollup-depth <n>
+      Also report coverage of every directory down to depth n, in all formats
+  --directory-threshold <dir>=<percentage>
+      Flag <dir> and its subdirectories in the rollup when their coverage is
+      below <percentage> (default: --threshold). Repeatable; implies a rollup
+      of every depth unless --rollup-depth is given
+  --profile [<file>]
+      Write per-phase wall/CPU time, peak memory and counts as JSON to <file>
+      (default: stderr)
+  --profile-stats <file>
+      Also write a cProfile dump of the run, readable with pstats
+  --db <path>
+      Also store per-file results in a SQLite database for later queries
+  --build-id <id>
+      Build ID to store the results under (default: the build time)
+  --build-time <iso-8601>
+      Time of the build, taken as UTC unless it has an offset (default: now)
+  --watch
+      Keep running, re-scan the inputs and merge new or changed reports
+      incrementally, rewriting the outputs after every change
+  --watch-interval <seconds>
+      Seconds between scans in watch mode (default: 2)
+  --serve <address>
+      In watch mode, serve the merged report as JSON over HTTP on
+      [host:]port or unix:<path> (/ or /coverage.json, and /summary)
+
+Query subcommand (reads a database written with --db):
+  trend [--path <glob>] [--last <n>]
+      Coverage of all files, or of files matching a glob such as
+      'src/payments/**', over the last n builds (default: 20)
+  rollup [--build-id <id>] [--depth <n>]
+      Coverage of every directory down to depth n (default: 1) in a build
+      (default: latest)
+  regressions [--base <id>] [--head <id>] [--limit <n>]
+      Files whose coverage dropped most between two builds (default: the
+      two latest)
+
+Index subcommand (per-test coverage for test selection):
+  build --index <path> <report_file>...
+      Index coverage.py JSON reports written with --show-contexts (e.g. from
+      pytest --cov-context=test) into a SQLite file of line -> tests
+  select --index <path> [--diff <patch>] [<file>:<lines>...]
+      Print the tests that ran any changed line, one per line; lines are
+      given as e.g. src/app.py:10,14-20
+
+Compare subcommand (base versus head, e.g. main versus a pull request):
+  --base <report>... --head <report>...
+      Reports to compare; files are joined by path and the per-file and
+      total changes in line coverage are written with --output and --sort
+      {change,file} (default: change)
+  --path-map <old>=<new>
+      Join files under <old> (a file or directory) as <new>, for renamed
+      files and differing checkout roots. Repeatable
+  --max-drop <pp>, --max-total-drop <pp>
+      Exit with status 1 if a file, or the total, loses more than <pp>
+      percentage points of line coverage
+  --fail-fast
+      Stream the head reports against the indexed base and exit at the
+      first file over --max-drop, without parsing the rest. Each file is
+      checked once its consecutive records have been merged
 """
 
+import bisect
+import bz2
+import cProfile
+import glob
+import gzip
+import hashlib
+import io
 import json
+import lzma
+import math
+import mmap
+import operator
+import os
 import re
+import signal
+import socketserver
+import sqlite3
+import struct
 import sys
+import threading
+import time
+import tracemalloc
 import argparse
+import heapq
+import tempfile
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import groupby, repeat
 from pathlib import Path
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (BinaryIO, Callable, Dict, Iterable, Iterator, List, Mapping,
+                    MutableMapping, NamedTuple, Optional, Sequence, Set, TextIO, Tuple,
+                    Union)
 from xml.etree import ElementTree as ET
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; merges fall back to pure Python
+    np = None
+
+try:
+    import zstandard
+except ImportError:  # zstd input is optional
+    zstandard = None
+
+# Largest hit count an array('I') slot can hold; larger counts saturate.
+MAX_HIT_COUNT = 0xFFFFFFFF
+
+
+class LineHits:
+    """Per-line hit counts of a single file, indexed by line number.
+
+    Hit counts live in an ``array('I')`` and a parallel bytearray marks which
+    lines are instrumented, so each line costs five bytes rather than a pair
+    of Python ints in a dict.
+    """
+
+    __slots__ = ('hits', 'instrumented')
+
+    def __init__(self, hits: Optional[array] = None,
+                 instrumented: Optional[bytearray] = None):
+        self.hits = hits if hits is not None else array('I')
+        self.instrumented = instrumented if instrumented is not None else bytearray()
+
+    def __len__(self) -> int:
+        return len(self.instrumented)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LineHits):
+            return NotImplemented
+        return self.hits == other.hits and self.instrumented == other.instrumented
+
+    def add(self, line: int, count: int) -> None:
+        """Record an instrumented line.
+
+        A line reported more than once within the same report keeps its
+        highest count; use merge() to combine separate reports.
+        """
+        if line < 0:
+            return
+        if line >= len(self.instrumented):
+            # Grow geometrically; trim() drops the slack once a file is done
+            grow = max(line + 1, 2 * len(self.instrumented)) - len(self.instrumented)
+            self.instrumented.extend(bytes(grow))
+            self.hits.frombytes(bytes(grow * self.hits.itemsize))
+        self.instrumented[line] = 1
+        if count > self.hits[line]:
+            self.hits[line] = min(count, MAX_HIT_COUNT)
+
+    def trim(self) -> 'LineHits':
+        """Drop unused slack after the last instrumented line."""
+        size = self.instrumented.rfind(1) + 1
+        del self.instrumented[size:]
+        del self.hits[size:]
+        return self
+
+    @property
+    def lines_total(self) -> int:
+        """Number of instrumented lines."""
+        return self.instrumented.count(1)
+
+    @property
+    def lines_covered(self) -> int:
+        """Number of lines executed at least once."""
+        # Lines that are not instrumented always have a zero count
+        return len(self.hits) - self.hits.count(0)
+
+    def merge(self, other: 'LineHits') -> 'LineHits':
+        """Return the line-by-line union of two hit maps, summing hit counts."""
+        size = max(len(self), len(other))
+        first = self._padded(size)
+        second = other._padded(size)
+
+        instrumented = (int.from_bytes(first.instrumented, 'little') |
+                        int.from_bytes(second.instrumented, 'little'))
+
+        if np is not None:
+            summed = (np.frombuffer(first.hits, dtype=np.uint32).astype(np.uint64) +
+                      np.frombuffer(second.hits, dtype=np.uint32))
+            np.minimum(summed, MAX_HIT_COUNT, out=summed)
+            hits = array('I', summed.astype(np.uint32).tobytes())
+        else:
+            hits = array('I', map(min, map(operator.add, first.hits, second.hits),
+                                  repeat(MAX_HIT_COUNT, size)))
+
+        return LineHits(hits, bytearray(instrumented.to_bytes(size, 'little')))
+
+    def _padded(self, size: int) -> 'LineHits':
+        """Return this map zero-extended to ``size`` lines."""
+        if len(self) >= size:
+            return self
+        grow = size - len(self)
+        hits = array('I', self.hits)
+        hits.frombytes(bytes(grow * hits.itemsize))
+        return LineHits(hits, self.instrumented + bytes(grow))
+
 
 @dataclass
 class FileCoverage:
@@ -44,16 +270,331 @@ class FileCoverage:
     function_coverage: Optional[float]
     lines_covered: int
     lines_total: int
+    line_hits: Optional[LineHits] = field(default=None, repr=False)
+    function_hits: Optional[Dict[str, int]] = field(default=None, repr=False)
+
+
+def _max_optional(first: Optional[float], second: Optional[float]) -> Optional[float]:
+    """Return the larger of two optional values."""
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return max(first, second)
+
+
+def _function_coverage(function_hits: Dict[str, int]) -> Optional[float]:
+    """Calculate function coverage from per-function hit counts."""
+    if not function_hits:
+        return None
+    hit = sum(1 for count in function_hits.values() if count > 0)
+    return (hit / len(function_hits)) * 100
+
+
+def merge_file_coverage(first: FileCoverage, second: FileCoverage) -> FileCoverage:
+    """Combine two entries for the same file.
+
+    When both entries carry line-level data the result is their line-by-line
+    union, so a line covered in either report counts as covered. Otherwise
+    the aggregates cannot be combined correctly and ``second`` wins. Branch
+    rates are not tracked per branch, so the higher of the two is kept as a
+    lower bound of the union.
+    """
+    if first.line_hits is None or second.line_hits is None:
+        return second
+
+    line_hits = first.line_hits.merge(second.line_hits)
+    lines_total = line_hits.lines_total
+    lines_covered = line_hits.lines_covered
+
+    if first.function_hits is not None and second.function_hits is not None:
+        function_hits = dict(first.function_hits)
+        for name, count in second.function_hits.items():
+            function_hits[name] = function_hits.get(name, 0) + count
+        function_coverage = _function_coverage(function_hits)
+    else:
+        function_hits = second.function_hits or first.function_hits
+        function_coverage = _max_optional(first.function_coverage,
+                                          second.function_coverage)
+
+    return FileCoverage(
+        filename=second.filename,
+        line_coverage=(lines_covered / lines_total) * 100 if lines_total else 0.0,
+        branch_coverage=_max_optional(first.branch_coverage, second.branch_coverage),
+        function_coverage=function_coverage,
+        lines_covered=lines_covered,
+        lines_total=lines_total,
+        line_hits=line_hits,
+        function_hits=function_hits
+    )
+
+
+class FileTable(MutableMapping):
+    """Columnar store of per-file coverage, keyed by filename.
+
+    Aggregates live in parallel typed arrays and filenames in an interned
+    table, so each file costs a few dozen bytes instead of a dataclass
+    instance, and summaries and sorts run over flat arrays (with NumPy when
+    it is installed). Line and function hit maps are kept only for the files
+    that have them. Reading an entry returns a ``FileCoverage`` view built
+    from the columns; assign it back to change the stored entry. Missing
+    branch and function coverage is stored as NaN.
+    """
+
+    def __init__(self, files: Optional[Mapping] = None):
+        self.names: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.lines_covered = array('q')
+        self.lines_total = array('q')
+        self.line_coverage = array('d')
+        self.branch_coverage = array('d')
+        self.function_coverage = array('d')
+        self._line_hits: Dict[int, LineHits] = {}
+        self._function_hits: Dict[int, Dict[str, int]] = {}
+        if files:
+            self.update(files)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __contains__(self, filename) -> bool:
+        return filename in self._index
+
+    def __getitem__(self, filename: str) -> FileCoverage:
+        return self.view(self._index[filename])
+
+    def __setitem__(self, filename: str, file_info: FileCoverage) -> None:
+        nan = float('nan')
+        branch = nan if file_info.branch_coverage is None else file_info.branch_coverage
+        function = nan if file_info.function_coverage is None else file_info.function_coverage
+
+        index = self._index.get(filename)
+        if index is None:
+            index = len(self.names)
+            filename = sys.intern(filename)
+            self._index[filename] = index
+            self.names.append(filename)
+            self.lines_covered.append(file_info.lines_covered)
+            self.lines_total.append(file_info.lines_total)
+            self.line_coverage.append(file_info.line_coverage)
+            self.branch_coverage.append(branch)
+            self.function_coverage.append(function)
+        else:
+            self.lines_covered[index] = file_info.lines_covered
+            self.lines_total[index] = file_info.lines_total
+            self.line_coverage[index] = file_info.line_coverage
+            self.branch_coverage[index] = branch
+            self.function_coverage[index] = function
+
+        for hits, value in ((self._line_hits, file_info.line_hits),
+                            (self._function_hits, file_info.function_hits)):
+            if value is None:
+                hits.pop(index, None)
+            else:
+                hits[index] = value
+
+    def __delitem__(self, filename: str) -> None:
+        if filename not in self._index:
+            raise KeyError(filename)
+        self.remove([filename])
+
+    def view(self, index: int) -> FileCoverage:
+        """Return the entry at ``index`` as a ``FileCoverage``."""
+        branch = self.branch_coverage[index]
+        function = self.function_coverage[index]
+        return FileCoverage(
+            filename=self.names[index],
+            line_coverage=self.line_coverage[index],
+            branch_coverage=None if math.isnan(branch) else branch,
+            function_coverage=None if math.isnan(function) else function,
+            lines_covered=self.lines_covered[index],
+            lines_total=self.lines_total[index],
+            line_hits=self._line_hits.get(index),
+            function_hits=self._function_hits.get(index)
+        )
+
+    def remove(self, filenames: Iterable[str]) -> None:
+        """Remove many entries at once, compacting the columns in one pass."""
+        drop = {self._index[name] for name in filenames if name in self._index}
+        if not drop:
+            return
+        self.reorder([index for index in range(len(self.names)) if index not in drop])
+
+    def reorder(self, keep: Sequence[int]) -> None:
+        """Keep only the entries at indices ``keep``, in that order.
+
+        Columns are rebuilt in one pass; hit maps are renumbered, not copied.
+        """
+        renumber = {old: new for new, old in enumerate(keep)}
+
+        self.names = [self.names[index] for index in keep]
+        self._index = {name: index for index, name in enumerate(self.names)}
+        for column in ('lines_covered', 'lines_total', 'line_coverage',
+                       'branch_coverage', 'function_coverage'):
+            values = getattr(self, column)
+            setattr(self, column, array(values.typecode, [values[index] for index in keep]))
+        self._line_hits = {renumber[index]: hits for index, hits in self._line_hits.items()
+                           if index in renumber}
+        self._function_hits = {renumber[index]: hits
+                               for index, hits in self._function_hits.items()
+                               if index in renumber}
+
+    def totals(self) -> Tuple[int, int]:
+        """Return the total covered and instrumented lines."""
+        if np is not None and self.names:
+            return (int(np.frombuffer(self.lines_covered, dtype=np.int64).sum()),
+                    int(np.frombuffer(self.lines_total, dtype=np.int64).sum()))
+        return sum(self.lines_covered), sum(self.lines_total)
+
+    def count_at_least(self, bounds: Iterable[float]) -> List[int]:
+        """Count the files in each band of descending lower ``bounds``.
+
+        A file is counted in the first band whose bound its line coverage
+        reaches; files below every bound are not counted.
+        """
+        bounds = list(bounds)
+        if np is not None and self.names:
+            coverage = np.frombuffer(self.line_coverage, dtype=np.float64)
+            reached = [int(np.count_nonzero(coverage >= bound)) for bound in bounds]
+            return [count - previous for count, previous in zip(reached, [0] + reached)]
+
+        counts = [0] * len(bounds)
+        for coverage in self.line_coverage:
+            for band, bound in enumerate(bounds):
+                if coverage >= bound:
+                    counts[band] += 1
+                    break
+        return counts
+
+    def order(self, sort_by: str = 'file') -> Sequence[int]:
+        """Return entry indices sorted by file name, coverage or lines.
+
+        Sorting is stable, so ties keep insertion order; 'lines' sorts
+        descending.
+        """
+        indices = range(len(self.names))
+        if sort_by == 'file':
+            return sorted(indices, key=self.names.__getitem__)
+        if np is not None and self.names:
+            if sort_by == 'lines':
+                keys = -np.frombuffer(self.lines_total, dtype=np.int64)
+            else:  # coverage
+                keys = np.frombuffer(self.line_coverage, dtype=np.float64)
+            return np.argsort(keys, kind='stable').tolist()
+        if sort_by == 'lines':
+            return sorted(indices, key=self.lines_total.__getitem__, reverse=True)
+        return sorted(indices, key=self.line_coverage.__getitem__)
+
+
+# A report given as a path ('-' for stdin) or as an open binary stream.
+ReportSource = Union[str, BinaryIO]
+
+
+def _open_zstd(raw: BinaryIO) -> BinaryIO:
+    """Open a zstd stream with whichever zstd module is available."""
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    try:
+        from compression import zstd  # Python 3.14+
+    except ImportError:
+        raise ValueError("Reading zstd-compressed reports requires the 'zstandard' module") from None
+    return zstd.ZstdFile(raw)
+
+
+# Magic numbers of the supported compression formats and their stream readers.
+_DECOMPRESSORS = (
+    (b'\x1f\x8b', lambda raw: gzip.GzipFile(fileobj=raw)),
+    (b'BZh', bz2.BZ2File),
+    (b'\xfd7zXZ\x00', lzma.LZMAFile),
+    (b'\x28\xb5\x2f\xfd', _open_zstd),
+)
+
+# Extensions of compressed reports, ignored when guessing a report's format.
+COMPRESSION_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+
+
+@contextmanager
+def open_report(filepath: str) -> Iterator[BinaryIO]:
+    """Open a report, or stdin for '-', decompressing it on the fly.
+
+    gzip, bz2 and xz are always supported, zstd when the ``zstandard`` module
+    (or Python 3.14's ``compression.zstd``) is available. Compression is
+    recognised by its magic bytes, not the file name. The returned stream
+    supports ``peek()`` so the report format can be sniffed without consuming
+    any data.
+    """
+    raw = sys.stdin.buffer if filepath == STDIN_PATH else open(filepath, 'rb')
+    try:
+        stream = raw if hasattr(raw, 'peek') else io.BufferedReader(raw)
+        magic = stream.peek(6)[:6]
+        for signature, decompressor in _DECOMPRESSORS:
+            if magic.startswith(signature):
+                stream = decompressor(stream)
+                if not hasattr(stream, 'peek'):
+                    stream = io.BufferedReader(stream)
+                break
+        yield stream
+    finally:
+        if raw is not sys.stdin.buffer:
+            raw.close()
+
+
+@contextmanager
+def _open_source(source: ReportSource) -> Iterator[BinaryIO]:
+    """Yield a binary stream for a report path or pass an open stream through."""
+    if isinstance(source, str):
+        with open_report(source) as stream:
+            yield stream
+    else:
+        yield source
+
+
+def _is_regular_report(filepath: str) -> bool:
+    """Return True for an uncompressed report on disk, which can be mapped."""
+    if filepath == STDIN_PATH or not os.path.isfile(filepath):
+        return False
+    with open(filepath, 'rb') as f:
+        magic = f.read(6)
+    return not any(magic.startswith(signature) for signature, _ in _DECOMPRESSORS)
 
 
 class CoverageReport:
     """Base class for coverage report parsing."""
 
-    def __init__(self):
-        self.files: Dict[str, FileCoverage] = {}
+    def __init__(self, track_lines: bool = True,
+                 path_filter: Optional[Callable[[str], bool]] = None,
+                 summary_only: bool = False):
+        # Per-line hit maps are needed to union repeated records of a file;
+        # without them the last record wins.
+        self.track_lines = track_lines
+        # Records for files rejected by path_filter are skipped while parsing
+        self.path_filter = path_filter
+        # Trust the per-record totals of the report and skip its line data.
+        # Records without totals are parsed in full and counted in
+        # summary_fallbacks.
+        self.summary_only = summary_only
+        self.summary_fallbacks = 0
+        self.files = FileTable()
+
+    def parse(self, filepath: ReportSource) -> None:
+        """Parse the coverage report into ``files``.
+
+        ``filepath`` is a path (possibly compressed, or '-' for stdin) or a
+        binary stream of the uncompressed report.
+        """
+        for file_coverage in self.iter_records(filepath):
+            self.add_file(file_coverage)
+
+    def iter_records(self, source: ReportSource) -> Iterator[FileCoverage]:
+        """Yield a FileCoverage for each record as soon as it is decoded.
 
-    def parse(self, filepath: str) -> None:
-        """Parse the coverage report. Implemented by subclasses."""
+        Records are yielded in report order and are not merged, so a file may
+        appear more than once; ``files`` is left untouched. Implemented by
+        subclasses.
+        """
         raise NotImplementedError
 
     def get_summary(self) -> Tuple[float, int, int]:
@@ -61,8 +602,7 @@ class CoverageReport:
         if not self.files:
             return 0.0, 0, 0
 
-        total_covered = sum(f.lines_covered for f in self.files.values())
-        total_lines = sum(f.lines_total for f in self.files.values())
+        total_covered, total_lines = self.files.totals()
 
         if total_lines == 0:
             return 0.0, 0, 0
@@ -70,353 +610,3610 @@ class CoverageReport:
         coverage = (total_covered / total_lines) * 100
         return coverage, total_covered, total_lines
 
+    def wants(self, filename: str) -> bool:
+        """Return True if records for ``filename`` should be parsed."""
+        return self.path_filter is None or self.path_filter(filename)
+
+    def add_file(self, file_coverage: FileCoverage) -> None:
+        """Add a file entry, merging it with any existing entry for that file."""
+        existing = self.files.get(file_coverage.filename)
+        if existing is not None:
+            file_coverage = merge_file_coverage(existing, file_coverage)
+        self.files[file_coverage.filename] = file_coverage
+
+    def merge(self, files: Mapping[str, FileCoverage]) -> None:
+        """Merge parsed file entries into this report (see merge_file_coverage)."""
+        for file_coverage in files.values():
+            self.add_file(file_coverage)
+
+    def parse_many(self, inputs: Iterable[str], report_format: str = 'auto',
+                   lcov_engine: str = 'mmap', jobs: Optional[int] = None,
+                   cache: Optional['ReportCache'] = None,
+                   profiler: Optional['Profiler'] = None,
+                   memory_budget: Optional[int] = None,
+                   keep_line_hits: bool = False) -> None:
+        """Parse many reports, directories or glob patterns into this report.
+
+        Inputs are parsed on a process pool of ``jobs`` workers (default: one
+        per CPU). Large LCOV files are additionally split into chunks at
+        ``end_of_record`` boundaries so a single file is parsed in parallel.
+        Results are merged in input order, so the outcome is identical to
+        parsing every input serially. With a ``cache``, inputs parsed by an
+        earlier run are loaded from it instead of being parsed again.
+        A ``profiler`` records the detect, cache and parse phases.
+
+        With a ``memory_budget`` in bytes, merged entries beyond the budget
+        are spilled to disk and merged back at the end (see SpillingMerge);
+        each single input must still fit in memory. Merged entries then drop
+        their hit maps unless ``keep_line_hits``, which restrict_to_diff()
+        needs.
+        """
+        profiler = profiler or Profiler()
+        inputs = list(inputs)
+        filepaths = expand_inputs(inputs)
+        if not filepaths:
+            raise FileNotFoundError(f"No coverage reports found in: {', '.join(inputs)}")
+
+        jobs = jobs or os.cpu_count() or 1
+        tasks = []
+        # One (cache key, cached files, number of parse tasks) entry per input
+        plan: List[Tuple[Optional[str], Optional[Mapping[str, FileCoverage]], int]] = []
+        for filepath in filepaths:
+            # stdin can only be read once, so its format is detected by the
+            # parse task itself from the same stream
+            file_format = report_format
+            if file_format == 'auto' and filepath != STDIN_PATH:
+                with profiler.phase('detect'):
+                    file_format = detect_format(filepath)
+
+            # The cache only holds unfiltered results; a filtered parse can
+            # still reuse them, but never stores its own.
+            key = None
+            if cache is not None and filepath != STDIN_PATH:
+                with profiler.phase('cache'):
+                    key = cache.key(filepath, file_format, self.track_lines,
+                                    self.summary_only)
+                    cached = cache.load(key)
+                if cached is not None:
+                    if self.path_filter is not None:
+                        cached = {name: file_info for name, file_info in cached.items()
+                                  if self.path_filter(name)}
+                    plan.append((None, cached, 0))
+                    continue
+                if self.path_filter is not None:
+                    key = None
+
+            if (file_format == 'lcov' and lcov_engine == 'mmap' and jobs > 1
+                    and _is_regular_report(filepath)):
+                chunks = split_lcov_chunks(filepath, jobs)
+            else:
+                chunks = [(None, None)]
+            for start, end in chunks:
+                tasks.append(_ParseTask(filepath, file_format, lcov_engine, self.track_lines,
+                                        self.path_filter, start, end, self.summary_only))
+            plan.append((key, None, len(chunks)))
+
+        merger: Union[CoverageReport, SpillingMerge] = self
+        if memory_budget is not None:
+            merger = SpillingMerge(memory_budget, self.track_lines, keep_line_hits)
+            merger.merge(self.files)
+
+        with profiler.phase('parse'):
+            # Results are only prefetched a few at a time within a budget
+            results = _run_tasks(tasks, jobs, 2 * jobs if memory_budget is not None else None)
+            for key, cached, num_tasks in plan:
+                if cached is None:
+                    parsed = CoverageReport(self.track_lines)
+                    for _ in range(num_tasks):
+                        parsed.merge(next(results))
+                    cached = parsed.files
+                    if key is not None:
+                        cache.store(key, cached)
+                merger.merge(cached)
+        if merger is not self:
+            profiler.count('spilled_runs', len(merger.runs) + 1 if merger.runs else 0)
+            with profiler.phase('merge'):
+                self.files = merger.finish()
+        profiler.count('parse_tasks', len(tasks))
+
+    def restrict_to_diff(self, diff: 'DiffIndex') -> None:
+        """Replace every file's coverage with the coverage of its changed lines.
+
+        Requires line-level data (``track_lines``). Files without any
+        instrumented changed line are dropped.
+        """
+        patch_files = FileTable()
+        for filename, file_info in self.files.items():
+            changed = diff.lookup(filename)
+            if not changed or file_info.line_hits is None:
+                continue
+
+            line_hits = file_info.line_hits
+            patch_hits = LineHits()
+            for number in changed:
+                if number < len(line_hits) and line_hits.instrumented[number]:
+                    patch_hits.add(number, line_hits.hits[number])
+            if not len(patch_hits):
+                continue
+            patch_hits.trim()
+
+            lines_total = patch_hits.lines_total
+            lines_covered = patch_hits.lines_covered
+            patch_files[filename] = FileCoverage(
+                filename=filename,
+                line_coverage=(lines_covered / lines_total) * 100,
+                branch_coverage=None,
+                function_coverage=None,
+                lines_covered=lines_covered,
+                lines_total=lines_total,
+                line_hits=patch_hits
+            )
+        self.files = patch_files
+
     def filter_files(self, exclude_pattern: Optional[str] = None) -> None:
         """Remove files matching exclude pattern."""
         if not exclude_pattern:
             return
 
         regex = re.compile(exclude_pattern)
-        files_to_remove = [f for f in self.files.keys() if regex.search(f)]
-
-        for f in files_to_remove:
-            del self.files[f]
+        self.files.remove([f for f in self.files if regex.search(f)])
 
 
 class LcovReport(CoverageReport):
     """Parse LCOV format coverage reports."""
 
-    def parse(self, filepath: str) -> None:
-        """Parse LCOV file format."""
-        with open(filepath, 'r') as f:
-            current_file = None
-            lines_found = 0
-            lines_hit = 0
+    def iter_records(self, source: ReportSource) -> Iterator[FileCoverage]:
+        """Yield the entry of each LCOV record at its end_of_record line."""
+        with _open_source(source) as stream:
+            f = io.TextIOWrapper(stream, encoding='utf-8')
+            try:
+                yield from self._iter_lines(f)
+            finally:
+                f.detach()
+
+    def _iter_lines(self, f: Iterable[str]) -> Iterator[FileCoverage]:
+        """Parse LCOV records from text lines."""
+        summary_only = self.summary_only
+        current_file = None
+        lines_found = 0
+        lines_hit = 0
+        functions_found = 0
+        functions_hit = None
+        line_hits = LineHits()
+        function_hits: Dict[str, int] = {}
+        # DA lines set aside in summary-only mode, and which totals were seen
+        deferred: List[str] = []
+        has_lf = has_lh = False
 
-            for line in f:
-                line = line.strip()
+        for line in f:
+            line = line.strip()
 
-                if line.startswith('SF:'):
-                    current_file = line[3:]
+            if summary_only:
+                # Line and branch data only matter to records without totals
+                if line.startswith('DA:'):
+                    if not (has_lf and has_lh):
+                        deferred.append(line)
+                    continue
+                if line.startswith('BRDA:'):
+                    continue
 
-                elif line.startswith('FN:'):
-                    # Function definition: FN:<line>,<function name>
-                    pass
+            if line.startswith('SF:'):
+                current_file = line[3:]
+                if not self.wants(current_file):
+                    current_file = None
 
-                elif line.startswith('FNDA:'):
-                    # Function data: FNDA:<hit count>,<function name>
-                    pass
+            elif line.startswith('FN:'):
+                # Function definition: FN:<line>,<function name>
+                parts = line[3:].split(',', 1)
+                if len(parts) == 2:
+                    function_hits.setdefault(parts[1], 0)
 
-                elif line.startswith('FNF:'):
-                    # Functions found
-                    pass
+            elif line.startswith('FNDA:'):
+                # Function data: FNDA:<hit count>,<function name>
+                parts = line[5:].split(',', 1)
+                if len(parts) == 2:
+                    count = int(parts[0])
+                    if count > function_hits.get(parts[1], 0):
+                        function_hits[parts[1]] = count
+                    else:
+                        function_hits.setdefault(parts[1], 0)
 
-                elif line.startswith('FNH:'):
-                    # Functions hit
-                    pass
+            elif line.startswith('FNF:'):
+                # Functions found
+                functions_found = int(line[4:])
 
-                elif line.startswith('DA:'):
-                    # Line data: DA:<line number>,<hit count>
-                    parts = line[3:].split(',')
-                    if len(parts) == 2:
-                        hit_count = int(parts[1])
-                        lines_found += 1
-                        if hit_count > 0:
+            elif line.startswith('FNH:'):
+                # Functions hit
+                functions_hit = int(line[4:])
+
+            elif line.startswith('DA:'):
+                # Line data: DA:<line number>,<hit count>
+                parts = line[3:].split(',')
+                if len(parts) == 2:
+                    hit_count = int(parts[1])
+                    lines_found += 1
+                    if hit_count > 0:
+                        lines_hit += 1
+                    if self.track_lines:
+                        try:
+                            line_hits.add(int(parts[0]), hit_count)
+                        except ValueError:
+                            pass
+
+            elif line.startswith('LF:'):
+                # Lines found
+                lines_found = int(line[3:])
+                has_lf = True
+                if has_lh:
+                    deferred = []
+
+            elif line.startswith('LH:'):
+                # Lines hit
+                lines_hit = int(line[3:])
+                has_lh = True
+                if has_lf:
+                    # Both totals are trusted, so the line data is not needed
+                    deferred = []
+
+            elif line == 'end_of_record':
+                if current_file and deferred and not (has_lf and has_lh):
+                    # No totals to trust, so count the line data after all
+                    self.summary_fallbacks += 1
+                    found, hit = self._count_lines(deferred, line_hits)
+                    if not has_lf:
+                        lines_found = found
+                    if not has_lh:
+                        lines_hit = hit
+                elif (summary_only and has_lf and has_lh and functions_found
+                      and functions_hit is not None):
+                    # The function totals are trusted too, as by MmapLcovReport
+                    function_hits = {}
+                if current_file and lines_found > 0:
+                    yield self._build_file(
+                        current_file, lines_found, lines_hit, functions_found,
+                        functions_hit, line_hits, function_hits
+                    )
+                current_file = None
+                lines_found = 0
+                lines_hit = 0
+                functions_found = 0
+                functions_hit = None
+                line_hits = LineHits()
+                function_hits = {}
+                deferred = []
+                has_lf = has_lh = False
+
+    def _count_lines(self, lines: Iterable[str], line_hits: LineHits) -> Tuple[int, int]:
+        """Return the lines found and hit by DA lines, recording their hits."""
+        lines_found = 0
+        lines_hit = 0
+        for line in lines:
+            parts = line[3:].split(',')
+            if len(parts) == 2:
+                hit_count = int(parts[1])
+                lines_found += 1
+                if hit_count > 0:
+                    lines_hit += 1
+                if self.track_lines:
+                    try:
+                        line_hits.add(int(parts[0]), hit_count)
+                    except ValueError:
+                        pass
+        return lines_found, lines_hit
+
+    @staticmethod
+    def _build_file(filename: str, lines_found: int, lines_hit: int,
+                    functions_found: int, functions_hit: Optional[int],
+                    line_hits: LineHits, function_hits: Dict[str, int]) -> FileCoverage:
+        """Build the entry for one LCOV record.
+
+        LF/LH and FNF/FNH totals take precedence over counts derived from the
+        individual DA and FNDA records, as in the LCOV tools.
+        """
+        coverage = (lines_hit / lines_found) * 100
+
+        if functions_found > 0:
+            if functions_hit is None:
+                functions_hit = sum(1 for count in function_hits.values() if count > 0)
+            function_coverage = (functions_hit / functions_found) * 100
+        else:
+            function_coverage = _function_coverage(function_hits)
+
+        return FileCoverage(
+            filename=filename,
+            line_coverage=coverage,
+            branch_coverage=None,
+            function_coverage=function_coverage,
+            lines_covered=lines_hit,
+            lines_total=lines_found,
+            line_hits=line_hits.trim() if len(line_hits) else None,
+            function_hits=function_hits or None
+        )
+
+
+# Block size used when scanning LCOV data as bytes. Blocks are always cut at a
+# newline so that no record line is ever split between two blocks.
+LCOV_BLOCK_SIZE = 1024 * 1024
+
+# LCOV files smaller than this are never split across worker processes.
+LCOV_MIN_CHUNK_SIZE = 32 * 1024 * 1024
+
+# Default size budget of the parsed-report cache.
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+
+# Estimated memory per merged file entry, per hit-map line and per function,
+# used to keep merges within --memory-budget.
+ENTRY_MEMORY = 200
+LINE_MEMORY = 5
+FUNCTION_MEMORY = 120
+
+# Spilled merge runs are written and read back in blocks of about this size.
+RUN_BLOCK_SIZE = 1024 * 1024
+
+# Polls in a row on which watch mode retries a report that fails to parse
+# before leaving it alone until it changes.
+WATCH_PARSE_ATTEMPTS = 3
+
+# Report path that stands for standard input.
+STDIN_PATH = '-'
+
+# Bytes read from the start of a report to detect its format.
+SNIFF_SIZE = 4096
+
+# Characters read at a time by the streaming JSON reader.
+JSON_CHUNK_SIZE = 1024 * 1024
+
+# Suffixes picked up when a directory is given as input.
+REPORT_SUFFIXES = ('.lcov', '.info', '.json', '.xml', '.coverage')
+
+# Record prefixes the byte-level LCOV engine acts on, keyed by their first three
+# bytes so that each line needs a single dict lookup. Branch records are
+# ignored just like in LcovReport.
+(_LCOV_SF, _LCOV_DA, _LCOV_LF, _LCOV_LH, _LCOV_FN, _LCOV_FNDA, _LCOV_FNF,
+ _LCOV_FNH, _LCOV_END) = range(9)
+_LCOV_PREFIXES = {
+    b'SF:': _LCOV_SF,
+    b'DA:': _LCOV_DA,
+    b'LF:': _LCOV_LF,
+    b'LH:': _LCOV_LH,
+    b'FN:': _LCOV_FN,
+    b'FND': _LCOV_FNDA,
+    b'FNF': _LCOV_FNF,
+    b'FNH': _LCOV_FNH,
+    b'end': _LCOV_END,
+}
+
+
+def _iter_line_blocks(buf, start: int, end: int) -> Iterator[bytes]:
+    """Yield newline-aligned slices of ``buf[start:end]``."""
+    while start < end:
+        stop = min(start + LCOV_BLOCK_SIZE, end)
+        if stop < end:
+            newline = buf.rfind(b'\n', start, stop)
+            if newline < 0:
+                # A single line longer than the block size
+                newline = buf.find(b'\n', stop, end)
+            stop = end if newline < 0 else newline + 1
+        yield buf[start:stop]
+        start = stop
+
+
+def _find_line(buf, prefix: bytes, start: int, end: int) -> int:
+    """Return the offset of the first line in ``buf[start:end]`` starting with
+    ``prefix``, or -1. ``start`` must be at the beginning of a line."""
+    if buf[start:start + len(prefix)] == prefix:
+        return start
+    pos = buf.find(b'\n' + prefix, start, end)
+    return pos + 1 if pos >= 0 else -1
+
+
+def _rfind_line(buf, prefix: bytes, start: int, end: int) -> int:
+    """Return the offset of the last line in ``buf[start:end]`` starting with
+    ``prefix``, or -1. ``start`` must be at the beginning of a line."""
+    pos = buf.rfind(b'\n' + prefix, start, end)
+    if pos >= 0:
+        return pos + 1
+    return start if buf[start:start + len(prefix)] == prefix else -1
+
+
+def _read_total(buf, prefix: bytes, start: int, end: int) -> Optional[int]:
+    """Return the value of the last ``prefix`` line in ``buf[start:end]``, or
+    None if there is no such line."""
+    pos = _rfind_line(buf, prefix, start, end)
+    if pos < 0:
+        return None
+    line_end = buf.find(b'\n', pos, end)
+    return int(buf[pos + len(prefix):end if line_end < 0 else line_end])
+
+
+def _find_record_end(buf, start: int, end: int) -> int:
+    """Return the offset just past the first ``end_of_record`` line in
+    ``buf[start:end]``, or -1. ``start`` must be at the beginning of a line."""
+    pos = start
+    while True:
+        line_start = _find_line(buf, b'end_of_record', pos, end)
+        if line_start < 0:
+            return -1
+        line_end = buf.find(b'\n', line_start, end)
+        line_end = end if line_end < 0 else line_end + 1
+        if buf[line_start:line_end].strip() == b'end_of_record':
+            return line_end
+        pos = line_end
+
+
+def _rfind_record_end(buf: bytes) -> int:
+    """Return the offset just past the last complete ``end_of_record`` line in
+    ``buf``, or 0 if there is none."""
+    pos = len(buf)
+    while True:
+        marker = buf.rfind(b'\nend_of_record', 0, pos)
+        if marker < 0:
+            return 0
+        line_end = buf.find(b'\n', marker + 1)
+        if line_end >= 0 and buf[marker + 1:line_end].strip() == b'end_of_record':
+            return line_end + 1
+        pos = marker
+
+
+class MmapLcovReport(LcovReport):
+    """Parse LCOV reports by memory-mapping the file and scanning it as bytes.
+
+    Produces the same results as LcovReport, but dispatches on each line's
+    prefix with a single lookup and converts hit counts straight from bytes.
+    """
+
+    def iter_records(self, source: ReportSource) -> Iterator[FileCoverage]:
+        """Yield the entry of each LCOV record, scanning a memory map.
+
+        Compressed files and streams cannot be mapped; they are read in
+        newline-aligned blocks and scanned the same way.
+        """
+        if isinstance(source, str) and _is_regular_report(source):
+            yield from self.iter_range(source)
+            return
+
+        with _open_source(source) as stream:
+            if self.summary_only:
+                for block in self._iter_stream_blocks(stream):
+                    yield from self._iter_summaries(block, 0, len(block))
+            else:
+                yield from self._iter_blocks(self._iter_stream_blocks(stream))
+
+    def _iter_stream_blocks(self, stream: BinaryIO) -> Iterator[bytes]:
+        """Yield record-aligned blocks read from a binary stream."""
+        carry = b''
+        while True:
+            data = stream.read(LCOV_BLOCK_SIZE)
+            if not data:
+                break
+            buf = carry + data
+            cut = _rfind_record_end(buf)
+            carry = buf[cut:]
+            if cut:
+                yield from self._filter_block(buf[:cut])
+        if carry:
+            yield from self._filter_block(carry)
+
+    def _filter_block(self, block: bytes) -> Iterator[bytes]:
+        """Yield the wanted parts of a record-aligned block."""
+        if self.path_filter is None:
+            yield block
+        else:
+            yield from self._iter_wanted_records(block, 0, len(block))
+
+    def parse_range(self, filepath: str, start: int = 0,
+                    end: Optional[int] = None) -> None:
+        """Parse the records between byte offsets ``start`` and ``end``.
+
+        Both offsets must fall on record boundaries (see split_lcov_chunks).
+        """
+        for file_coverage in self.iter_range(filepath, start, end):
+            self.add_file(file_coverage)
+
+    def iter_range(self, filepath: str, start: int = 0,
+                   end: Optional[int] = None) -> Iterator[FileCoverage]:
+        """Yield the entries of the records between ``start`` and ``end``."""
+        with open(filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if end is None or end > size:
+                end = size
+            if start >= end:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                if self.summary_only:
+                    yield from self._iter_summaries(mm, start, end)
+                elif self.path_filter is None:
+                    yield from self._iter_blocks(_iter_line_blocks(mm, start, end))
+                else:
+                    yield from self._iter_blocks(self._iter_wanted_records(mm, start, end))
+
+    def _iter_wanted_records(self, buf, start: int, end: int) -> Iterator[bytes]:
+        """Yield the records of ``buf[start:end]`` whose SF file is wanted.
+
+        Records are located and their SF line is checked with ``find`` on the
+        raw buffer, so skipped records are never split into lines.
+        """
+        while start < end:
+            record_end = _find_record_end(buf, start, end)
+            if record_end < 0:
+                record_end = end
+
+            source = _find_line(buf, b'SF:', start, record_end)
+            if source >= 0:
+                line_end = buf.find(b'\n', source, record_end)
+                line_end = record_end if line_end < 0 else line_end + 1
+                if _find_line(buf, b'SF:', line_end, record_end) >= 0:
+                    # Several SF lines in one record; let the line parser decide
+                    yield buf[start:record_end]
+                elif self.wants(buf[source + 3:line_end].strip().decode('utf-8')):
+                    yield buf[start:record_end]
+            start = record_end
+
+    def _iter_summaries(self, buf, start: int, end: int) -> Iterator[FileCoverage]:
+        """Yield the entries of the records in ``buf[start:end]`` from their
+        LF/LH and FNF/FNH totals alone.
+
+        Only the SF and total lines of each record are located, with ``find``
+        and ``rfind`` on the raw buffer, so DA and BRDA lines are never split
+        or converted. Records without the totals are parsed in full.
+        """
+        while start < end:
+            record_end = _find_record_end(buf, start, end)
+            if record_end < 0:
+                return
+            record_start, start = start, record_end
+
+            source = _find_line(buf, b'SF:', record_start, record_end)
+            if source < 0:
+                continue
+            line_end = buf.find(b'\n', source, record_end)
+            filename = buf[source + 3:line_end].strip().decode('utf-8')
+            if not filename or not self.wants(filename):
+                continue
+
+            lines_found = _read_total(buf, b'LF:', record_start, record_end)
+            lines_hit = _read_total(buf, b'LH:', record_start, record_end)
+            functions_found = _read_total(buf, b'FNF:', record_start, record_end) or 0
+            functions_hit = _read_total(buf, b'FNH:', record_start, record_end)
+            if (lines_found is None or lines_hit is None or
+                    _find_line(buf, b'SF:', line_end + 1, record_end) >= 0):
+                self.summary_fallbacks += 1
+                yield from self._iter_blocks((buf[record_start:record_end],))
+                continue
+            if lines_found <= 0:
+                continue
+
+            # Function records are only read when the function totals are incomplete
+            function_hits: Dict[str, int] = {}
+            if not functions_found or functions_hit is None:
+                function_hits = self._scan_functions(buf, record_start, record_end)
+            yield self._build_file(filename, lines_found, lines_hit, functions_found,
+                                   functions_hit, LineHits(), function_hits)
+
+    @staticmethod
+    def _scan_functions(buf, start: int, end: int) -> Dict[str, int]:
+        """Return the per-function hit counts of the FN and FNDA lines in
+        ``buf[start:end]``."""
+        function_hits: Dict[str, int] = {}
+        pos = _find_line(buf, b'FN', start, end)
+        while pos >= 0:
+            line_end = buf.find(b'\n', pos, end)
+            line_end = end if line_end < 0 else line_end + 1
+            line = buf[pos:line_end].rstrip()
+            if line.startswith(b'FN:'):
+                parts = line[3:].split(b',', 1)
+                if len(parts) == 2:
+                    function_hits.setdefault(parts[1].decode('utf-8'), 0)
+            elif line.startswith(b'FNDA:'):
+                parts = line[5:].split(b',', 1)
+                if len(parts) == 2:
+                    name = parts[1].decode('utf-8')
+                    count = int(parts[0])
+                    if count > function_hits.get(name, 0):
+                        function_hits[name] = count
+                    else:
+                        function_hits.setdefault(name, 0)
+            pos = _find_line(buf, b'FN', line_end, end) if line_end < end else -1
+        return function_hits
+
+    def _iter_blocks(self, blocks: Iterable[bytes]) -> Iterator[FileCoverage]:
+        """Parse LCOV records from newline-aligned byte blocks."""
+        prefixes = _LCOV_PREFIXES
+        track_lines = self.track_lines
+        current_file = None
+        lines_found = 0
+        lines_hit = 0
+        functions_found = 0
+        functions_hit = None
+        line_hits = LineHits()
+        line_mask = line_hits.instrumented
+        line_counts = line_hits.hits
+        capacity = 0
+        function_hits: Dict[str, int] = {}
+
+        for block in blocks:
+            for line in block.splitlines():
+                kind = prefixes.get(line[:3])
+                if kind is None:
+                    if not line[:1].isspace():
+                        continue
+                    line = line.strip()
+                    kind = prefixes.get(line[:3])
+                    if kind is None:
+                        continue
+
+                if kind == _LCOV_DA:
+                    # Line data: DA:<line number>,<hit count>. Fields are
+                    # located by offset; records with a checksum are skipped
+                    comma = line.find(b',', 3)
+                    if comma < 0 or line.find(b',', comma + 1) >= 0:
+                        continue
+                    lines_found += 1
+                    if line.endswith(b',0'):
+                        count = 0
+                    else:
+                        count = int(line[comma + 1:])
+                        if count > 0:
                             lines_hit += 1
+                    if not track_lines:
+                        continue
+                    try:
+                        number = int(line[3:comma])
+                    except ValueError:
+                        continue
+                    # Inlined LineHits.add() for lines within the current map
+                    if 0 <= number < capacity:
+                        line_mask[number] = 1
+                        if count > line_counts[number]:
+                            line_counts[number] = (count if count < MAX_HIT_COUNT
+                                                   else MAX_HIT_COUNT)
+                    else:
+                        line_hits.add(number, count)
+                        capacity = len(line_mask)
+
+                elif kind == _LCOV_SF:
+                    current_file = line[3:].rstrip().decode('utf-8')
+                    if not self.wants(current_file):
+                        current_file = None
 
-                elif line.startswith('LF:'):
-                    # Lines found
+                elif kind == _LCOV_LF:
                     lines_found = int(line[3:])
 
-                elif line.startswith('LH:'):
-                    # Lines hit
+                elif kind == _LCOV_LH:
                     lines_hit = int(line[3:])
 
-                elif line == 'end_of_record':
+                elif kind == _LCOV_FN:
+                    parts = line[3:].rstrip().split(b',', 1)
+                    if len(parts) == 2:
+                        function_hits.setdefault(parts[1].decode('utf-8'), 0)
+
+                elif kind == _LCOV_FNDA:
+                    if line[3:5] != b'A:':
+                        continue
+                    parts = line[5:].rstrip().split(b',', 1)
+                    if len(parts) == 2:
+                        name = parts[1].decode('utf-8')
+                        count = int(parts[0])
+                        if count > function_hits.get(name, 0):
+                            function_hits[name] = count
+                        else:
+                            function_hits.setdefault(name, 0)
+
+                elif kind == _LCOV_FNF:
+                    if line[3:4] == b':':
+                        functions_found = int(line[4:])
+
+                elif kind == _LCOV_FNH:
+                    if line[3:4] == b':':
+                        functions_hit = int(line[4:])
+
+                elif line.rstrip() == b'end_of_record':
                     if current_file and lines_found > 0:
-                        coverage = (lines_hit / lines_found) * 100
-                        self.files[current_file] = FileCoverage(
-                            filename=current_file,
-                            line_coverage=coverage,
-                            branch_coverage=None,
-                            function_coverage=None,
-                            lines_covered=lines_hit,
-                            lines_total=lines_found
+                        yield self._build_file(
+                            current_file, lines_found, lines_hit, functions_found,
+                            functions_hit, line_hits, function_hits
                         )
                     current_file = None
                     lines_found = 0
                     lines_hit = 0
+                    functions_found = 0
+                    functions_hit = None
+                    line_hits = LineHits()
+                    line_mask = line_hits.instrumented
+                    line_counts = line_hits.hits
+                    capacity = 0
+                    function_hits = {}
+
+
+class JsonStreamReader:
+    """Incremental reader for large JSON documents.
+
+    Objects are walked one key at a time with iter_keys(), and only the values
+    the caller asks for are decoded, so memory is bounded by the largest
+    single value rather than by the whole document.
+    """
+
+    WHITESPACE = re.compile(r'[ \t\r\n]*')
+    # An array without strings or nested values; group 1 matches once it is closed
+    FLAT_ARRAY = re.compile(r'\[[^\[\]{}"]*(\])?')
+
+    def __init__(self, f, chunk_size: int = JSON_CHUNK_SIZE):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> None:
+        """Read more data, dropping the part of the buffer already consumed."""
+        # Read at least as much as is buffered so that a value spanning many
+        # chunks is re-decoded a logarithmic number of times
+        size = max(self._chunk_size, len(self._buf) - self._pos)
+        data = self._file.read(size)
+        if not data:
+            self._eof = True
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            buf = self._buf
+            pos = self.WHITESPACE.match(buf, self._pos).end()
+            self._pos = pos
+            if pos < len(buf) or self._eof:
+                return buf[pos] if pos < len(buf) else ''
+            self._fill()
+
+    def _expect(self, char: str) -> None:
+        """Consume ``char`` or raise ValueError."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found}' in JSON stream")
+        self._pos += 1
+
+    def read_value(self):
+        """Decode and return the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def skip_value(self) -> None:
+        """Consume the next JSON value without keeping it.
+
+        Flat arrays such as line number lists are skipped by scanning for the
+        closing bracket instead of being decoded.
+        """
+        if self.peek() == '[':
+            while True:
+                match = self.FLAT_ARRAY.match(self._buf, self._pos)
+                if match.group(1):
+                    self._pos = match.end()
+                    return
+                if match.end() < len(self._buf) or self._eof:
+                    break
+                self._fill()
+        self.read_value()
+
+    def iter_keys(self) -> Iterator[str]:
+        """Walk the object at the current position, yielding each key.
+
+        The caller must consume the key's value (read_value, skip_value or a
+        nested iter_keys) before advancing the iterator.
+        """
+        self._expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError("Expected a string key in JSON stream")
+            self._expect(':')
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or '}}' but found '{char}' in JSON stream")
 
 
 class CoveragePyReport(CoverageReport):
     """Parse coverage.py JSON format reports."""
 
-    def parse(self, filepath: str) -> None:
-        """Parse coverage.py JSON file."""
-        with open(filepath, 'r') as f:
-            data = json.load(f)
+    # Members of a file entry decoded when per-line hit maps are tracked
+    _line_fields = ('executed_lines', 'missing_lines')
 
-        files_data = data.get('files', {})
+    def iter_records(self, source: ReportSource) -> Iterator[FileCoverage]:
+        """Yield the entry of each ``files`` member as it is decoded."""
+        with _open_source(source) as stream:
+            f = io.TextIOWrapper(stream, encoding='utf-8')
+            try:
+                yield from self._iter_document(JsonStreamReader(f))
+            finally:
+                f.detach()
 
-        for filename, file_data in files_data.items():
-            summary = file_data.get('summary', {})
+    def _iter_document(self, reader: 'JsonStreamReader') -> Iterator[FileCoverage]:
+        """Parse the top-level object of a coverage.py JSON document."""
+        for key in reader.iter_keys():
+            if key != 'files' or reader.peek() != '{':
+                reader.skip_value()
+                continue
 
-            lines_total = summary.get('num_statements', 0)
-            lines_covered = summary.get('covered_lines', 0)
+            # Decode one file entry at a time instead of the whole document
+            for filename in reader.iter_keys():
+                if not self.wants(filename):
+                    reader.skip_value()
+                    continue
+                if reader.peek() != '{':
+                    yield self._build_entry(filename, reader.read_value())
+                    continue
+                # Only the summary is decoded, plus the line lists when hit
+                # maps are tracked; contexts and the rest are skipped
+                wanted = self._line_fields if self.track_lines and not self.summary_only else ()
+                file_data = {}
+                for field_name in reader.iter_keys():
+                    if field_name == 'summary' or field_name in wanted:
+                        file_data[field_name] = reader.read_value()
+                    else:
+                        reader.skip_value()
+                yield self._build_entry(filename, file_data)
 
-            if lines_total == 0:
-                line_coverage = 0.0
-            else:
-                line_coverage = (lines_covered / lines_total) * 100
+    def iter_contexts(self, source: ReportSource) -> Iterator[Tuple[str, Dict[str, List[str]]]]:
+        """Yield (filename, contexts) for every file with per-line contexts.
 
-            branch_coverage = None
-            if 'num_branches' in summary and summary['num_branches'] > 0:
-                branches_covered = summary.get('covered_branches', 0)
-                branch_coverage = (branches_covered / summary['num_branches']) * 100
+        ``contexts`` maps line numbers (as strings) to the labels of the
+        contexts, usually tests, that ran the line; it is present in reports
+        written with ``coverage json --show-contexts``. Only that member of
+        each entry is decoded.
+        """
+        with _open_source(source) as stream:
+            f = io.TextIOWrapper(stream, encoding='utf-8')
+            try:
+                reader = JsonStreamReader(f)
+                for key in reader.iter_keys():
+                    if key != 'files' or reader.peek() != '{':
+                        reader.skip_value()
+                        continue
+                    for filename in reader.iter_keys():
+                        if not self.wants(filename) or reader.peek() != '{':
+                            reader.skip_value()
+                            continue
+                        contexts = None
+                        for field_name in reader.iter_keys():
+                            if field_name == 'contexts':
+                                contexts = reader.read_value()
+                            else:
+                                reader.skip_value()
+                        if contexts:
+                            yield filename, contexts
+            finally:
+                f.detach()
 
-            self.files[filename] = FileCoverage(
-                filename=filename,
-                line_coverage=line_coverage,
-                branch_coverage=branch_coverage,
-                function_coverage=None,
-                lines_covered=lines_covered,
-                lines_total=lines_total
-            )
+    def _build_entry(self, filename: str, file_data: Dict) -> FileCoverage:
+        """Build the entry for a single ``files`` member."""
+        summary = file_data.get('summary', {})
+
+        lines_total = summary.get('num_statements', 0)
+        lines_covered = summary.get('covered_lines', 0)
+
+        if lines_total == 0:
+            line_coverage = 0.0
+        else:
+            line_coverage = (lines_covered / lines_total) * 100
+
+        branch_coverage = None
+        if 'num_branches' in summary and summary['num_branches'] > 0:
+            branches_covered = summary.get('covered_branches', 0)
+            branch_coverage = (branches_covered / summary['num_branches']) * 100
+
+        line_hits = None
+        if self.track_lines and ('executed_lines' in file_data or
+                                 'missing_lines' in file_data):
+            line_hits = LineHits()
+            for number in file_data.get('missing_lines', ()):
+                line_hits.add(number, 0)
+            for number in file_data.get('executed_lines', ()):
+                line_hits.add(number, 1)
+            line_hits.trim()
+
+        return FileCoverage(
+            filename=filename,
+            line_coverage=line_coverage,
+            branch_coverage=branch_coverage,
+            function_coverage=None,
+            lines_covered=lines_covered,
+            lines_total=lines_total,
+            line_hits=line_hits
+        )
 
 
 class CoberturaReport(CoverageReport):
-    """Parse Cobertura XML format reports."""
+    """Parse Cobertura XML format reports.
+
+    By default the report is read incrementally with ``iterparse``: each
+    ``<class>`` element is summarised as soon as it closes and is then
+    detached from the tree, so peak memory stays flat regardless of how large
+    the report is. Pass ``streaming=False`` to build the full tree instead.
+
+    With ``summary_only``, classes carrying ``lines-valid`` and
+    ``lines-covered`` attributes take their totals from them and their
+    ``<line>`` elements are not looked at. Standard Cobertura only puts those
+    totals on the root ``<coverage>`` element; when it has them, the other
+    classes count their ``<line>`` elements without reading them and take
+    the covered lines from their ``line-rate``.
+    """
+
+    def __init__(self, streaming: bool = True, track_lines: bool = True,
+                 path_filter: Optional[Callable[[str], bool]] = None,
+                 summary_only: bool = False):
+        super().__init__(track_lines, path_filter, summary_only)
+        self.streaming = streaming
+
+    def iter_records(self, source: ReportSource) -> Iterator[FileCoverage]:
+        """Yield the entry of each ``<class>`` element.
+
+        In streaming mode each entry is yielded as soon as its element closes.
+        """
+        with _open_source(source) as stream:
+            if self.streaming:
+                yield from self._iter_stream(stream)
+            else:
+                yield from self._iter_tree(stream)
+
+    def _iter_stream(self, filepath: ReportSource) -> Iterator[FileCoverage]:
+        """Parse Cobertura XML file from start/end events."""
+        # Stack of currently open elements; the parent of a closing element is
+        # always stack[-1] once the element itself has been popped.
+        stack: List[ET.Element] = []
+        package_depth = 0
+        rates_trusted = False
+        source_file: Optional[ET.Element] = None
+        totals: Optional[Tuple[Optional[int], int]] = None
+        lines_total = 0
+        lines_covered = 0
+        line_hits = LineHits()
+
+        for event, elem in ET.iterparse(filepath, events=('start', 'end')):
+            if event == 'start':
+                if not stack:
+                    rates_trusted = self._rates_trusted(elem)
+                stack.append(elem)
+                if elem.tag == 'package':
+                    package_depth += 1
+                elif (elem.tag == 'class' and package_depth and source_file is None
+                      and self.wants(elem.get('filename', ''))):
+                    source_file = elem
+                    totals = self._summary_totals(elem, rates_trusted)
+                    lines_total = 0
+                    lines_covered = 0
+                    line_hits = LineHits()
+                continue
 
-    def parse(self, filepath: str) -> None:
-        """Parse Cobertura XML file."""
+            stack.pop()
+            tag = elem.tag
+
+            if tag == 'line':
+                if source_file is not None and totals is None:
+                    hits = int(elem.get('hits', 0))
+                    lines_total += 1
+                    if hits > 0:
+                        lines_covered += 1
+                    if self.track_lines:
+                        line_hits.add(int(elem.get('number', 0)), hits)
+                elif source_file is not None and totals[0] is None:
+                    lines_total += 1
+
+            elif tag == 'class':
+                if elem is source_file:
+                    if totals is not None:
+                        lines_covered, lines_total = self._class_totals(elem, totals,
+                                                                        lines_total)
+                    yield self._build_class(elem, lines_covered, lines_total, line_hits)
+                    source_file = None
+
+            elif tag == 'package':
+                package_depth -= 1
+
+            # Everything below a <class> has been summarised by now, and the
+            # summary never looks at anything outside of it, so drop the
+            # subtree to keep memory flat.
+            if stack and (source_file is None or tag == 'line'):
+                elem.clear()
+                stack[-1].remove(elem)
+
+    def _iter_tree(self, filepath: ReportSource) -> Iterator[FileCoverage]:
+        """Parse Cobertura XML file by loading the whole document tree."""
         tree = ET.parse(filepath)
         root = tree.getroot()
+        rates_trusted = self._rates_trusted(root)
 
         for package in root.findall('.//package'):
             for source_file in package.findall('.//class'):
-                filename = source_file.get('filename', '')
-                line_rate = float(source_file.get('line-rate', 0))
-                branch_rate = float(source_file.get('branch-rate', 0))
+                if not self.wants(source_file.get('filename', '')):
+                    continue
+
+                totals = self._summary_totals(source_file, rates_trusted)
+                if totals is not None:
+                    num_lines = len(source_file.findall('.//line')) if totals[0] is None else 0
+                    lines_covered, lines_total = self._class_totals(source_file, totals,
+                                                                    num_lines)
+                    yield self._build_class(source_file, lines_covered, lines_total,
+                                            LineHits())
+                    continue
 
                 # Count lines
                 lines_total = 0
                 lines_covered = 0
+                line_hits = LineHits()
 
                 for line in source_file.findall('.//line'):
                     hits = int(line.get('hits', 0))
                     lines_total += 1
                     if hits > 0:
                         lines_covered += 1
+                    if self.track_lines:
+                        line_hits.add(int(line.get('number', 0)), hits)
 
-                if lines_total == 0:
-                    lines_total = int(source_file.get('complexity', 1))
+                yield self._build_class(source_file, lines_covered, lines_total, line_hits)
 
-                line_coverage = line_rate * 100
+    def _rates_trusted(self, root: ET.Element) -> bool:
+        """Return True if summary-only mode may take the covered lines of
+        classes from their line-rate, as the root ``<coverage>`` element
+        carries the totals of a standard report."""
+        return (self.summary_only and root.tag == 'coverage'
+                and root.get('lines-valid') is not None
+                and root.get('lines-covered') is not None)
 
-                self.files[filename] = FileCoverage(
-                    filename=filename,
-                    line_coverage=line_coverage,
-                    branch_coverage=branch_rate * 100 if branch_rate > 0 else None,
-                    function_coverage=None,
-                    lines_covered=lines_covered,
-                    lines_total=lines_total
-                )
+    def _summary_totals(self, source_file: ET.Element,
+                        rates_trusted: bool) -> Optional[Tuple[Optional[int], int]]:
+        """Return the (covered, total) lines of a <class> element in
+        summary-only mode, or None if its lines have to be read.
 
+        Covered is None, and total 0, when the class only has a line-rate:
+        its ``<line>`` elements are then counted but not read.
+        """
+        if not self.summary_only:
+            return None
+        lines_valid = source_file.get('lines-valid')
+        lines_covered = source_file.get('lines-covered')
+        if lines_valid is not None and lines_covered is not None:
+            return int(lines_covered), int(lines_valid)
+        if rates_trusted and source_file.get('line-rate') is not None:
+            return None, 0
+        self.summary_fallbacks += 1
+        return None
 
-def detect_format(filepath: str) -> str:
-    """Auto-detect coverage report format from file extension and content."""
-    path = Path(filepath)
-    suffix = path.suffix.lower()
-
-    if suffix == '.lcov':
-        return 'lcov'
-    elif suffix == '.json':
-        # Check if it's coverage.py JSON
-        try:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-                if 'files' in data and isinstance(data['files'], dict):
-                    return 'coverage-py'
-        except:
-            pass
-    elif suffix in ['.xml', '.coverage']:
-        return 'cobertura'
+    @staticmethod
+    def _class_totals(source_file: ET.Element, totals: Tuple[Optional[int], int],
+                      num_lines: int) -> Tuple[int, int]:
+        """Return the (covered, total) lines of a class from its summary
+        totals, given the number of its <line> elements."""
+        if totals[0] is not None:
+            return totals[0], totals[1]
+        return round(float(source_file.get('line-rate')) * num_lines), num_lines
 
-    # Default fallback
-    return 'lcov'
+    @staticmethod
+    def _build_class(source_file: ET.Element, lines_covered: int,
+                     lines_total: int, line_hits: LineHits) -> FileCoverage:
+        """Build the entry for a single <class> element."""
+        filename = source_file.get('filename', '')
+        line_rate = float(source_file.get('line-rate', 0))
+        branch_rate = float(source_file.get('branch-rate', 0))
 
+        if lines_total == 0:
+            lines_total = int(source_file.get('complexity', 1))
 
-def format_text_output(report: CoverageReport, threshold: int = 80,
-                      min_line_coverage: int = 70, sort_by: str = 'coverage') -> str:
-    """Format coverage report as human-readable text."""
-    output = []
-    output.append("=" * 80)
-    output.append("COVERAGE ANALYSIS REPORT")
-    output.append("=" * 80)
-    output.append("")
-
-    # Summary statistics
-    overall_coverage, total_covered, total_lines = report.get_summary()
-    output.append(f"Overall Coverage: {overall_coverage:.2f}% ({total_covered}/{total_lines} lines)")
-
-    if overall_coverage < threshold:
-        output.append(f"⚠️  WARNING: Coverage below threshold of {threshold}%")
-
-    output.append("")
-    output.append("-" * 80)
-    output.append(f"{'File':<50} {'Coverage':<12} {'Lines':<15}")
-    output.append("-" * 80)
-
-    # Sort files
-    files_list = list(report.files.values())
-    if sort_by == 'file':
-        files_list.sort(key=lambda x: x.filename)
-    elif sort_by == 'lines':
-        files_list.sort(key=lambda x: x.lines_total, reverse=True)
-    else:  # coverage
-        files_list.sort(key=lambda x: x.line_coverage)
-
-    # List files
-    for file_info in files_list:
-        coverage_str = f"{file_info.line_coverage:.1f}%"
-        lines_str = f"{file_info.lines_covered}/{file_info.lines_total}"
-
-        # Add warning indicator for low coverage
-        warning = ""
-        if file_info.line_coverage < min_line_coverage:
-            warning = " ⚠️"
-
-        # Truncate filename for display
-        display_filename = file_info.filename
-        if len(display_filename) > 50:
-            display_filename = "..." + display_filename[-47:]
-
-        output.append(f"{display_filename:<50} {coverage_str:<12} {lines_str:<15}{warning}")
-
-    output.append("-" * 80)
-
-    # Coverage distribution
-    output.append("")
-    output.append("Coverage Distribution:")
-    ranges = [
-        (90, 100, "Excellent (90-100%)"),
-        (80, 90, "Good (80-90%)"),
-        (70, 80, "Fair (70-80%)"),
-        (0, 70, "Poor (<70%)")
-    ]
-
-    for min_cov, max_cov, label in ranges:
-        count = sum(1 for f in report.files.values()
-                   if min_cov <= f.line_coverage < max_cov or
-                   (max_cov == 100 and f.line_coverage >= min_cov))
-        output.append(f"  {label:<25} {count} files")
-
-    output.append("")
-    return "\n".join(output)
-
-
-def format_json_output(report: CoverageReport) -> str:
-    """Format coverage report as JSON."""
-    overall_coverage, total_covered, total_lines = report.get_summary()
-
-    data = {
-        "summary": {
-            "overall_coverage": round(overall_coverage, 2),
-            "lines_covered": total_covered,
-            "lines_total": total_lines,
-            "num_files": len(report.files)
-        },
-        "files": []
-    }
-
-    for file_info in sorted(report.files.values(), key=lambda x: x.filename):
-        file_data = {
-            "filename": file_info.filename,
-            "line_coverage": round(file_info.line_coverage, 2),
-            "lines_covered": file_info.lines_covered,
-            "lines_total": file_info.lines_total
-        }
-        if file_info.branch_coverage is not None:
-            file_data["branch_coverage"] = round(file_info.branch_coverage, 2)
-        if file_info.function_coverage is not None:
-            file_data["function_coverage"] = round(file_info.function_coverage, 2)
+        line_coverage = line_rate * 100
 
-        data["files"].append(file_data)
+        return FileCoverage(
+            filename=filename,
+            line_coverage=line_coverage,
+            branch_coverage=branch_rate * 100 if branch_rate > 0 else None,
+            function_coverage=None,
+            lines_covered=lines_covered,
+            lines_total=lines_total,
+            line_hits=line_hits.trim() if len(line_hits) else None
+        )
 
-    return json.dumps(data, indent=2)
 
+class ReportCache:
+    """On-disk cache of parsed reports.
 
-def format_csv_output(report: CoverageReport) -> str:
-    """Format coverage report as CSV."""
-    output = []
-    output.append("Filename,Line Coverage %,Lines Covered,Lines Total,Branch Coverage %,Function Coverage %")
+    Entries are keyed by the report's path, size and modification time (and
+    optionally a hash of its contents) and hold the parsed ``files`` data in
+    a compact binary format. The least recently used entries are evicted
+    once the cache grows beyond ``max_bytes``.
+    """
 
-    for file_info in sorted(report.files.values(), key=lambda x: x.filename):
-        branch = file_info.branch_coverage if file_info.branch_coverage is not None else ""
-        function = file_info.function_coverage if file_info.function_coverage is not None else ""
+    MAGIC = b'CVAC'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHI')
+    RECORD = struct.Struct('<IqqdddII')
 
-        output.append(
-            f'"{file_info.filename}",{file_info.line_coverage:.2f},'
-            f'{file_info.lines_covered},{file_info.lines_total},{branch},{function}'
-        )
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_SIZE,
+                 content_hash: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
 
-    return "\n".join(output)
+    def key(self, filepath: str, report_format: str, track_lines: bool,
+            summary_only: bool = False) -> str:
+        """Build the cache key of a report file."""
+        stat = os.stat(filepath)
+        parts = [os.path.abspath(filepath), str(stat.st_size), str(stat.st_mtime_ns),
+                 report_format, str(track_lines), str(self.VERSION)]
+        if summary_only:
+            parts.append('summary')
+        if self.content_hash:
+            digest = hashlib.blake2b()
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(LCOV_BLOCK_SIZE), b''):
+                    digest.update(block)
+            parts.append(digest.hexdigest())
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
 
+    def load(self, key: str) -> Optional[FileTable]:
+        """Return the cached files for ``key``, or None on a miss."""
+        path = self.cache_dir / f"{key}.cov"
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            files = self._decode(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error, UnicodeDecodeError):
+            # Unreadable or truncated entry: drop it and parse again
+            path.unlink(missing_ok=True)
+            return None
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='Parse and analyze code coverage reports in multiple formats'
-    )
-    parser.add_argument('report_file', help='Path to coverage report file')
-    parser.add_argument('--format', choices=['auto', 'lcov', 'coverage-py', 'cobertura'],
-                       default='auto', help='Coverage report format (default: auto-detect)')
-    parser.add_argument('--threshold', type=int, default=80,
-                       help='Coverage threshold for warnings (default: 80)')
-    parser.add_argument('--output', choices=['text', 'json', 'csv'], default='text',
-                       help='Output format (default: text)')
-    parser.add_argument('--min-line-coverage', type=int, default=70,
-                       help='Minimum line coverage per file (default: 70)')
-    parser.add_argument('--exclude-pattern', type=str, default=None,
-                       help='Regex pattern for files to exclude')
-    parser.add_argument('--sort', choices=['file', 'coverage', 'lines'], default='coverage',
-                       help='Sort output by file name, coverage, or lines (default: coverage)')
+        # Touch the entry so eviction sees it as recently used
+        os.utime(path)
+        return files
 
-    args = parser.parse_args()
+    def store(self, key: str, files: Mapping[str, FileCoverage]) -> None:
+        """Write the files for ``key`` and evict old entries if needed."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.cache_dir / f"{key}.cov"
+        tmp_path = path.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp_path, 'wb') as f:
+            f.write(self._encode(files))
+        os.replace(tmp_path, path)
+        self.evict()
 
-    # Detect format if needed
-    report_format = args.format
-    if report_format == 'auto':
-        report_format = detect_format(args.report_file)
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits its budget."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob('*.cov'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
 
-    # Select appropriate parser
-    if report_format == 'lcov':
-        report = LcovReport()
-    elif report_format == 'coverage-py':
-        report = CoveragePyReport()
-    elif report_format == 'cobertura':
-        report = CoberturaReport()
-    else:
-        print(f"Error: Unknown format '{report_format}'", file=sys.stderr)
-        sys.exit(1)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
 
-    # Parse the report
-    try:
-        report.parse(args.report_file)
-    except Exception as e:
-        print(f"Error parsing coverage report: {e}", file=sys.stderr)
+    @classmethod
+    def _encode(cls, files: Mapping[str, FileCoverage]) -> bytes:
+        """Serialise parsed files into the cache format."""
+        chunks = [cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(files))]
+        nan = float('nan')
+        for file_info in files.values():
+            name = file_info.filename.encode('utf-8')
+            line_hits = file_info.line_hits
+            num_lines = len(line_hits) if line_hits is not None else 0
+            functions = b''
+            if file_info.function_hits is not None:
+                functions = json.dumps(file_info.function_hits).encode('utf-8')
+
+            chunks.append(cls.RECORD.pack(
+                len(name),
+                file_info.lines_covered,
+                file_info.lines_total,
+                file_info.line_coverage,
+                nan if file_info.branch_coverage is None else file_info.branch_coverage,
+                nan if file_info.function_coverage is None else file_info.function_coverage,
+                # Zero means "no hit map"; otherwise the map length plus one
+                num_lines + 1 if line_hits is not None else 0,
+                len(functions)
+            ))
+            chunks.append(name)
+            if line_hits is not None:
+                chunks.append(bytes(line_hits.instrumented))
+                chunks.append(line_hits.hits.tobytes())
+            chunks.append(functions)
+        return b''.join(chunks)
+
+    @classmethod
+    def _decode(cls, data: bytes) -> FileTable:
+        """Deserialise parsed files from the cache format."""
+        magic, version, count = cls.HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Unsupported cache entry")
+
+        files = FileTable()
+        view = memoryview(data)
+        pos = cls.HEADER.size
+        for _ in range(count):
+            (name_len, lines_covered, lines_total, line_coverage, branch, function,
+             num_lines, functions_len) = cls.RECORD.unpack_from(data, pos)
+            pos += cls.RECORD.size
+            filename = str(view[pos:pos + name_len], 'utf-8')
+            pos += name_len
+
+            line_hits = None
+            if num_lines:
+                num_lines -= 1
+                instrumented = bytearray(view[pos:pos + num_lines])
+                pos += num_lines
+                hits = array('I')
+                hits.frombytes(view[pos:pos + num_lines * hits.itemsize])
+                pos += num_lines * hits.itemsize
+                line_hits = LineHits(hits, instrumented)
+
+            function_hits = None
+            if functions_len:
+                function_hits = json.loads(str(view[pos:pos + functions_len], 'utf-8'))
+                pos += functions_len
+
+            files[filename] = FileCoverage(
+                filename=filename,
+                line_coverage=line_coverage,
+                branch_coverage=None if math.isnan(branch) else branch,
+                function_coverage=None if math.isnan(function) else function,
+                lines_covered=lines_covered,
+                lines_total=lines_total,
+                line_hits=line_hits,
+                function_hits=function_hits
+            )
+
+        if pos != len(data):
+            raise ValueError("Trailing data in cache entry")
+        return files
+
+
+def _estimated_memory(file_info: FileCoverage) -> int:
+    """Estimate the bytes a merged entry occupies in memory."""
+    size = ENTRY_MEMORY + len(file_info.filename)
+    if file_info.line_hits is not None:
+        size += len(file_info.line_hits) * LINE_MEMORY
+    if file_info.function_hits is not None:
+        size += sum(FUNCTION_MEMORY + len(name) for name in file_info.function_hits)
+    return size
+
+
+class SpillingMerge:
+    """Merge parsed files within a memory budget by spilling sorted runs to disk.
+
+    Entries are merged in memory until their estimated size reaches
+    ``budget`` bytes; the buffered entries are then written to a temporary
+    file sorted by filename, as blocks in the cache format. finish() k-way
+    merges the runs with a heap keyed by filename and folds the entries of
+    each file in input order, so the result equals an in-memory merge,
+    including the order of the files. Once a run has been spilled, the
+    merged entries drop their hit maps unless ``keep_line_hits``.
+
+    The budget bounds the entries buffered before each spill. The merged
+    result of finish() is one FileTable held on top of that: a few dozen
+    bytes per file, plus the hit maps if they are kept.
+    """
+
+    BLOCK = struct.Struct('<QI')
+
+    def __init__(self, budget: int, track_lines: bool = True, keep_line_hits: bool = False):
+        self.budget = budget
+        self.keep_line_hits = keep_line_hits
+        self.buffer = CoverageReport(track_lines)
+        self.runs: List[BinaryIO] = []
+        self._sizes: Dict[str, int] = {}
+        # Position of each buffered file's first appearance across all inputs
+        self._first_seen: Dict[str, int] = {}
+        self._seen = 0
+        self._memory = 0
+
+    def add_file(self, file_coverage: FileCoverage) -> None:
+        """Merge one entry, spilling the buffer if it outgrows the budget."""
+        filename = file_coverage.filename
+        if filename not in self._first_seen:
+            self._first_seen[filename] = self._seen
+            self._seen += 1
+        self.buffer.add_file(file_coverage)
+        size = _estimated_memory(self.buffer.files[filename])
+        self._memory += size - self._sizes.get(filename, 0)
+        self._sizes[filename] = size
+        if self._memory >= self.budget:
+            self._spill()
+
+    def merge(self, files: Mapping[str, FileCoverage]) -> None:
+        for file_coverage in files.values():
+            self.add_file(file_coverage)
+
+    def _spill(self) -> None:
+        """Write the buffered entries to a new run, sorted by filename."""
+        files = self.buffer.files
+        run = tempfile.TemporaryFile(prefix='coverage-run-')
+        block: Dict[str, FileCoverage] = {}
+        block_size = 0
+        for index in files.order('file'):
+            file_info = files.view(index)
+            block[file_info.filename] = file_info
+            block_size += self._sizes[file_info.filename]
+            if block_size >= RUN_BLOCK_SIZE:
+                self._write_block(run, block)
+                block = {}
+                block_size = 0
+        if block:
+            self._write_block(run, block)
+        run.seek(0)
+        self.runs.append(run)
+
+        self.buffer = CoverageReport(self.buffer.track_lines)
+        self._sizes = {}
+        self._first_seen = {}
+        self._memory = 0
+
+    def _write_block(self, run: BinaryIO, block: Dict[str, FileCoverage]) -> None:
+        payload = ReportCache._encode(block)
+        first_seen = array('Q', (self._first_seen[name] for name in block))
+        run.write(self.BLOCK.pack(len(payload), len(block)))
+        run.write(payload)
+        run.write(first_seen.tobytes())
+
+    def _read_run(self, run_index: int) -> Iterator[Tuple[str, int, int, FileCoverage]]:
+        """Yield (filename, run index, first appearance, entry) from one run."""
+        run = self.runs[run_index]
+        while True:
+            header = run.read(self.BLOCK.size)
+            if not header:
+                return
+            payload_size, count = self.BLOCK.unpack(header)
+            files = ReportCache._decode(run.read(payload_size))
+            first_seen = array('Q')
+            first_seen.frombytes(run.read(count * first_seen.itemsize))
+            for index, filename in enumerate(files):
+                yield filename, run_index, first_seen[index], files.view(index)
+
+    def finish(self) -> FileTable:
+        """Return the merged files and remove the spilled runs."""
+        if not self.runs:
+            return self.buffer.files
+        self._spill()
+
+        files = FileTable()
+        merged_first_seen = array('Q')
+        try:
+            records = heapq.merge(*(self._read_run(index) for index in range(len(self.runs))),
+                                  key=operator.itemgetter(0, 1))
+            current: Optional[FileCoverage] = None
+            for filename, _, first_seen, file_info in records:
+                if current is not None and current.filename == filename:
+                    current = merge_file_coverage(current, file_info)
+                    continue
+                if current is not None:
+                    self._store(files, current)
+                # The earliest run holds a file's first appearance
+                current = file_info
+                merged_first_seen.append(first_seen)
+            if current is not None:
+                self._store(files, current)
+        finally:
+            self.close()
+
+        # Runs are sorted by filename; restore the order files first appeared in
+        files.reorder(sorted(range(len(files)), key=merged_first_seen.__getitem__))
+        return files
+
+    def _store(self, files: FileTable, file_info: FileCoverage) -> None:
+        """Store a fully merged entry, without its hit maps unless they are kept."""
+        if not self.keep_line_hits:
+            file_info.line_hits = None
+            file_info.function_hits = None
+        files[file_info.filename] = file_info
+
+    def close(self) -> None:
+        for run in self.runs:
+            run.close()
+        self.runs = []
+
+
+def split_lcov_chunks(filepath: str, num_chunks: int,
+                      min_chunk_size: int = LCOV_MIN_CHUNK_SIZE) -> List[Tuple[int, int]]:
+    """Split an LCOV file into byte ranges that end on ``end_of_record`` lines.
+
+    Both LCOV parsers reset their state after every ``end_of_record``, so each
+    range can be parsed independently and the results merged in order.
+    """
+    size = os.path.getsize(filepath)
+    num_chunks = min(num_chunks, size // min_chunk_size)
+    if num_chunks <= 1:
+        return [(0, size)]
+
+    chunks = []
+    start = 0
+    with open(filepath, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, num_chunks):
+            pos = max(start, size * i // num_chunks)
+            # Move to the start of the next line before looking for a record end
+            if pos > 0 and mm[pos - 1:pos] != b'\n':
+                pos = mm.find(b'\n', pos)
+                if pos < 0:
+                    break
+                pos += 1
+            boundary = _find_record_end(mm, pos, size)
+            if boundary < 0:
+                break
+            if boundary > start:
+                chunks.append((start, boundary))
+                start = boundary
+
+    if start < size:
+        chunks.append((start, size))
+    return chunks
+
+
+def expand_inputs(inputs: Iterable[str]) -> List[str]:
+    """Expand report paths, directories and glob patterns into report files."""
+    filepaths: List[str] = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            matches = sorted(str(p) for p in path.rglob('*')
+                             if p.is_file() and _report_suffix(p.name) in REPORT_SUFFIXES)
+        elif any(char in item for char in '*?['):
+            matches = sorted(p for p in glob.glob(item, recursive=True)
+                             if os.path.isfile(p))
+        else:
+            matches = [item]
+        filepaths.extend(matches)
+
+    # Keep the first occurrence of each path so results stay in input order
+    return list(dict.fromkeys(filepaths))
+
+
+def create_report(report_format: str, lcov_engine: str = 'mmap',
+                  track_lines: bool = True,
+                  path_filter: Optional[Callable[[str], bool]] = None,
+                  summary_only: bool = False) -> CoverageReport:
+    """Create the parser for a coverage report format."""
+    if report_format == 'lcov':
+        if lcov_engine == 'mmap':
+            return MmapLcovReport(track_lines, path_filter, summary_only)
+        return LcovReport(track_lines, path_filter, summary_only)
+    elif report_format == 'coverage-py':
+        return CoveragePyReport(track_lines, path_filter, summary_only)
+    elif report_format == 'cobertura':
+        return CoberturaReport(track_lines=track_lines, path_filter=path_filter,
+                               summary_only=summary_only)
+    raise ValueError(f"Unknown format '{report_format}'")
+
+
+class _ParseTask(NamedTuple):
+    """One report, or one byte range of an LCOV report, to parse in a worker."""
+    filepath: str
+    report_format: str
+    lcov_engine: str
+    track_lines: bool
+    path_filter: Optional[Callable[[str], bool]]
+    start: Optional[int]
+    end: Optional[int]
+    summary_only: bool = False
+
+
+def _run_tasks(tasks: List[_ParseTask], jobs: int,
+               max_pending: Optional[int] = None) -> Iterator[FileTable]:
+    """Run parse tasks, in parallel when worthwhile, yielding results in order.
+
+    stdin belongs to this process, so it is always parsed here. With
+    ``max_pending``, at most that many results are computed ahead of the
+    consumer instead of all of them.
+    """
+    remote = [task for task in tasks if task.filepath != STDIN_PATH]
+    if jobs == 1 or len(remote) <= 1:
+        yield from map(_parse_task, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(remote))) as executor:
+        if max_pending is None:
+            results = executor.map(_parse_task, remote)
+        else:
+            results = _map_bounded(executor, remote, max_pending)
+        for task in tasks:
+            yield _parse_task(task) if task.filepath == STDIN_PATH else next(results)
+
+
+def _map_bounded(executor: ProcessPoolExecutor, tasks: List[_ParseTask],
+                 max_pending: int) -> Iterator[FileTable]:
+    """Like executor.map(), but with at most ``max_pending`` tasks submitted ahead."""
+    pending: deque = deque()
+    for task in tasks:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(_parse_task, task))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _parse_task(task: _ParseTask) -> FileTable:
+    """Parse one report, or one chunk of an LCOV report, in a worker process."""
+    if task.report_format == 'auto' and task.filepath != STDIN_PATH:
+        task = task._replace(report_format=detect_format(task.filepath))
+    if task.report_format == 'auto':
+        with open_report(task.filepath) as stream:
+            report = create_report(detect_stream_format(stream), task.lcov_engine,
+                                   task.track_lines, task.path_filter, task.summary_only)
+            report.parse(stream)
+    else:
+        report = create_report(task.report_format, task.lcov_engine, task.track_lines,
+                               task.path_filter, task.summary_only)
+        if task.start is None:
+            report.parse(task.filepath)
+        else:
+            report.parse_range(task.filepath, task.start, task.end)
+
+    if report.summary_fallbacks:
+        name = 'stdin' if task.filepath == STDIN_PATH else task.filepath
+        print(f"Warning: {report.summary_fallbacks} record(s) in {name} have no "
+              f"coverage totals; parsed their line data instead", file=sys.stderr)
+    return report.files
+
+
+class DiffIndex:
+    """Changed lines per file, parsed from a unified diff.
+
+    Coverage reports and diffs rarely agree on path prefixes (absolute CI
+    paths versus repository-relative ``b/`` paths), so a coverage filename
+    matches a diff path when one is a path suffix of the other.
+    """
+
+    def __init__(self, changed_lines: Dict[str, Set[int]]):
+        self.changed_lines = changed_lines
+        self._by_basename: Dict[str, List[str]] = {}
+        for path in changed_lines:
+            self._by_basename.setdefault(path.rsplit('/', 1)[-1], []).append(path)
+        self._lookups: Dict[str, Optional[Set[int]]] = {}
+
+    @classmethod
+    def from_patch(cls, patch: Iterable[str]) -> 'DiffIndex':
+        """Build the index from the lines of a unified diff."""
+        changed_lines: Dict[str, Set[int]] = {}
+        current: Optional[Set[int]] = None
+        line_number = 0
+        hunk_header = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@')
+
+        for line in patch:
+            line = line.rstrip('\r\n')
+            if line.startswith('+++ '):
+                path = line[4:].split('\t', 1)[0]
+                if path == '/dev/null':
+                    current = None
+                    continue
+                if path.startswith('b/'):
+                    path = path[2:]
+                current = changed_lines.setdefault(path, set())
+            elif line.startswith('@@'):
+                match = hunk_header.match(line)
+                if match:
+                    line_number = int(match.group(1))
+            elif current is None or line.startswith(('--- ', 'diff ', 'index ')):
+                continue
+            elif line.startswith('+'):
+                current.add(line_number)
+                line_number += 1
+            elif line.startswith(' '):
+                line_number += 1
+
+        return cls({path: lines for path, lines in changed_lines.items() if lines})
+
+    def lookup(self, filename: str) -> Optional[Set[int]]:
+        """Return the changed lines of a coverage filename, or None."""
+        if filename in self._lookups:
+            return self._lookups[filename]
+
+        normalized = filename.replace('\\', '/')
+        if normalized.startswith('./'):
+            normalized = normalized[2:]
+
+        result = None
+        for path in self._by_basename.get(normalized.rsplit('/', 1)[-1], ()):
+            if (normalized == path or normalized.endswith('/' + path)
+                    or path.endswith('/' + normalized)):
+                result = self.changed_lines[path]
+                break
+
+        self._lookups[filename] = result
+        return result
+
+    def __contains__(self, filename: str) -> bool:
+        return self.lookup(filename) is not None
+
+
+class Profiler:
+    """Per-phase wall time, CPU time and peak memory of an analyzer run.
+
+    Phases may be entered several times and accumulate; they must not nest.
+    A disabled profiler hands out a shared no-op context manager, so
+    instrumented code costs next to nothing when profiling is off. Work done
+    in parser worker processes shows up as wall time of the parse phase only.
+    """
+
+    _NO_PHASE = nullcontext()
+
+    def __init__(self, enabled: bool = False, profile_calls: bool = False):
+        self.enabled = enabled
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.counts: Dict[str, int] = {}
+        self._calls = cProfile.Profile() if enabled and profile_calls else None
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        if enabled:
+            tracemalloc.start()
+        if self._calls is not None:
+            self._calls.enable()
+
+    def phase(self, name: str):
+        """Return a context manager that times the enclosed block as ``name``."""
+        if not self.enabled:
+            return self._NO_PHASE
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, {
+                'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_memory_bytes': 0
+            })
+            stats['calls'] += 1
+            stats['wall_seconds'] += time.perf_counter() - wall
+            stats['cpu_seconds'] += time.process_time() - cpu
+            stats['peak_memory_bytes'] = max(stats['peak_memory_bytes'],
+                                             tracemalloc.get_traced_memory()[1])
+
+    def count(self, name: str, value: int) -> None:
+        """Add ``value`` to the counter ``name``."""
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def stop(self) -> Dict:
+        """Stop profiling and return the timing summary."""
+        if self._calls is not None:
+            self._calls.disable()
+        summary = {
+            'wall_seconds': time.perf_counter() - self._start_wall,
+            'cpu_seconds': time.process_time() - self._start_cpu,
+            'peak_memory_bytes': max((stats['peak_memory_bytes']
+                                      for stats in self.phases.values()), default=0),
+            'phases': self.phases,
+            'counts': self.counts,
+        }
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return summary
+
+    def dump_stats(self, filepath: str) -> None:
+        """Write the cProfile data of the run, for use with ``pstats``."""
+        if self._calls is not None:
+            self._calls.dump_stats(filepath)
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a path glob into a regex matching whole trailing path components.
+
+    ``*`` and ``?`` stay within one component, ``**`` spans directories and
+    ``[...]`` is a character class, so ``node_modules/**`` matches that
+    directory anywhere in a path and ``*.min.js`` matches any such file.
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**', i):
+            i += 2
+            if pattern.startswith('/', i):
+                i += 1
+                parts.append('(?:.*/)?')
+            else:
+                parts.append('.*')
+            continue
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            members = pattern[i + 1:end]
+            if members.startswith('!'):
+                members = '^' + members[1:]
+            parts.append('[' + members.replace('\\', '\\\\') + ']')
+            i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return '(?:^|/)' + ''.join(parts) + '$'
+
+
+class PathMatcher:
+    """Include/exclude filter over file paths, checked while parsing.
+
+    Patterns are globs (see ``_glob_to_regex``) or regexes prefixed with
+    ``re:``. All includes and all excludes are each compiled into one
+    alternation, and results are cached per path, since merged reports
+    repeat the same files. A path is wanted if it matches some include (or
+    there are none) and no exclude. Further filters, such as a diff, can be
+    AND-ed in through ``also``.
+    """
+
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = (),
+                 also: Optional[Callable[[str], bool]] = None):
+        self.include = self._compile(include)
+        self.exclude = self._compile(exclude)
+        self.also = also
+        self._cache: Dict[str, bool] = {}
+
+    @staticmethod
+    def _compile(patterns: Iterable[str]) -> Optional['re.Pattern']:
+        regexes = [pattern[3:] if pattern.startswith('re:') else _glob_to_regex(pattern)
+                   for pattern in patterns]
+        if not regexes:
+            return None
+        return re.compile('|'.join(f'(?:{regex})' for regex in regexes))
+
+    def __call__(self, filename: str) -> bool:
+        wanted = self._cache.get(filename)
+        if wanted is None:
+            wanted = ((self.include is None or self.include.search(filename) is not None)
+                      and (self.exclude is None or self.exclude.search(filename) is None)
+                      and (self.also is None or self.also(filename)))
+            self._cache[filename] = wanted
+        return wanted
+
+
+def _sniff_format(head: bytes) -> Optional[str]:
+    """Guess the report format from the first bytes of a report.
+
+    Returns 'json' for any JSON document; the caller decides whether it is a
+    coverage.py report.
+    """
+    text = head.lstrip(b'\xef\xbb\xbf \t\r\n')
+    if text.startswith(b'<'):
+        return 'cobertura'
+    if text.startswith(b'{'):
+        return 'json'
+    for line in text.splitlines()[:50]:
+        if line.strip()[:3] in (b'TN:', b'SF:'):
+            return 'lcov'
+    return None
+
+
+def _has_files_object(f) -> bool:
+    """Return True if a JSON stream has a top-level ``files`` object.
+
+    Only the values that precede ``files`` (normally just ``meta``) are
+    decoded.
+    """
+    try:
+        reader = JsonStreamReader(f)
+        for key in reader.iter_keys():
+            if key == 'files':
+                return reader.peek() == '{'
+            reader.skip_value()
+    except ValueError:
+        pass
+    return False
+
+
+def _report_suffix(filename: str) -> str:
+    """Return a report's extension, ignoring any compression extension."""
+    path = Path(filename.lower())
+    if path.suffix in COMPRESSION_SUFFIXES:
+        path = path.with_suffix('')
+    return path.suffix
+
+
+def detect_stream_format(stream: BinaryIO) -> str:
+    """Detect the format of a decompressed report stream without consuming it.
+
+    A stream cannot be rewound, so any JSON document is taken to be a
+    coverage.py report.
+    """
+    report_format = _sniff_format(stream.peek(SNIFF_SIZE)[:SNIFF_SIZE])
+    if report_format == 'json':
+        return 'coverage-py'
+    return report_format or 'lcov'
+
+
+def detect_format(filepath: str) -> str:
+    """Auto-detect coverage report format from content, then file extension.
+
+    Only the first few KB of the (decompressed) report are read; for JSON,
+    reading stops at the top-level ``files`` key.
+    """
+    with open_report(filepath) as stream:
+        report_format = _sniff_format(stream.peek(SNIFF_SIZE)[:SNIFF_SIZE])
+    if report_format == 'json':
+        with open_report(filepath) as stream:
+            f = io.TextIOWrapper(stream, encoding='utf-8')
+            try:
+                report_format = 'coverage-py' if _has_files_object(f) else None
+            finally:
+                f.detach()
+    if report_format:
+        return report_format
+
+    if _report_suffix(filepath) in ['.xml', '.coverage']:
+        return 'cobertura'
+
+    # Default fallback
+    return 'lcov'
+
+
+# Coverage distribution buckets as (lower bound, label), highest first.
+COVERAGE_BUCKETS = (
+    (90, "Excellent (90-100%)"),
+    (80, "Good (80-90%)"),
+    (70, "Fair (70-80%)"),
+    (0, "Poor (<70%)"),
+)
+
+OUTPUT_FORMATS = ('text', 'json', 'csv')
+
+
+class ReportSummary(NamedTuple):
+    """Aggregates of a report, computed in a single pass over its files."""
+    overall_coverage: float
+    lines_covered: int
+    lines_total: int
+    num_files: int
+    buckets: List[int]
+
+
+class DirectoryRollup(NamedTuple):
+    """Coverage aggregated over every file below one directory."""
+    directory: str
+    depth: int
+    lines_covered: int
+    lines_total: int
+    num_files: int
+    threshold: Optional[float]
+
+    @property
+    def line_coverage(self) -> float:
+        return (self.lines_covered / self.lines_total) * 100 if self.lines_total else 0.0
+
+    @property
+    def below_threshold(self) -> bool:
+        return self.threshold is not None and self.line_coverage < self.threshold
+
+
+class RollupOptions(NamedTuple):
+    """Which directory rollups to render and the thresholds they are held to.
+
+    ``thresholds`` maps directories to a minimum coverage that also applies
+    to their subdirectories unless one of those sets its own;
+    ``default_threshold`` applies everywhere else.
+    """
+    depth: Optional[int] = None
+    thresholds: Dict[str, float] = {}
+    default_threshold: Optional[float] = None
+
+
+class DirectoryTree:
+    """Prefix tree of the directories in a report with aggregated counts.
+
+    Every file adds its counts to each directory on its path, so all
+    directory totals at every depth come out of a single pass over the
+    files. Nodes are ``[lines_covered, lines_total, num_files, children]``
+    lists to keep the tree compact.
+    """
+
+    def __init__(self):
+        self.root: list = [0, 0, 0, {}]
+
+    @classmethod
+    def from_files(cls, files: 'FileTable') -> 'DirectoryTree':
+        tree = cls()
+        for name, covered, total in zip(files.names, files.lines_covered, files.lines_total):
+            tree.add(name, covered, total)
+        return tree
+
+    def add(self, filename: str, lines_covered: int, lines_total: int) -> None:
+        """Add one file's counts to the root and each of its directories."""
+        parts = filename.replace('\\', '/').split('/')[:-1]
+        if parts and parts[0] == '':
+            # Keep absolute paths rooted at '/'
+            parts = ['/' + part for part in parts[1:2]] + parts[2:]
+        node = self.root
+        node[0] += lines_covered
+        node[1] += lines_total
+        node[2] += 1
+        for part in parts:
+            if not part:
+                continue
+            children = node[3]
+            child = children.get(part)
+            if child is None:
+                child = children[part] = [0, 0, 0, {}]
+            child[0] += lines_covered
+            child[1] += lines_total
+            child[2] += 1
+            node = child
+
+    def rollups(self, options: RollupOptions = RollupOptions()) -> Iterator[DirectoryRollup]:
+        """Yield every directory down to ``options.depth``, parents before children."""
+        stack = [(name, child, 1, options.default_threshold)
+                 for name, child in sorted(self.root[3].items(), reverse=True)]
+        while stack:
+            path, node, depth, threshold = stack.pop()
+            threshold = options.thresholds.get(path, threshold)
+            yield DirectoryRollup(path, depth, node[0], node[1], node[2], threshold)
+            if options.depth is None or depth < options.depth:
+                separator = '' if path.endswith('/') else '/'
+                stack.extend((f'{path}{separator}{name}', child, depth + 1, threshold)
+                             for name, child in sorted(node[3].items(), reverse=True))
+
+
+class ReportRenderer:
+    """Streams a report to text, JSON or CSV writers.
+
+    Rows are written straight from the report's file columns, one at a time,
+    instead of building the whole output in memory. The summary is computed
+    once and each sort order at most once, so rendering several formats from
+    one parse shares that work. With ``rollup`` options every format also
+    includes per-directory coverage.
+    """
+
+    def __init__(self, report: CoverageReport, rollup: Optional[RollupOptions] = None):
+        self.report = report
+        files = report.files
+        self.files = files if isinstance(files, FileTable) else FileTable(files)
+        self.rollup = rollup
+        self._summary: Optional[ReportSummary] = None
+        self._orders: Dict[str, Sequence[int]] = {}
+        self._directories: Optional[List[DirectoryRollup]] = None
+
+    @property
+    def directories(self) -> List[DirectoryRollup]:
+        """Directory rollups, or an empty list when rollups are off.
+
+        The tree is filled from the final file columns in one pass rather
+        than while records are parsed, since repeated records, --diff and
+        filters still replace or drop entries after they are first added.
+        """
+        if self._directories is None:
+            self._directories = []
+            if self.rollup is not None:
+                tree = DirectoryTree.from_files(self.files)
+                self._directories = list(tree.rollups(self.rollup))
+        return self._directories
+
+    @property
+    def summary(self) -> ReportSummary:
+        if self._summary is None:
+            covered, total = self.files.totals()
+            buckets = self.files.count_at_least(lower for lower, _ in COVERAGE_BUCKETS)
+            if total == 0:
+                overall, covered, total = 0.0, 0, 0
+            else:
+                overall = (covered / total) * 100
+            self._summary = ReportSummary(overall, covered, total, len(self.files), buckets)
+        return self._summary
+
+    def order(self, sort_by: str = 'file') -> Sequence[int]:
+        """Return file indices in ``sort_by`` order, sorting only once."""
+        order = self._orders.get(sort_by)
+        if order is None:
+            order = self._orders[sort_by] = self.files.order(sort_by)
+        return order
+
+    def write_text(self, out: TextIO, threshold: int = 80, min_line_coverage: int = 70,
+                   sort_by: str = 'coverage') -> None:
+        """Write the report as human-readable text."""
+        write = out.write
+        summary = self.summary
+        write("=" * 80 + "\nCOVERAGE ANALYSIS REPORT\n" + "=" * 80 + "\n\n")
+        write(f"Overall Coverage: {summary.overall_coverage:.2f}% "
+              f"({summary.lines_covered}/{summary.lines_total} lines)\n")
+        if summary.overall_coverage < threshold:
+            write(f"⚠️  WARNING: Coverage below threshold of {threshold}%\n")
+
+        write("\n" + "-" * 80 + "\n")
+        write(f"{'File':<50} {'Coverage':<12} {'Lines':<15}\n")
+        write("-" * 80 + "\n")
+
+        files = self.files
+        names, coverages = files.names, files.line_coverage
+        covered, totals = files.lines_covered, files.lines_total
+        for index in self.order(sort_by):
+            coverage = coverages[index]
+            coverage_str = f"{coverage:.1f}%"
+            lines_str = f"{covered[index]}/{totals[index]}"
+
+            # Add warning indicator for low coverage
+            warning = " ⚠️" if coverage < min_line_coverage else ""
+
+            # Truncate filename for display
+            display_filename = names[index]
+            if len(display_filename) > 50:
+                display_filename = "..." + display_filename[-47:]
+
+            write(f"{display_filename:<50} {coverage_str:<12} {lines_str:<15}{warning}\n")
+
+        write("-" * 80 + "\n")
+
+        if self.rollup is not None:
+            write("\nDirectory Coverage:\n" + "-" * 80 + "\n")
+            write(f"{'Directory':<50} {'Coverage':<12} {'Lines':<15} {'Files'}\n")
+            write("-" * 80 + "\n")
+            for rollup in self.directories:
+                display_directory = "  " * (rollup.depth - 1) + rollup.directory
+                if len(display_directory) > 50:
+                    display_directory = "..." + display_directory[-47:]
+                coverage_str = f"{rollup.line_coverage:.1f}%"
+                lines_str = f"{rollup.lines_covered}/{rollup.lines_total}"
+                warning = " ⚠️" if rollup.below_threshold else ""
+                write(f"{display_directory:<50} {coverage_str:<12} {lines_str:<15} "
+                      f"{rollup.num_files}{warning}\n")
+            write("-" * 80 + "\n")
+
+        write("\nCoverage Distribution:\n")
+        for (_, label), count in zip(COVERAGE_BUCKETS, summary.buckets):
+            write(f"  {label:<25} {count} files\n")
+
+    def write_json(self, out: TextIO) -> None:
+        """Write the report as JSON, formatted like ``json.dumps(indent=2)``."""
+        write = out.write
+        summary = self.summary
+        header = {
+            "overall_coverage": round(summary.overall_coverage, 2),
+            "lines_covered": summary.lines_covered,
+            "lines_total": summary.lines_total,
+            "num_files": summary.num_files
+        }
+        write('{\n  "summary": ' + json.dumps(header, indent=2).replace('\n', '\n  '))
+
+        files = self.files
+        write(',\n  "files": [')
+        separator = '\n'
+        for index in self.order('file'):
+            fields = [
+                f'"filename": {json.dumps(files.names[index])}',
+                f'"line_coverage": {json.dumps(round(files.line_coverage[index], 2))}',
+                f'"lines_covered": {files.lines_covered[index]}',
+                f'"lines_total": {files.lines_total[index]}',
+            ]
+            branch = files.branch_coverage[index]
+            if not math.isnan(branch):
+                fields.append(f'"branch_coverage": {json.dumps(round(branch, 2))}')
+            function = files.function_coverage[index]
+            if not math.isnan(function):
+                fields.append(f'"function_coverage": {json.dumps(round(function, 2))}')
+            write(separator + '    {\n      ' + ',\n      '.join(fields) + '\n    }')
+            separator = ',\n'
+        write('\n  ]' if files else ']')
+
+        if self.rollup is not None:
+            write(',\n  "directories": [')
+            separator = '\n'
+            for rollup in self.directories:
+                entry = {
+                    "directory": rollup.directory,
+                    "depth": rollup.depth,
+                    "line_coverage": round(rollup.line_coverage, 2),
+                    "lines_covered": rollup.lines_covered,
+                    "lines_total": rollup.lines_total,
+                    "num_files": rollup.num_files,
+                    "threshold": rollup.threshold,
+                    "below_threshold": rollup.below_threshold
+                }
+                write(separator + '    ' + json.dumps(entry, indent=2).replace('\n', '\n    '))
+                separator = ',\n'
+            write('\n  ]' if self.directories else ']')
+        write('\n}')
+
+    def write_csv(self, out: TextIO) -> None:
+        """Write the report as CSV."""
+        write = out.write
+        write("Filename,Line Coverage %,Lines Covered,Lines Total,Branch Coverage %,Function Coverage %")
+        files = self.files
+        for index in self.order('file'):
+            branch = files.branch_coverage[index]
+            function = files.function_coverage[index]
+            write(
+                f'\n"{files.names[index]}",{files.line_coverage[index]:.2f},'
+                f'{files.lines_covered[index]},{files.lines_total[index]},'
+                f'{"" if math.isnan(branch) else branch},'
+                f'{"" if math.isnan(function) else function}'
+            )
+
+        if self.rollup is not None:
+            write("\n\nDirectory,Depth,Line Coverage %,Lines Covered,Lines Total,Files,"
+                  "Threshold %,Below Threshold")
+            for rollup in self.directories:
+                threshold = "" if rollup.threshold is None else rollup.threshold
+                write(
+                    f'\n"{rollup.directory}",{rollup.depth},{rollup.line_coverage:.2f},'
+                    f'{rollup.lines_covered},{rollup.lines_total},{rollup.num_files},'
+                    f'{threshold},{"yes" if rollup.below_threshold else "no"}'
+                )
+
+    def write(self, out: TextIO, output_format: str, threshold: int = 80,
+              min_line_coverage: int = 70, sort_by: str = 'coverage') -> None:
+        """Write the report to ``out`` in one of ``OUTPUT_FORMATS``."""
+        if output_format == 'json':
+            self.write_json(out)
+        elif output_format == 'csv':
+            self.write_csv(out)
+        else:  # text
+            self.write_text(out, threshold, min_line_coverage, sort_by)
+
+
+def format_text_output(report: CoverageReport, threshold: int = 80,
+                      min_line_coverage: int = 70, sort_by: str = 'coverage',
+                      rollup: Optional[RollupOptions] = None) -> str:
+    """Format coverage report as human-readable text."""
+    out = io.StringIO()
+    ReportRenderer(report, rollup).write_text(out, threshold, min_line_coverage, sort_by)
+    return out.getvalue()
+
+
+def format_json_output(report: CoverageReport,
+                       rollup: Optional[RollupOptions] = None) -> str:
+    """Format coverage report as JSON."""
+    out = io.StringIO()
+    ReportRenderer(report, rollup).write_json(out)
+    return out.getvalue()
+
+
+def format_csv_output(report: CoverageReport,
+                      rollup: Optional[RollupOptions] = None) -> str:
+    """Format coverage report as CSV."""
+    out = io.StringIO()
+    ReportRenderer(report, rollup).write_csv(out)
+    return out.getvalue()
+
+
+class PathMap:
+    """Maps report paths to the names base and head files are joined on.
+
+    Paths are normalised (backslashes, leading ``./``) and then rewritten by
+    ``OLD=NEW`` rules: a path equal to OLD, or below OLD as a directory, has
+    that prefix replaced by NEW, and the longest matching OLD wins. Rules
+    cover renamed files and directories as well as differing checkout roots.
+    """
+
+    def __init__(self, rules: Iterable[Tuple[str, str]] = ()):
+        self.rules = sorted(((self._normalize(old).rstrip('/'), self._normalize(new).rstrip('/'))
+                             for old, new in rules), key=lambda rule: -len(rule[0]))
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        path = path.replace('\\', '/')
+        while path.startswith('./'):
+            path = path[2:]
+        return path
+
+    def __call__(self, path: str) -> str:
+        path = self._normalize(path)
+        for old, new in self.rules:
+            if path == old:
+                return new
+            if path.startswith(old + '/'):
+                return new + path[len(old):] if new else path[len(old) + 1:]
+        return path
+
+
+class CoverageDelta(NamedTuple):
+    """Line coverage of one file in the base and the head report."""
+    filename: str
+    base_filename: Optional[str]
+    base_coverage: Optional[float]
+    head_coverage: Optional[float]
+    base_lines_covered: int
+    base_lines_total: int
+    head_lines_covered: int
+    head_lines_total: int
+
+    @property
+    def status(self) -> str:
+        if self.base_coverage is None:
+            return 'added'
+        if self.head_coverage is None:
+            return 'removed'
+        return 'changed' if self.change else 'unchanged'
+
+    @property
+    def change(self) -> Optional[float]:
+        """Change in percentage points, or None for added and removed files."""
+        if self.base_coverage is None or self.head_coverage is None:
+            return None
+        return self.head_coverage - self.base_coverage
+
+
+class ReportComparison:
+    """Joins head files against a base report on their mapped paths.
+
+    The base is indexed once in a hash table keyed by mapped path, so
+    head files can be checked one at a time as they are parsed (see
+    drop()) or joined in bulk by deltas().
+    """
+
+    def __init__(self, base: FileTable, path_map: Optional[PathMap] = None):
+        self.base = base
+        self.path_map = path_map or PathMap()
+        self._index = {self.path_map(name): index for index, name in enumerate(base.names)}
+
+    def lookup(self, filename: str) -> Optional[int]:
+        """Return the base index of a head filename, or None."""
+        return self._index.get(self.path_map(filename))
+
+    def drop(self, file_info: FileCoverage) -> Optional[float]:
+        """Return how many percentage points a head file lost, or None if new."""
+        index = self.lookup(file_info.filename)
+        if index is None:
+            return None
+        return self.base.line_coverage[index] - file_info.line_coverage
+
+    def deltas(self, head: FileTable) -> List[CoverageDelta]:
+        """Return one delta per head file, then one per base file not in head."""
+        base = self.base
+        joined = set()
+        deltas = []
+        for index, filename in enumerate(head.names):
+            base_index = self.lookup(filename)
+            if base_index is None:
+                deltas.append(CoverageDelta(filename, None, None, head.line_coverage[index],
+                                            0, 0, head.lines_covered[index],
+                                            head.lines_total[index]))
+                continue
+            joined.add(base_index)
+            deltas.append(CoverageDelta(
+                filename, base.names[base_index], base.line_coverage[base_index],
+                head.line_coverage[index], base.lines_covered[base_index],
+                base.lines_total[base_index], head.lines_covered[index], head.lines_total[index]
+            ))
+        for base_index, filename in enumerate(base.names):
+            if base_index not in joined:
+                deltas.append(CoverageDelta(filename, filename, base.line_coverage[base_index],
+                                            None, base.lines_covered[base_index],
+                                            base.lines_total[base_index], 0, 0))
+        return deltas
+
+
+class ComparisonRenderer:
+    """Writes base-versus-head deltas as text, JSON or CSV.
+
+    A file violates ``max_drop`` when it lost more than that many percentage
+    points of line coverage, and the totals violate ``max_total_drop`` in
+    the same way.
+    """
+
+    def __init__(self, base: FileTable, head: FileTable, deltas: List[CoverageDelta],
+                 max_drop: Optional[float] = None, max_total_drop: Optional[float] = None):
+        self.deltas = deltas
+        self.max_drop = max_drop
+        self.max_total_drop = max_total_drop
+        self.base_totals = base.totals()
+        self.head_totals = head.totals()
+
+    @staticmethod
+    def _coverage(totals: Tuple[int, int]) -> float:
+        covered, total = totals
+        return (covered / total) * 100 if total else 0.0
+
+    @property
+    def total_change(self) -> float:
+        return self._coverage(self.head_totals) - self._coverage(self.base_totals)
+
+    @property
+    def violations(self) -> List[CoverageDelta]:
+        """Files that lost more coverage than ``max_drop``, worst first."""
+        if self.max_drop is None:
+            return []
+        return sorted((delta for delta in self.deltas
+                       if delta.change is not None and -delta.change > self.max_drop),
+                      key=lambda delta: delta.change)
+
+    @property
+    def total_violation(self) -> bool:
+        return self.max_total_drop is not None and -self.total_change > self.max_total_drop
+
+    @property
+    def failed(self) -> bool:
+        return self.total_violation or bool(self.violations)
+
+    def order(self, sort_by: str = 'change') -> List[CoverageDelta]:
+        """Return deltas by file name, or by change with losses first and
+        added and removed files last."""
+        if sort_by == 'file':
+            return sorted(self.deltas, key=lambda delta: delta.filename)
+        return sorted(self.deltas, key=lambda delta: (delta.change is None,
+                                                      delta.change or 0.0, delta.filename))
+
+    def write_text(self, out: TextIO, sort_by: str = 'change') -> None:
+        """Write the comparison as human-readable text; unchanged files are counted only."""
+        write = out.write
+        write("=" * 80 + "\nCOVERAGE COMPARISON\n" + "=" * 80 + "\n\n")
+        for label, totals in (("Base", self.base_totals), ("Head", self.head_totals)):
+            write(f"{label} Coverage: {self._coverage(totals):.2f}% "
+                  f"({totals[0]}/{totals[1]} lines)\n")
+        write(f"Change: {self.total_change:+.2f} pp\n")
+        if self.total_violation:
+            write(f"⚠️  WARNING: Total coverage dropped by more than {self.max_total_drop} pp\n")
+
+        write("\n" + "-" * 80 + "\n")
+        write(f"{'File':<50} {'Base':<9} {'Head':<9} {'Change':<10}\n")
+        write("-" * 80 + "\n")
+        unchanged = 0
+        for delta in self.order(sort_by):
+            if delta.status == 'unchanged':
+                unchanged += 1
+                continue
+            display_filename = delta.filename
+            if len(display_filename) > 50:
+                display_filename = "..." + display_filename[-47:]
+            base_str = "-" if delta.base_coverage is None else f"{delta.base_coverage:.1f}%"
+            head_str = "-" if delta.head_coverage is None else f"{delta.head_coverage:.1f}%"
+            change_str = delta.status if delta.change is None else f"{delta.change:+.1f}"
+            warning = (" ⚠️" if self.max_drop is not None and delta.change is not None
+                       and -delta.change > self.max_drop else "")
+            write(f"{display_filename:<50} {base_str:<9} {head_str:<9} {change_str:<10}"
+                  f"{warning}\n")
+        write("-" * 80 + "\n")
+        write(f"{unchanged} unchanged files not shown\n")
+
+        violations = self.violations
+        if violations:
+            write(f"\n⚠️  {len(violations)} file(s) lost more than {self.max_drop} pp of coverage\n")
+
+    def write_json(self, out: TextIO) -> None:
+        """Write the comparison as JSON."""
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value, 2)
+
+        statuses = [delta.status for delta in self.deltas]
+        summary = {
+            "base_coverage": round(self._coverage(self.base_totals), 2),
+            "head_coverage": round(self._coverage(self.head_totals), 2),
+            "change": round(self.total_change, 2),
+            "base_lines_covered": self.base_totals[0],
+            "base_lines_total": self.base_totals[1],
+            "head_lines_covered": self.head_totals[0],
+            "head_lines_total": self.head_totals[1],
+            "files_changed": statuses.count('changed'),
+            "files_unchanged": statuses.count('unchanged'),
+            "files_added": statuses.count('added'),
+            "files_removed": statuses.count('removed'),
+            "failed": self.failed,
+        }
+        files = []
+        for delta in self.order('file'):
+            entry = {
+                "filename": delta.filename,
+                "status": delta.status,
+                "base_coverage": rounded(delta.base_coverage),
+                "head_coverage": rounded(delta.head_coverage),
+                "change": rounded(delta.change),
+                "base_lines_covered": delta.base_lines_covered,
+                "base_lines_total": delta.base_lines_total,
+                "head_lines_covered": delta.head_lines_covered,
+                "head_lines_total": delta.head_lines_total,
+            }
+            if delta.base_filename is not None and delta.base_filename != delta.filename:
+                entry["base_filename"] = delta.base_filename
+            files.append(entry)
+        document = {"summary": summary, "files": files}
+        if self.max_drop is not None:
+            document["violations"] = [delta.filename for delta in self.violations]
+        out.write(json.dumps(document, indent=2))
+
+    def write_csv(self, out: TextIO) -> None:
+        """Write the comparison as CSV."""
+        write = out.write
+        write("Filename,Status,Base Coverage %,Head Coverage %,Change,Base Lines Covered,"
+              "Base Lines Total,Head Lines Covered,Head Lines Total")
+        for delta in self.order('file'):
+            base = "" if delta.base_coverage is None else f"{delta.base_coverage:.2f}"
+            head = "" if delta.head_coverage is None else f"{delta.head_coverage:.2f}"
+            change = "" if delta.change is None else f"{delta.change:.2f}"
+            write(f'\n"{delta.filename}",{delta.status},{base},{head},{change},'
+                  f'{delta.base_lines_covered},{delta.base_lines_total},'
+                  f'{delta.head_lines_covered},{delta.head_lines_total}')
+
+    def write(self, out: TextIO, output_format: str, sort_by: str = 'change') -> None:
+        """Write the comparison to ``out`` in one of ``OUTPUT_FORMATS``."""
+        if output_format == 'json':
+            self.write_json(out)
+        elif output_format == 'csv':
+            self.write_csv(out)
+        else:  # text
+            self.write_text(out, sort_by)
+
+
+def parse_path_map(value: str) -> Tuple[str, str]:
+    """Parse a ``--path-map`` value of the form OLD=NEW."""
+    old, separator, new = value.partition('=')
+    if not separator or not old:
+        raise argparse.ArgumentTypeError(f"expected OLD=NEW, got '{value}'")
+    return old, new
+
+
+def parse_size(value: str) -> int:
+    """Parse a byte count such as ``512M`` or ``8G`` (binary units)."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = value.strip().upper().rstrip('B')
+    multiplier = units.get(text[-1:], 1)
+    if text[-1:] in units:
+        text = text[:-1]
+    try:
+        size = int(float(text) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size '{value}'") from None
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"size must be positive, got '{value}'")
+    return size
+
+
+def parse_build_time(value: str) -> str:
+    """Parse a ``--build-time`` value into a UTC timestamp (see utc_timestamp)."""
+    try:
+        return utc_timestamp(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid ISO 8601 time '{value}'") from None
+
+
+def parse_directory_threshold(value: str) -> Tuple[str, float]:
+    """Parse a ``--directory-threshold`` value of the form DIR=PERCENTAGE."""
+    directory, _, threshold = value.rpartition('=')
+    try:
+        return directory.rstrip('/') or '/', float(threshold)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected DIR=PERCENTAGE, got '{value}'") from None
+
+
+def parse_output_spec(value: str) -> Tuple[str, Optional[str]]:
+    """Parse an ``--output`` value of the form FORMAT or FORMAT=PATH."""
+    output_format, _, path = value.partition('=')
+    if output_format not in OUTPUT_FORMATS:
+        raise argparse.ArgumentTypeError(
+            f"invalid format '{output_format}' (choose from {', '.join(OUTPUT_FORMATS)})")
+    return output_format, path or None
+
+
+class CoverageWatcher:
+    """Keeps a merged report up to date as report files appear and change.
+
+    The inputs (typically a directory that test shards drop reports into)
+    are re-scanned on every poll. Only new or changed reports are parsed:
+    a new report is merged into the running report directly, while a
+    changed or deleted one re-merges just the files it covers from the
+    other reports. A report is parsed once its size and mtime have been
+    unchanged for one poll, so half-written shards are not picked up. A
+    report that still fails to parse is retried on the next polls, up to
+    ``WATCH_PARSE_ATTEMPTS`` times, and then only once it changes.
+    """
+
+    def __init__(self, inputs: Iterable[str], report_format: str = 'auto',
+                 lcov_engine: str = 'mmap', jobs: Optional[int] = None,
+                 path_filter: Optional[Callable[[str], bool]] = None,
+                 rollup: Optional[RollupOptions] = None):
+        self.inputs = list(inputs)
+        self.rollup = rollup
+        self.report_format = report_format
+        self.lcov_engine = lcov_engine
+        self.jobs = jobs or os.cpu_count() or 1
+        self.path_filter = path_filter
+        self.report = CoverageReport(track_lines=True)
+        # Bumped on every change; guards renders against concurrent updates
+        self.version = 0
+        self.lock = threading.Lock()
+        self._sources: Dict[str, FileTable] = {}
+        self._stamps: Dict[str, Tuple[int, int]] = {}
+        self._pending: Dict[str, Tuple[int, int]] = {}
+        # Stamp and failed attempts of reports that did not parse
+        self._failures: Dict[str, Tuple[Tuple[int, int], int]] = {}
+        # Reports covering each file, in the order they arrived
+        self._owners: Dict[str, List[str]] = {}
+        self._rendered: Dict[str, Tuple[int, str]] = {}
+
+    def poll(self) -> List[str]:
+        """Scan the inputs once and merge settled changes; return the reports applied."""
+        stamps = {}
+        for filepath in expand_inputs(self.inputs):
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+            stamps[filepath] = (stat.st_size, stat.st_mtime_ns)
+
+        changed = [path for path, stamp in stamps.items() if self._stamps.get(path) != stamp]
+        ready = [path for path in changed if self._pending.get(path) == stamps[path]]
+        self._pending = {path: stamps[path] for path in changed if path not in ready}
+        removed = [path for path in self._stamps if path not in stamps]
+
+        applied = []
+        with self.lock:
+            for path in removed:
+                del self._stamps[path]
+                self._failures.pop(path, None)
+                self._apply(path, None)
+                applied.append(path)
+
+            tasks = [_ParseTask(path, self.report_format, self.lcov_engine, True,
+                                self.path_filter, None, None) for path in ready]
+            try:
+                for task, files in zip(tasks, _run_tasks(tasks, self.jobs)):
+                    self._stamps[task.filepath] = stamps[task.filepath]
+                    self._failures.pop(task.filepath, None)
+                    self._apply(task.filepath, files)
+                    applied.append(task.filepath)
+            except Exception as e:
+                done = len(applied) - len(removed)
+                failed = tasks[done].filepath
+                stamp, attempts = self._failures.get(failed, (None, 0))
+                attempts = attempts + 1 if stamp == stamps[failed] else 1
+                if attempts >= WATCH_PARSE_ATTEMPTS:
+                    # Give up on this version of the report until it changes
+                    self._stamps[failed] = stamps[failed]
+                    self._failures.pop(failed, None)
+                    retry = "skipping it until it changes"
+                else:
+                    self._failures[failed] = (stamps[failed], attempts)
+                    retry = "retrying on the next poll"
+                print(f"Error parsing coverage report {failed}: {e} ({retry})",
+                      file=sys.stderr)
+                # The failed report, unless given up on, and the reports after
+                # it are parsed again on the next poll
+                for task in tasks[done:]:
+                    if self._stamps.get(task.filepath) != stamps[task.filepath]:
+                        self._pending[task.filepath] = stamps[task.filepath]
+
+            if applied:
+                self.version += 1
+        return applied
+
+    def _apply(self, path: str, files: Optional[FileTable]) -> None:
+        """Replace the files contributed by report ``path`` (None removes it)."""
+        old = self._sources.pop(path, None)
+        if files is not None:
+            self._sources[path] = files
+
+        if old is None:
+            for filename in files or ():
+                self._owners.setdefault(filename, []).append(path)
+                self.report.add_file(files[filename])
+            return
+
+        dropped = []
+        for filename in set(old).union(files or ()):
+            owners = self._owners.setdefault(filename, [])
+            if files is None or filename not in files:
+                owners.remove(path)
+            elif filename not in old:
+                owners.append(path)
+            if not owners:
+                del self._owners[filename]
+
+            merged = None
+            for owner in owners:
+                file_info = self._sources[owner][filename]
+                merged = file_info if merged is None else merge_file_coverage(merged, file_info)
+            if merged is None:
+                dropped.append(filename)
+            else:
+                self.report.files[filename] = merged
+        self.report.files.remove(dropped)
+
+    def render(self, output_format: str, threshold: int = 80, min_line_coverage: int = 70,
+               sort_by: str = 'coverage') -> str:
+        """Render the current report, reusing the last render while unchanged."""
+        with self.lock:
+            key = f'{output_format}:{threshold}:{min_line_coverage}:{sort_by}'
+            cached = self._rendered.get(key)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            out = io.StringIO()
+            ReportRenderer(self.report, self.rollup).write(out, output_format, threshold,
+                                              min_line_coverage, sort_by)
+            self._rendered[key] = (self.version, out.getvalue())
+            return out.getvalue()
+
+    def summary(self) -> Dict:
+        """Return the overall coverage of the current report."""
+        with self.lock:
+            overall_coverage, total_covered, total_lines = self.report.get_summary()
+            return {
+                "overall_coverage": round(overall_coverage, 2),
+                "lines_covered": total_covered,
+                "lines_total": total_lines,
+                "num_files": len(self.report.files),
+                "num_reports": len(self._sources),
+                "version": self.version
+            }
+
+
+class _CoverageRequestHandler(BaseHTTPRequestHandler):
+    """Serves a watcher's report: ``/`` or ``/coverage.json`` and ``/summary``."""
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path in ('/', '/coverage.json'):
+            body = self.server.watcher.render('json')
+        elif path == '/summary':
+            body = json.dumps(self.server.watcher.summary(), indent=2)
+        else:
+            self.send_error(404)
+            return
+
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_watcher(watcher: CoverageWatcher, address: str):
+    """Serve ``watcher`` over HTTP on ``[HOST:]PORT`` or ``unix:PATH`` in a thread."""
+    if address.startswith('unix:'):
+        socket_path = address[len('unix:'):]
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        server = UnixHTTPServer(socket_path, _CoverageRequestHandler)
+    else:
+        host, _, port = address.rpartition(':')
+        server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), _CoverageRequestHandler)
+
+    server.watcher = watcher
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _write_atomic(path: str, text: str) -> None:
+    """Replace ``path`` with ``text`` so readers never see a partial file."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def rollup_options(args: argparse.Namespace) -> Optional[RollupOptions]:
+    """Return the directory rollup options requested on the command line."""
+    if args.rollup_depth is None and not args.directory_threshold:
+        return None
+    return RollupOptions(args.rollup_depth, dict(args.directory_threshold or ()),
+                         args.threshold)
+
+
+def path_matcher(args: argparse.Namespace,
+                 diff: Optional['DiffIndex'] = None) -> Optional[PathMatcher]:
+    """Combine --include, --exclude, --exclude-pattern and a diff into one filter."""
+    exclude = list(args.exclude or ())
+    if args.exclude_pattern:
+        exclude.append('re:' + args.exclude_pattern)
+    if not args.include and not exclude and diff is None:
+        return None
+    return PathMatcher(args.include or (), exclude,
+                       diff.__contains__ if diff is not None else None)
+
+
+def run_watch(args: argparse.Namespace) -> None:
+    """Watch the report inputs and keep the outputs up to date until interrupted."""
+    watcher = CoverageWatcher(args.report_files, args.format, args.lcov_engine, args.jobs,
+                              path_matcher(args), rollup_options(args))
+    server = serve_watcher(watcher, args.serve) if args.serve else None
+    outputs = args.output or [('text', None)]
+    # Stop cleanly when a supervisor terminates the daemon
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        while True:
+            applied = watcher.poll()
+            if applied:
+                for output_format, path in outputs:
+                    text = watcher.render(output_format, args.threshold,
+                                          args.min_line_coverage, args.sort)
+                    if path is None:
+                        print(text, flush=True)
+                    else:
+                        _write_atomic(path, text)
+
+                summary = watcher.summary()
+                print(f"Merged {len(applied)} report(s): {summary['num_files']} files, "
+                      f"{summary['overall_coverage']:.2f}% coverage", file=sys.stderr)
+            time.sleep(args.watch_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            if args.serve.startswith('unix:'):
+                os.unlink(args.serve[len('unix:'):])
+
+
+def utc_timestamp(value: str) -> str:
+    """Return an ISO 8601 time as a UTC timestamp with a fixed layout.
+
+    Times without an offset are taken to be UTC. Build timestamps are
+    compared as text, which orders them in time only in this form. Raises
+    ValueError for anything that is not an ISO 8601 time.
+    """
+    text = value.strip()
+    if text[-1:] in ('Z', 'z'):
+        text = text[:-1] + '+00:00'
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat(timespec='seconds')
+
+
+class CoverageDatabase:
+    """SQLite store of per-file coverage across builds.
+
+    Each ingested build adds one row per file, keyed by build and path, so
+    trends, directory rollups and regressions between builds are answered by
+    indexed queries instead of re-parsing old reports. Paths are stored once
+    in their own table. Re-ingesting a build ID replaces its rows.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS builds (
+            id INTEGER PRIMARY KEY,
+            build_id TEXT NOT NULL UNIQUE,
+            timestamp TEXT NOT NULL,
+            lines_covered INTEGER NOT NULL,
+            lines_total INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS builds_timestamp ON builds (timestamp);
+        CREATE TABLE IF NOT EXISTS paths (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS file_coverage (
+            build INTEGER NOT NULL REFERENCES builds (id) ON DELETE CASCADE,
+            path INTEGER NOT NULL REFERENCES paths (id),
+            lines_covered INTEGER NOT NULL,
+            lines_total INTEGER NOT NULL,
+            line_coverage REAL NOT NULL,
+            branch_coverage REAL,
+            function_coverage REAL,
+            PRIMARY KEY (build, path)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS file_coverage_path ON file_coverage (path, build);
+    """
+
+    def __init__(self, filepath: str):
+        self.conn = sqlite3.connect(filepath)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def ingest(self, report: CoverageReport, build_id: str,
+               timestamp: Optional[str] = None) -> None:
+        """Store every file of ``report`` as build ``build_id``.
+
+        ``timestamp`` is an ISO 8601 time (default: now), stored in UTC.
+        """
+        if timestamp:
+            timestamp = utc_timestamp(timestamp)
+        else:
+            timestamp = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        files = report.files if isinstance(report.files, FileTable) else FileTable(report.files)
+        lines_covered, lines_total = files.totals()
+
+        with self.conn:
+            self.conn.execute('DELETE FROM builds WHERE build_id = ?', (build_id,))
+            build = self.conn.execute(
+                'INSERT INTO builds (build_id, timestamp, lines_covered, lines_total) '
+                'VALUES (?, ?, ?, ?)', (build_id, timestamp, lines_covered, lines_total)
+            ).lastrowid
+            self.conn.executemany('INSERT OR IGNORE INTO paths (path) VALUES (?)',
+                                  ((name,) for name in files.names))
+            path_ids = self._path_ids(files.names)
+            self.conn.executemany(
+                'INSERT INTO file_coverage VALUES (?, ?, ?, ?, ?, ?, ?)',
+                ((build, path_ids[name], covered, total, coverage,
+                  None if math.isnan(branch) else branch,
+                  None if math.isnan(function) else function)
+                 for name, covered, total, coverage, branch, function in zip(
+                     files.names, files.lines_covered, files.lines_total,
+                     files.line_coverage, files.branch_coverage, files.function_coverage))
+            )
+
+    def _path_ids(self, names: List[str]) -> Dict[str, int]:
+        """Look up path IDs in batches below SQLite's parameter limit."""
+        path_ids = {}
+        for start in range(0, len(names), 500):
+            batch = names[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            path_ids.update(self.conn.execute(
+                f'SELECT path, id FROM paths WHERE path IN ({placeholders})', batch))
+        return path_ids
+
+    def resolve_build(self, build_id: Optional[str] = None, offset: int = 0) -> Tuple[int, str]:
+        """Return (row ID, build ID) of ``build_id``, or of the ``offset``-th latest build."""
+        if build_id is not None:
+            row = self.conn.execute('SELECT id, build_id FROM builds WHERE build_id = ?',
+                                    (build_id,)).fetchone()
+        else:
+            row = self.conn.execute('SELECT id, build_id FROM builds '
+                                    'ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?',
+                                    (offset,)).fetchone()
+        if row is None:
+            raise ValueError(f"Build not found: {build_id if build_id is not None else offset}")
+        return row
+
+    def trend(self, pattern: Optional[str] = None, last: int = 20) -> List[Dict]:
+        """Return coverage of the files matching ``pattern`` over the last builds.
+
+        ``pattern`` is a glob where ``*`` and ``**`` both match across
+        directories, e.g. ``src/payments/**``. Builds are oldest first.
+        """
+        if pattern is None:
+            rows = self.conn.execute(
+                'SELECT build_id, timestamp, lines_covered, lines_total FROM builds '
+                'ORDER BY timestamp DESC, id DESC LIMIT ?', (last,)).fetchall()
+        else:
+            rows = self.conn.execute(
+                'SELECT b.build_id, b.timestamp, SUM(f.lines_covered), SUM(f.lines_total) '
+                'FROM (SELECT id, build_id, timestamp FROM builds '
+                '      ORDER BY timestamp DESC, id DESC LIMIT ?) AS b '
+                'JOIN file_coverage AS f ON f.build = b.id '
+                'WHERE f.path IN (SELECT id FROM paths WHERE path GLOB ?) '
+                'GROUP BY b.id ORDER BY b.timestamp DESC, b.id DESC',
+                (last, pattern.replace('**', '*'))).fetchall()
+
+        return [{
+            "build_id": build_id,
+            "timestamp": timestamp,
+            "coverage": round(covered / total * 100, 2) if total else 0.0,
+            "lines_covered": covered,
+            "lines_total": total
+        } for build_id, timestamp, covered, total in reversed(rows)]
+
+    def rollup(self, build_id: Optional[str] = None, depth: int = 1) -> List[Dict]:
+        """Return the coverage of every directory of a build (default: the
+        latest) down to ``depth``, parents before children, like --rollup-depth."""
+        build, build_id = self.resolve_build(build_id)
+        tree = DirectoryTree()
+        for path, covered, total in self.conn.execute(
+                'SELECT p.path, f.lines_covered, f.lines_total FROM file_coverage AS f '
+                'JOIN paths AS p ON p.id = f.path WHERE f.build = ?', (build,)):
+            tree.add(path, covered, total)
+
+        return [{
+            "directory": rollup.directory,
+            "depth": rollup.depth,
+            "coverage": round(rollup.line_coverage, 2),
+            "lines_covered": rollup.lines_covered,
+            "lines_total": rollup.lines_total,
+            "num_files": rollup.num_files
+        } for rollup in tree.rollups(RollupOptions(depth=depth))]
+
+    def regressions(self, base: Optional[str] = None, head: Optional[str] = None,
+                    limit: int = 20) -> List[Dict]:
+        """Return the files whose coverage dropped most from ``base`` to ``head``.
+
+        Defaults compare the latest build with the one before it.
+        """
+        head_row, head_id = self.resolve_build(head)
+        base_row, base_id = self.resolve_build(base, offset=1 if base is None else 0)
+        rows = self.conn.execute(
+            'SELECT p.path, b.line_coverage, h.line_coverage, '
+            '       h.line_coverage - b.line_coverage AS delta '
+            'FROM file_coverage AS h '
+            'JOIN file_coverage AS b ON b.path = h.path AND b.build = ? '
+            'JOIN paths AS p ON p.id = h.path '
+            'WHERE h.build = ? AND delta < 0 ORDER BY delta, p.path LIMIT ?',
+            (base_row, head_row, limit)).fetchall()
+
+        return [{
+            "filename": path,
+            "base_build": base_id,
+            "head_build": head_id,
+            "base_coverage": round(base_coverage, 2),
+            "head_coverage": round(head_coverage, 2),
+            "delta": round(delta, 2)
+        } for path, base_coverage, head_coverage, delta in rows]
+
+
+def _encode_test_set(test_ids: Sequence[int]) -> bytes:
+    """Encode sorted test IDs as a uint32 array or a bitset, whichever is smaller."""
+    bitset_size = test_ids[-1] // 8 + 1
+    if len(test_ids) * 4 < bitset_size:
+        values = array('I', test_ids)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return b'A' + values.tobytes()
+    bits = bytearray(bitset_size)
+    for test_id in test_ids:
+        bits[test_id >> 3] |= 1 << (test_id & 7)
+    return b'B' + bytes(bits)
+
+
+def _decode_test_set(blob: bytes) -> int:
+    """Decode a set written by _encode_test_set as a bitset integer."""
+    if blob[:1] == b'B':
+        return int.from_bytes(blob[1:], 'little')
+    values = array('I')
+    values.frombytes(blob[1:])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    bits = bytearray(values[-1] // 8 + 1)
+    for test_id in values:
+        bits[test_id >> 3] |= 1 << (test_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _bitset_ids(bits: int) -> List[int]:
+    """Return the positions of the set bits of ``bits``."""
+    test_ids = []
+    for index, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+        if byte:
+            test_ids.extend(index * 8 + bit for bit in range(8) if byte >> bit & 1)
+    return test_ids
+
+
+class TestIndex:
+    """SQLite inverted index from source lines to the tests that ran them.
+
+    Built from coverage.py JSON reports with per-test contexts. Consecutive
+    lines run by the same tests are stored as one line range, and each
+    distinct set of tests is stored once, as a sorted array of test IDs or as
+    a bitset, whichever is smaller. Selecting the tests of a diff reads only
+    the ranges of the changed files.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tests (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS paths (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            basename TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS paths_basename ON paths (basename);
+        CREATE TABLE IF NOT EXISTS test_sets (
+            id INTEGER PRIMARY KEY,
+            tests BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS line_ranges (
+            path INTEGER NOT NULL REFERENCES paths (id),
+            first_line INTEGER NOT NULL,
+            last_line INTEGER NOT NULL,
+            test_set INTEGER NOT NULL REFERENCES test_sets (id),
+            PRIMARY KEY (path, first_line, test_set)
+        ) WITHOUT ROWID;
+    """
+
+    # Suffix coverage.py's pytest plugins append to a test's context label
+    CONTEXT_PHASE = re.compile(r'\|(?:setup|run|teardown)$')
+
+    def __init__(self, filepath: str):
+        self.conn = sqlite3.connect(filepath)
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def build(self, sources: Iterable[ReportSource],
+              path_filter: Optional[Callable[[str], bool]] = None) -> Dict[str, int]:
+        """Replace the index with the contexts of coverage.py JSON ``sources``.
+
+        Reports are streamed one file entry at a time; only the test names
+        and the distinct test sets are held in memory. Returns counts of
+        what was stored.
+        """
+        report = CoveragePyReport(track_lines=False, path_filter=path_filter)
+        test_ids: Dict[str, int] = {}
+        set_ids: Dict[bytes, int] = {}
+        num_ranges = 0
+
+        with self.conn:
+            for table in ('line_ranges', 'test_sets', 'paths', 'tests'):
+                self.conn.execute(f'DELETE FROM {table}')
+
+            for source in sources:
+                for filename, contexts in report.iter_contexts(source):
+                    path_id = self._path_id(filename)
+                    rows = []
+                    new_sets = []
+                    for first, last, tests in self._line_runs(contexts, test_ids):
+                        blob = _encode_test_set(tests)
+                        set_id = set_ids.get(blob)
+                        if set_id is None:
+                            set_id = set_ids[blob] = len(set_ids)
+                            new_sets.append((set_id, blob))
+                        rows.append((path_id, first, last, set_id))
+                    self.conn.executemany('INSERT INTO test_sets VALUES (?, ?)', new_sets)
+                    self.conn.executemany('INSERT OR IGNORE INTO line_ranges VALUES (?, ?, ?, ?)',
+                                          rows)
+                    num_ranges += len(rows)
+
+            self.conn.executemany('INSERT INTO tests VALUES (?, ?)',
+                                  ((test_id, name) for name, test_id in test_ids.items()))
+            num_files = self.conn.execute('SELECT COUNT(*) FROM paths').fetchone()[0]
+
+        return {"files": num_files, "tests": len(test_ids),
+                "test_sets": len(set_ids), "line_ranges": num_ranges}
+
+    def _path_id(self, filename: str) -> int:
+        """Return the ID of a path, adding it if needed."""
+        row = self.conn.execute('SELECT id FROM paths WHERE path = ?', (filename,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self.conn.execute('INSERT INTO paths (path, basename) VALUES (?, ?)',
+                                 (filename, filename.replace('\\', '/').rsplit('/', 1)[-1])
+                                 ).lastrowid
+
+    def _line_runs(self, contexts: Mapping[str, List[str]],
+                   test_ids: Dict[str, int]) -> Iterator[Tuple[int, int, Tuple[int, ...]]]:
+        """Yield (first line, last line, test IDs) for each run of consecutive
+        lines executed by the same tests. Test IDs are assigned on first sight."""
+        run: Optional[List] = None
+        for number, labels in sorted((int(number), labels) for number, labels in contexts.items()):
+            tests = set()
+            for label in labels:
+                name = self.CONTEXT_PHASE.sub('', label)
+                if name:
+                    test_id = test_ids.get(name)
+                    if test_id is None:
+                        test_id = test_ids[name] = len(test_ids)
+                    tests.add(test_id)
+            if not tests:
+                continue
+            key = tuple(sorted(tests))
+            if run is not None and run[2] == key and run[1] == number - 1:
+                run[1] = number
+                continue
+            if run is not None:
+                yield tuple(run)
+            run = [number, number, key]
+        if run is not None:
+            yield tuple(run)
+
+    def select(self, diff: 'DiffIndex') -> List[str]:
+        """Return the sorted names of the tests that ran any changed line."""
+        set_ids: Set[int] = set()
+        for diff_path in diff.changed_lines:
+            basename = diff_path.rsplit('/', 1)[-1]
+            for path_id, path in self.conn.execute(
+                    'SELECT id, path FROM paths WHERE basename = ?', (basename,)).fetchall():
+                changed = diff.lookup(path)
+                if not changed:
+                    continue
+                lines = sorted(changed)
+                for first, last, set_id in self.conn.execute(
+                        'SELECT first_line, last_line, test_set FROM line_ranges '
+                        'WHERE path = ?', (path_id,)):
+                    index = bisect.bisect_left(lines, first)
+                    if index < len(lines) and lines[index] <= last:
+                        set_ids.add(set_id)
+
+        bits = 0
+        for blob in self._fetch('SELECT tests FROM test_sets WHERE id IN ({})', set_ids):
+            bits |= _decode_test_set(blob)
+        return sorted(self._fetch('SELECT name FROM tests WHERE id IN ({})', _bitset_ids(bits)))
+
+    def _fetch(self, query: str, ids: Iterable[int]) -> List:
+        """Run ``query`` for batches of IDs below SQLite's parameter limit."""
+        ids = list(ids)
+        values = []
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            values.extend(row[0] for row in self.conn.execute(
+                query.format(','.join('?' * len(batch))), batch))
+        return values
+
+
+def _print_rows(rows: List[Dict], output_format: str) -> None:
+    """Print query results as an aligned table or as JSON."""
+    if output_format == 'json':
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print("No results")
+        return
+
+    columns = list(rows[0])
+    widths = [max(len(column), *(len(str(row[column])) for row in rows))
+              for column in columns]
+    print('  '.join(f"{column:<{width}}" for column, width in zip(columns, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row in rows:
+        print('  '.join(f"{str(row[column]):<{width}}" for column, width in zip(columns, widths)))
+
+
+def query_main(argv: List[str]) -> None:
+    """Entry point of the ``query`` subcommand."""
+    parser = argparse.ArgumentParser(
+        prog='coverage-analyzer.py query',
+        description='Query coverage history stored with --db'
+    )
+    parser.add_argument('--db', type=str, required=True,
+                       help='SQLite coverage database written by --db')
+    parser.add_argument('--output', choices=['text', 'json'], default='text',
+                       help='Output format (default: text)')
+    queries = parser.add_subparsers(dest='query', required=True)
+
+    trend = queries.add_parser('trend', help='Coverage over the last builds')
+    trend.add_argument('--path', type=str, default=None,
+                       help='Only count files matching this glob, e.g. src/payments/**')
+    trend.add_argument('--last', type=int, default=20,
+                       help='Number of builds (default: 20)')
+
+    rollup = queries.add_parser('rollup', help='Per-directory coverage of one build')
+    rollup.add_argument('--build-id', type=str, default=None,
+                       help='Build to roll up (default: latest)')
+    rollup.add_argument('--depth', type=int, default=1,
+                       help='Directory levels to report (default: 1)')
+
+    regressions = queries.add_parser('regressions',
+                                     help='Files whose coverage dropped most between builds')
+    regressions.add_argument('--base', type=str, default=None,
+                            help='Base build (default: the build before the latest)')
+    regressions.add_argument('--head', type=str, default=None,
+                            help='Head build (default: latest)')
+    regressions.add_argument('--limit', type=int, default=20,
+                            help='Maximum number of files (default: 20)')
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"Error: Coverage database not found: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    db = CoverageDatabase(args.db)
+    try:
+        if args.query == 'trend':
+            rows = db.trend(args.path, args.last)
+        elif args.query == 'rollup':
+            rows = db.rollup(args.build_id, args.depth)
+        else:  # regressions
+            rows = db.regressions(args.base, args.head, args.limit)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
+
+    _print_rows(rows, args.output)
+
+
+def parse_line_spec(spec: str) -> Tuple[str, Set[int]]:
+    """Parse ``path:lines`` such as ``src/app.py:10,14-20``."""
+    path, separator, ranges = spec.rpartition(':')
+    if not separator or not path:
+        raise ValueError(f"Expected <file>:<lines>, got '{spec}'")
+    lines: Set[int] = set()
+    for item in ranges.split(','):
+        first, _, last = item.partition('-')
+        try:
+            lines.update(range(int(first), int(last or first) + 1))
+        except ValueError:
+            raise ValueError(f"Invalid line range '{item}' in '{spec}'") from None
+    return path, lines
+
+
+def index_main(argv: List[str]) -> None:
+    """Entry point of the ``index`` subcommand."""
+    parser = argparse.ArgumentParser(
+        prog='coverage-analyzer.py index',
+        description='Build and query a line -> tests index for test selection'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Index coverage.py reports with test contexts')
+    build.add_argument('--index', type=str, required=True,
+                       help='SQLite index file to write (replaced if it exists)')
+    build.add_argument('report_files', nargs='+', metavar='report_file',
+                       help="coverage.py JSON reports, directories or glob patterns "
+                            "('-' reads from stdin; compressed reports are supported)")
+
+    select = commands.add_parser('select', help='Tests that ran the changed lines')
+    select.add_argument('--index', type=str, required=True,
+                        help='SQLite index file written by index build')
+    select.add_argument('--diff', type=str, default=None,
+                        help="Unified diff of the change ('-' reads from stdin)")
+    select.add_argument('lines', nargs='*', metavar='file:lines',
+                        help='Changed lines, e.g. src/app.py:10,14-20')
+    select.add_argument('--output', choices=['text', 'json'], default='text',
+                        help='Output format (default: text)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        report_files = expand_inputs(args.report_files)
+        if not report_files:
+            print("Error: No coverage reports found", file=sys.stderr)
+            sys.exit(1)
+        index = TestIndex(args.index)
+        try:
+            counts = index.build(report_files)
+        except (OSError, ValueError) as e:
+            print(f"Error building index: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            index.close()
+        print(f"Indexed {counts['files']} files, {counts['tests']} tests "
+              f"({counts['test_sets']} distinct test sets, {counts['line_ranges']} line ranges)")
+        return
+
+    if not args.diff and not args.lines:
+        parser.error('select needs --diff or at least one file:lines')
+    if not os.path.exists(args.index):
+        print(f"Error: Test index not found: {args.index}", file=sys.stderr)
         sys.exit(1)
 
-    # Apply filters
-    report.filter_files(args.exclude_pattern)
+    changed_lines: Dict[str, Set[int]] = {}
+    try:
+        if args.diff == '-':
+            changed_lines.update(DiffIndex.from_patch(sys.stdin).changed_lines)
+        elif args.diff:
+            with open(args.diff, 'r') as f:
+                changed_lines.update(DiffIndex.from_patch(f).changed_lines)
+        for spec in args.lines:
+            path, lines = parse_line_spec(spec)
+            changed_lines.setdefault(path, set()).update(lines)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    index = TestIndex(args.index)
+    try:
+        tests = index.select(DiffIndex(changed_lines))
+    finally:
+        index.close()
 
-    # Format output
     if args.output == 'json':
-        output = format_json_output(report)
-    elif args.output == 'csv':
-        output = format_csv_output(report)
-    else:  # text
-        output = format_text_output(report, args.threshold, args.min_line_coverage, args.sort)
+        print(json.dumps({"tests": tests}, indent=2))
+    else:
+        for name in tests:
+            print(name)
+
+
+def iter_report_records(filepaths: Iterable[str], report_format: str = 'auto',
+                        lcov_engine: str = 'mmap', track_lines: bool = True,
+                        path_filter: Optional[Callable[[str], bool]] = None
+                        ) -> Iterator[FileCoverage]:
+    """Yield the records of several reports, one at a time, in this process."""
+    for filepath in filepaths:
+        if filepath == STDIN_PATH:
+            with open_report(filepath) as stream:
+                file_format = report_format
+                if file_format == 'auto':
+                    file_format = detect_stream_format(stream)
+                report = create_report(file_format, lcov_engine, track_lines, path_filter)
+                yield from report.iter_records(stream)
+            continue
+        file_format = detect_format(filepath) if report_format == 'auto' else report_format
+        yield from create_report(file_format, lcov_engine, track_lines,
+                                 path_filter).iter_records(filepath)
+
+
+def compare_main(argv: List[str]) -> None:
+    """Entry point of the ``compare`` subcommand."""
+    parser = argparse.ArgumentParser(
+        prog='coverage-analyzer.py compare',
+        description='Compare the coverage of a head report against a base report'
+    )
+    parser.add_argument('--base', nargs='+', required=True, metavar='REPORT',
+                       help='Base coverage reports, directories or glob patterns')
+    parser.add_argument('--head', nargs='+', required=True, metavar='REPORT',
+                       help="Head coverage reports, directories or glob patterns "
+                            "('-' reads from stdin)")
+    parser.add_argument('--format', choices=['auto', 'lcov', 'coverage-py', 'cobertura'],
+                       default='auto', help='Coverage report format (default: auto-detect)')
+    parser.add_argument('--lcov-engine', choices=['mmap', 'text'], default='mmap',
+                       help='LCOV parsing engine (default: mmap)')
+    parser.add_argument('--jobs', type=int, default=None,
+                       help='Number of parser processes (default: one per CPU)')
+    parser.add_argument('--path-map', type=parse_path_map, action='append', default=None,
+                       metavar='OLD=NEW',
+                       help='Join files under OLD (a file or directory) as NEW, for renames '
+                            'and differing checkout roots; repeatable')
+    parser.add_argument('--include', type=str, action='append', default=None,
+                       metavar='PATTERN',
+                       help="Only compare files matching this glob (or 're:' regex); repeatable")
+    parser.add_argument('--exclude', type=str, action='append', default=None,
+                       metavar='PATTERN',
+                       help="Skip files matching this glob (or 're:' regex); repeatable")
+    parser.add_argument('--max-drop', type=float, default=None, metavar='PP',
+                       help='Fail if any file loses more than PP percentage points of line '
+                            'coverage')
+    parser.add_argument('--max-total-drop', type=float, default=None, metavar='PP',
+                       help='Fail if total line coverage drops by more than PP percentage points')
+    parser.add_argument('--fail-fast', action='store_true',
+                       help='Stream the head reports and stop at the first file over --max-drop')
+    parser.add_argument('--output', type=parse_output_spec, action='append', default=None,
+                       metavar='FORMAT[=PATH]',
+                       help='Output format (text, json or csv), optionally written to PATH; '
+                            'repeatable (default: text)')
+    parser.add_argument('--sort', choices=['change', 'file'], default='change',
+                       help='Sort text output by change or file name (default: change)')
+
+    args = parser.parse_args(argv)
+    if args.fail_fast and args.max_drop is None:
+        parser.error('--fail-fast requires --max-drop')
+
+    base_files = expand_inputs(args.base)
+    head_files = expand_inputs(args.head)
+    if not base_files or not head_files:
+        print("Error: No coverage reports found for "
+              f"{'--base' if not base_files else '--head'}", file=sys.stderr)
+        sys.exit(1)
+
+    path_filter = None
+    if args.include or args.exclude:
+        path_filter = PathMatcher(args.include or (), args.exclude or ())
+    base = CoverageReport(path_filter=path_filter)
+    head = CoverageReport(path_filter=path_filter)
+    try:
+        base.parse_many(base_files, args.format, args.lcov_engine, args.jobs)
+        comparison = ReportComparison(base.files, PathMap(args.path_map or ()))
+        if args.fail_fast:
+            # Check each head file against the indexed base once its run of
+            # consecutive records has been merged, i.e. at the next file's
+            # record or the end of the reports. A file whose records are
+            # spread over the reports is checked again after each later run.
+            records = iter_report_records(head_files, args.format, args.lcov_engine,
+                                          head.track_lines, path_filter)
+            for filename, run in groupby(records, key=lambda record: record.filename):
+                for record in run:
+                    head.add_file(record)
+                file_info = head.files[filename]
+                drop = comparison.drop(file_info)
+                if drop is not None and drop > args.max_drop:
+                    base_coverage = file_info.line_coverage + drop
+                    print(f"Coverage of {file_info.filename} dropped by {drop:.2f} pp "
+                          f"({base_coverage:.2f}% -> {file_info.line_coverage:.2f}%), more than "
+                          f"--max-drop {args.max_drop}", file=sys.stderr)
+                    sys.exit(1)
+        else:
+            head.parse_many(head_files, args.format, args.lcov_engine, args.jobs)
+    except Exception as e:
+        print(f"Error parsing coverage report: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    renderer = ComparisonRenderer(base.files, head.files, comparison.deltas(head.files),
+                                  args.max_drop, args.max_total_drop)
+    for output_format, path in args.output or [('text', None)]:
+        if path is None:
+            renderer.write(sys.stdout, output_format, args.sort)
+            sys.stdout.write('\n')
+        else:
+            with open(path, 'w') as f:
+                renderer.write(f, output_format, args.sort)
+                f.write('\n')
+
+    if renderer.failed:
+        sys.exit(1)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        query_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'index':
+        index_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        compare_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        description='Parse and analyze code coverage reports in multiple formats'
+    )
+    parser.add_argument('report_files', nargs='+', metavar='report_file',
+                       help="Coverage report files, directories or glob patterns "
+                            "('-' reads from stdin; compressed reports are supported)")
+    parser.add_argument('--format', choices=['auto', 'lcov', 'coverage-py', 'cobertura'],
+                       default='auto', help='Coverage report format (default: auto-detect)')
+    parser.add_argument('--lcov-engine', choices=['mmap', 'text'], default='mmap',
+                       help='LCOV parsing engine: memory-mapped byte scanner or '
+                            'line-by-line text reader (default: mmap)')
+    parser.add_argument('--jobs', type=int, default=None,
+                       help='Number of parser processes (default: one per CPU)')
+    parser.add_argument('--cache-dir', type=str,
+                       default=os.environ.get('COVERAGE_ANALYZER_CACHE_DIR'),
+                       help='Cache parsed reports in this directory '
+                            '(default: $COVERAGE_ANALYZER_CACHE_DIR, disabled if unset)')
+    parser.add_argument('--cache-max-size', type=int, default=DEFAULT_CACHE_SIZE,
+                       help='Cache size in bytes before least recently used entries '
+                            'are evicted (default: 1 GiB)')
+    parser.add_argument('--cache-hash', action='store_true',
+                       help='Also key cache entries by a hash of the report contents')
+    parser.add_argument('--memory-budget', type=parse_size, default=None, metavar='SIZE',
+                       help='Spill merged files to disk to keep merging within about SIZE '
+                            'bytes, e.g. 6G')
+    parser.add_argument('--diff', type=str, default=None, metavar='PATCH',
+                       help="Only report coverage of lines changed in this unified diff "
+                            "('-' reads it from stdin)")
+    parser.add_argument('--summary-only', action='store_true',
+                       help='Trust the coverage totals in the reports and skip '
+                            'per-line data')
+    parser.add_argument('--threshold', type=int, default=80,
+                       help='Coverage threshold for warnings (default: 80)')
+    parser.add_argument('--output', type=parse_output_spec, action='append', default=None,
+                       metavar='FORMAT[=PATH]',
+                       help='Output format (text, json or csv), optionally written to PATH '
+                            'instead of stdout; repeat for several formats (default: text)')
+    parser.add_argument('--min-line-coverage', type=int, default=70,
+                       help='Minimum line coverage per file (default: 70)')
+    parser.add_argument('--exclude-pattern', type=str, default=None,
+                       help='Regex pattern for files to exclude')
+    parser.add_argument('--include', type=str, action='append', default=None,
+                       metavar='PATTERN',
+                       help="Only report files matching this glob (or 're:' regex); repeatable")
+    parser.add_argument('--exclude', type=str, action='append', default=None,
+                       metavar='PATTERN',
+                       help="Skip files matching this glob (or 're:' regex); repeatable")
+    parser.add_argument('--sort', choices=['file', 'coverage', 'lines'], default='coverage',
+                       help='Sort output by file name, coverage, or lines (default: coverage)')
+    parser.add_argument('--rollup-depth', type=int, default=None, metavar='N',
+                       help='Also report coverage of every directory down to depth N')
+    parser.add_argument('--directory-threshold', type=parse_directory_threshold,
+                       action='append', default=None, metavar='DIR=PERCENTAGE',
+                       help='Minimum coverage for DIR and its subdirectories in the '
+                            'directory rollup (default: --threshold); repeatable')
+    parser.add_argument('--profile', nargs='?', const='-', default=None, metavar='FILE',
+                       help='Write per-phase timings, peak memory and counts as JSON '
+                            'to FILE (default: stderr)')
+    parser.add_argument('--profile-stats', type=str, default=None, metavar='FILE',
+                       help='Write a cProfile dump of the run to FILE (implies --profile)')
+
+    parser.add_argument('--db', type=str, default=None, metavar='PATH',
+                       help='Also store the per-file results in this SQLite database')
+    parser.add_argument('--build-id', type=str, default=None,
+                       help='Build ID to store the results under (default: the build time)')
+    parser.add_argument('--build-time', type=parse_build_time, default=None,
+                       help='ISO 8601 time of the build, UTC unless it has an offset '
+                            '(default: now)')
+    parser.add_argument('--watch', action='store_true',
+                       help='Keep running and merge reports as they appear or change')
+    parser.add_argument('--watch-interval', type=float, default=2.0, metavar='SECONDS',
+                       help='Seconds between scans in watch mode (default: 2)')
+    parser.add_argument('--serve', type=str, default=None, metavar='ADDRESS',
+                       help='In watch mode, serve the report over HTTP on [HOST:]PORT '
+                            'or unix:PATH')
+
+    args = parser.parse_args()
+    if args.watch:
+        if (STDIN_PATH in args.report_files or args.diff or args.profile or
+                args.profile_stats or args.summary_only or args.memory_budget):
+            parser.error('--watch cannot read stdin or be combined with --diff, '
+                         '--summary-only, --memory-budget or --profile')
+        run_watch(args)
+        return
+    if args.serve:
+        parser.error('--serve requires --watch')
+    if (args.build_id or args.build_time) and not args.db:
+        parser.error('--build-id and --build-time require --db')
+    if args.summary_only and args.diff:
+        parser.error('--diff needs line data and cannot be combined with --summary-only')
+
+    if args.profile_stats and not args.profile:
+        args.profile = '-'
+    profiler = Profiler(enabled=args.profile is not None,
+                        profile_calls=args.profile_stats is not None)
+
+    with profiler.phase('expand'):
+        report_files = expand_inputs(args.report_files)
+    if not report_files:
+        print(f"Error: No coverage reports found in: {', '.join(args.report_files)}",
+              file=sys.stderr)
+        sys.exit(1)
+
+    cache = None
+    if args.cache_dir:
+        cache = ReportCache(args.cache_dir, args.cache_max_size, args.cache_hash)
+
+    diff = None
+    if args.diff:
+        try:
+            if args.diff == '-':
+                diff = DiffIndex.from_patch(sys.stdin)
+            else:
+                with open(args.diff, 'r') as f:
+                    diff = DiffIndex.from_patch(f)
+        except OSError as e:
+            print(f"Error reading diff: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    # Line-level data is needed to union repeated records of a file, within
+    # one report as well as across reports, and to score changed lines.
+    # Records for excluded files, and with a diff for unchanged files, are
+    # skipped while parsing.
+    report = CoverageReport(track_lines=not args.summary_only,
+                            path_filter=path_matcher(args, diff),
+                            summary_only=args.summary_only)
+
+    # Parse the reports
+    try:
+        report.parse_many(report_files, args.format, args.lcov_engine, args.jobs, cache,
+                          profiler, args.memory_budget, keep_line_hits=diff is not None)
+    except Exception as e:
+        print(f"Error parsing coverage report: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if profiler.enabled:
+        profiler.count('reports', len(report_files))
+        profiler.count('files_parsed', len(report.files))
+        profiler.count('lines_parsed', report.files.totals()[1])
+
+    if diff is not None:
+        with profiler.phase('diff'):
+            report.restrict_to_diff(diff)
+
+    profiler.count('files_reported', len(report.files))
+
+    if args.db:
+        timestamp = args.build_time or datetime.now(timezone.utc).isoformat(timespec='seconds')
+        with profiler.phase('db'):
+            db = CoverageDatabase(args.db)
+            try:
+                db.ingest(report, args.build_id or timestamp, timestamp)
+            finally:
+                db.close()
+
+    # Write every requested format from the one parse
+    renderer = ReportRenderer(report, rollup_options(args))
+    for output_format, path in args.output or [('text', None)]:
+        with profiler.phase('output'):
+            if path is None:
+                renderer.write(sys.stdout, output_format, args.threshold,
+                               args.min_line_coverage, args.sort)
+                sys.stdout.write('\n')
+            else:
+                with open(path, 'w') as f:
+                    renderer.write(f, output_format, args.threshold,
+                                   args.min_line_coverage, args.sort)
+                    f.write('\n')
 
-    print(output)
+    if profiler.enabled:
+        summary = profiler.stop()
+        if args.profile_stats:
+            profiler.dump_stats(args.profile_stats)
+        if args.profile == '-':
+            print(json.dumps(summary, indent=2), file=sys.stderr)
+        else:
+            with open(args.profile, 'w') as f:
+                json.dump(summary, f, indent=2)
 
 
 if __name__ == '__main__':
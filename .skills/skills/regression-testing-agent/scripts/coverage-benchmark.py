@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Coverage Benchmark - Measure wall time and peak memory of the coverage-analyzer parsers.
+
+Generates reproducible synthetic LCOV, Cobertura and coverage.py reports and
+times each phase of an analyzer run separately: parse, filter, summary and
+every output formatter. Each measurement runs in a fresh interpreter so that
+peak RSS reflects a single run and is not polluted by earlier runs. The peak
+is read once right after parsing and again at the end, so the parse peak of
+each mode is not mixed with the memory of the output formatters.
+
+Usage:
+  python coverage-benchmark.py [options]
+
+Options:
+  --files <n>
+      Number of source files in the synthetic report (default: 2000)
+  --lines <n>
+      Number of lines per source file (default: 500)
+  --seed <n>
+      Random seed for the synthetic reports (default: 0)
+  --formats <list>
+      Comma-separated report formats to benchmark (default: lcov,cobertura,coverage-py)
+  --workdir <dir>
+      Directory for generated reports (default: a temporary directory)
+  --output <file>
+      Write the results as JSON for comparison across commits
+
+Examples:
+  # Large run, results saved for later comparison
+  python coverage-benchmark.py --files 10000 --lines 2000 --output bench.json
+"""
+
+import argparse
+import importlib.util
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+ANALYZER_PATH = Path(__file__).with_name('coverage-analyzer.py')
+
+# Excludes roughly one package in ten during the filter phase.
+FILTER_PATTERN = r'/pkg\d*7/'
+
+# Phases timed after parsing, in order.
+PHASES = ('filter', 'summary', 'format_text', 'format_json', 'format_csv')
+
+
+def load_analyzer():
+    """Import coverage-analyzer.py as a module despite the dash in its name."""
+    spec = importlib.util.spec_from_file_location('coverage_analyzer', ANALYZER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['coverage_analyzer'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def generate_cobertura(filepath: Path, num_files: int, lines_per_file: int,
+                       seed: int = 0) -> None:
+    """Write a synthetic Cobertura XML report."""
+    # The root carries the report totals, so draw the same hits once up front
+    rng = random.Random(seed)
+    covered = sum(rng.random() < 0.8 for _ in range(num_files * lines_per_file))
+    valid = num_files * lines_per_file
+    rng = random.Random(seed)
+    with open(filepath, 'w') as f:
+        f.write(f'<?xml version="1.0" ?>\n<coverage version="1" lines-valid="{valid}" '
+                f'lines-covered="{covered}" line-rate="{covered / valid:.4f}">\n'
+                f'<packages>\n')
+        for i in range(num_files):
+            if i % 50 == 0:
+                if i:
+                    f.write('</classes></package>\n')
+                f.write(f'<package name="pkg{i // 50}"><classes>\n')
+            hits = [rng.random() < 0.8 for _ in range(lines_per_file)]
+            rate = sum(hits) / lines_per_file
+            f.write(f'<class name="mod{i}" filename="src/pkg{i // 50}/mod{i}.py" '
+                    f'line-rate="{rate:.4f}" branch-rate="0"><lines>\n')
+            for number, hit in enumerate(hits, 1):
+                f.write(f'<line number="{number}" hits="{int(hit)}"/>\n')
+            f.write('</lines></class>\n')
+        f.write('</classes></package>\n</packages>\n</coverage>\n')
+
+
+def generate_lcov(filepath: Path, num_files: int, lines_per_file: int,
+                  seed: int = 0) -> None:
+    """Write a synthetic LCOV report."""
+    rng = random.Random(seed)
+    with open(filepath, 'w') as f:
+        for i in range(num_files):
+            f.write(f'TN:\nSF:src/pkg{i // 50}/mod{i}.c\n')
+            f.write(f'FN:1,func{i}\nFNDA:1,func{i}\nFNF:1\nFNH:1\n')
+            hit = 0
+            for number in range(1, lines_per_file + 1):
+                count = rng.choice((0, 1, 1, 3, 12)) if rng.random() < 0.9 else 0
+                hit += count > 0
+                f.write(f'DA:{number},{count}\n')
+            f.write(f'LF:{lines_per_file}\nLH:{hit}\nend_of_record\n')
+
+
+def generate_coverage_py(filepath: Path, num_files: int, lines_per_file: int,
+                         seed: int = 0) -> None:
+    """Write a synthetic coverage.py JSON report."""
+    rng = random.Random(seed)
+    total_covered = 0
+    with open(filepath, 'w') as f:
+        f.write('{"meta": {"version": "7.4.0", "branch_coverage": false}, "files": {')
+        for i in range(num_files):
+            executed = []
+            missing = []
+            for number in range(1, lines_per_file + 1):
+                (executed if rng.random() < 0.8 else missing).append(number)
+            total_covered += len(executed)
+            entry = {
+                "executed_lines": executed,
+                "missing_lines": missing,
+                "summary": {
+                    "covered_lines": len(executed),
+                    "num_statements": lines_per_file,
+                    "percent_covered": len(executed) / lines_per_file * 100,
+                    "missing_lines": len(missing),
+                },
+            }
+            separator = ', ' if i else ''
+            f.write(f'{separator}"src/pkg{i // 50}/mod{i}.py": {json.dumps(entry)}')
+        totals = {"covered_lines": total_covered,
+                  "num_statements": num_files * lines_per_file}
+        f.write(f'}}, "totals": {json.dumps(totals)}}}\n')
+
+
+# Synthetic report generators and the parser modes benchmarked for each format.
+FORMATS = {
+    'lcov': ('LCOV', 'coverage.lcov', generate_lcov,
+             ('lcov-text', 'lcov-mmap', 'lcov-summary')),
+    'cobertura': ('Cobertura', 'coverage.xml', generate_cobertura,
+                  ('cobertura-tree', 'cobertura-stream', 'cobertura-summary')),
+    'coverage-py': ('coverage.py', 'coverage.json', generate_coverage_py,
+                    ('coverage-py', 'coverage-py-summary')),
+}
+
+
+def measure(mode: str, filepath: Path) -> Dict[str, Any]:
+    """Run a single analyzer pass in a child interpreter and collect its statistics."""
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', mode, str(filepath)],
+        check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout)
+
+
+def git_commit() -> Optional[str]:
+    """Return the commit of the analyzer being benchmarked, if known."""
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ANALYZER_PATH.parent,
+                                check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def peak_rss() -> int:
+    """Return the peak resident set size of this process so far, in bytes."""
+    # ru_maxrss is reported in KiB on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_child(mode: str, filepath: str) -> None:
+    """Run each analyzer phase once and print timings and peak RSS as JSON."""
+    analyzer = load_analyzer()
+    if mode == 'lcov-text':
+        report = analyzer.LcovReport()
+    elif mode == 'lcov-mmap':
+        report = analyzer.MmapLcovReport()
+    elif mode == 'lcov-summary':
+        report = analyzer.MmapLcovReport(summary_only=True)
+    elif mode == 'cobertura-tree':
+        report = analyzer.CoberturaReport(streaming=False)
+    elif mode == 'cobertura-stream':
+        report = analyzer.CoberturaReport(streaming=True)
+    elif mode == 'cobertura-summary':
+        report = analyzer.CoberturaReport(streaming=True, summary_only=True)
+    elif mode == 'coverage-py':
+        report = analyzer.CoveragePyReport()
+    elif mode == 'coverage-py-summary':
+        report = analyzer.CoveragePyReport(summary_only=True)
+    else:
+        raise ValueError(f"Unknown benchmark mode '{mode}'")
+
+    start = time.perf_counter()
+    report.parse(filepath)
+    elapsed = time.perf_counter() - start
+    # Nothing but the import ran before parsing, so this is the parse peak
+    parse_peak = peak_rss()
+    num_files = len(report.files)
+    num_lines = report.files.totals()[1]
+
+    steps = {
+        'filter': lambda: report.filter_files(FILTER_PATTERN),
+        'summary': report.get_summary,
+        'format_text': lambda: analyzer.format_text_output(report),
+        'format_json': lambda: analyzer.format_json_output(report),
+        'format_csv': lambda: analyzer.format_csv_output(report),
+    }
+    phases = {'parse': elapsed}
+    for phase in PHASES:
+        phase_start = time.perf_counter()
+        steps[phase]()
+        phases[phase] = time.perf_counter() - phase_start
+
+    print(json.dumps({
+        "mode": mode,
+        "seconds": elapsed,
+        "phases": phases,
+        "parse_peak_rss_bytes": parse_peak,
+        "peak_rss_bytes": peak_rss(),
+        "num_files": num_files,
+        "num_lines": num_lines,
+        "mb_per_second": Path(filepath).stat().st_size / (1024 * 1024) / elapsed,
+        "lines_per_second": num_lines / elapsed,
+    }))
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark the coverage-analyzer parsers'
+    )
+    parser.add_argument('--files', type=int, default=2000,
+                       help='Number of source files in the synthetic report (default: 2000)')
+    parser.add_argument('--lines', type=int, default=500,
+                       help='Number of lines per source file (default: 500)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Random seed for the synthetic reports (default: 0)')
+    parser.add_argument('--formats', type=str, default=','.join(FORMATS),
+                       help='Comma-separated report formats to benchmark '
+                            f"(default: {','.join(FORMATS)})")
+    parser.add_argument('--workdir', type=str, default=None,
+                       help='Directory for generated reports (default: temporary directory)')
+    parser.add_argument('--output', type=str, default=None,
+                       help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    formats = [name.strip() for name in args.formats.split(',') if name.strip()]
+    unknown = [name for name in formats if name not in FORMATS]
+    if unknown:
+        parser.error(f"Unknown format(s): {', '.join(unknown)}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = Path(args.workdir or tmpdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+
+        for name in formats:
+            label, filename, generate, modes = FORMATS[name]
+            report_path = workdir / filename
+            generate(report_path, args.files, args.lines, args.seed)
+            report_bytes = report_path.stat().st_size
+            print(f"{label} report: {args.files} files x {args.lines} lines "
+                  f"({report_bytes / (1024 * 1024):.1f} MB)")
+            print("")
+            print(f"{'Mode':<20} {'Parse':<9} {'Filter':<9} {'Summary':<9} {'Text':<9} "
+                  f"{'JSON':<9} {'CSV':<9} {'Parse RSS':<10} {'Peak RSS':<10} {'MB/s':<8}")
+            print("-" * 107)
+
+            for mode in modes:
+                stats = measure(mode, report_path)
+                stats.update(format=name, report_bytes=report_bytes)
+                results.append(stats)
+
+                timings = ' '.join(f"{stats['phases'][phase]:<9.3f}"
+                                   for phase in ('parse',) + PHASES)
+                parse_mb = stats['parse_peak_rss_bytes'] / (1024 * 1024)
+                rss_mb = stats['peak_rss_bytes'] / (1024 * 1024)
+                print(f"{mode:<20} {timings} {parse_mb:<10.1f} {rss_mb:<10.1f} "
+                      f"{stats['mb_per_second']:<8.1f}")
+            print("")
+
+    if args.output:
+        document = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {"files": args.files, "lines": args.lines, "seed": args.seed},
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
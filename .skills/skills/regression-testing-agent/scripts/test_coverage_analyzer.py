@@ -0,0 +1,1003 @@
+"""Tests for coverage-analyzer.py.
+
+Fast paths are checked against the straightforward ones they replace (the
+byte-level LCOV engine against the text engine, parallel, cached and
+spilled parses against serial in-memory ones), and the subcommands and
+modes against small hand-written reports.
+
+Run with: python -m pytest test_coverage_analyzer.py
+"""
+
+import bz2
+import gzip
+import importlib.util
+import io
+import json
+import lzma
+import os
+import random
+import re
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+ANALYZER_PATH = Path(__file__).with_name('coverage-analyzer.py')
+BENCHMARK_PATH = Path(__file__).with_name('coverage-benchmark.py')
+
+
+def load_analyzer():
+    """Import coverage-analyzer.py as a module despite the dash in its name."""
+    module = sys.modules.get('coverage_analyzer')
+    if module is None:
+        spec = importlib.util.spec_from_file_location('coverage_analyzer', ANALYZER_PATH)
+        module = importlib.util.module_from_spec(spec)
+        # Registered before running so that worker processes can unpickle tasks
+        sys.modules['coverage_analyzer'] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+def load_benchmark():
+    """Import coverage-benchmark.py for its synthetic report generators."""
+    spec = importlib.util.spec_from_file_location('coverage_benchmark', BENCHMARK_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+analyzer = load_analyzer()
+benchmark = load_benchmark()
+
+
+def write_lcov(filepath: Path, seed: int, num_files: int = 40, with_totals: bool = True) -> Path:
+    """Write an LCOV report exercising functions, branches and repeated records."""
+    rng = random.Random(seed)
+    with open(filepath, 'w') as f:
+        for record in range(num_files):
+            # Some files appear in more than one record, as with per-test tracefiles
+            number = record if record % 5 else record // 5
+            f.write(f'TN:test{record % 3}\nSF:src/pkg{number % 4}/mod{number}.c\n')
+            functions = rng.randint(0, 3)
+            for index in range(functions):
+                f.write(f'FN:{index + 1},func{number}_{index}\n')
+            for index in range(functions):
+                f.write(f'FNDA:{rng.choice((0, 1, 7))},func{number}_{index}\n')
+            f.write(f'FNF:{functions}\nFNH:{functions}\n')
+            found = hit = 0
+            for line in range(1, rng.randint(1, 200)):
+                if rng.random() < 0.3:
+                    continue
+                count = rng.choice((0, 0, 1, 4, 2 ** 33))
+                found += 1
+                hit += count > 0
+                checksum = ',abc' if line % 17 == 0 else ''
+                f.write(f'DA:{line},{count}{checksum}\n')
+                if line % 11 == 0:
+                    f.write(f'BRDA:{line},0,0,{rng.choice(("-", "0", "3"))}\n')
+            if with_totals:
+                f.write(f'LF:{found}\nLH:{hit}\n')
+            f.write('end_of_record\n')
+    return filepath
+
+
+def write_coverage_py(filepath: Path, seed: int, num_files: int = 30) -> Path:
+    """Write a coverage.py JSON report with summaries, line lists and contexts."""
+    rng = random.Random(seed)
+    files = {}
+    for number in range(num_files):
+        executed = sorted(rng.sample(range(1, 300), rng.randint(0, 120)))
+        missing = sorted(set(rng.sample(range(1, 300), 40)) - set(executed))
+        files[f'src/pkg{number % 3}/mod{number}.py'] = {
+            "executed_lines": executed,
+            "missing_lines": missing,
+            "contexts": {str(line): ["", f"test_{line % 4}|run"] for line in executed},
+            "summary": {
+                "covered_lines": len(executed),
+                "num_statements": len(executed) + len(missing),
+                "num_branches": 4,
+                "covered_branches": rng.randint(0, 4),
+            },
+        }
+    document = {"meta": {"version": "7.4.0"}, "files": files, "totals": {"covered_lines": 1}}
+    filepath.write_text(json.dumps(document))
+    return filepath
+
+
+def snapshot(files, with_hits: bool = True):
+    """Everything a FileTable holds, in order, as comparable values."""
+    rows = []
+    for filename, file_info in files.items():
+        line_hits = None
+        if with_hits and file_info.line_hits is not None:
+            line_hits = (bytes(file_info.line_hits.instrumented),
+                         file_info.line_hits.hits.tobytes())
+        rows.append((filename, file_info.line_coverage, file_info.branch_coverage,
+                     file_info.function_coverage, file_info.lines_covered,
+                     file_info.lines_total, line_hits,
+                     file_info.function_hits if with_hits else None))
+    return rows
+
+
+def parse(report, source):
+    report.parse(str(source))
+    return report.files
+
+
+def run_cli(*args, **kwargs) -> subprocess.CompletedProcess:
+    """Run coverage-analyzer.py with ``args`` and capture its output as text."""
+    return subprocess.run([sys.executable, str(ANALYZER_PATH), *map(str, args)],
+                          capture_output=True, text=True, **kwargs)
+
+
+def json_summary(*args) -> dict:
+    """Return the summary of a ``--output json`` run."""
+    result = run_cli(*args, '--output', 'json')
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout)['summary']
+
+
+@pytest.mark.parametrize('track_lines', [True, False])
+@pytest.mark.parametrize('summary_only', [False, True])
+@pytest.mark.parametrize('with_totals', [True, False])
+def test_mmap_engine_matches_text_engine(tmp_path, track_lines, summary_only, with_totals):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 1, with_totals=with_totals)
+    text = analyzer.LcovReport(track_lines, summary_only=summary_only)
+    mmap_report = analyzer.MmapLcovReport(track_lines, summary_only=summary_only)
+    assert snapshot(parse(mmap_report, report_path)) == snapshot(parse(text, report_path))
+    assert mmap_report.summary_fallbacks == text.summary_fallbacks
+
+
+def test_mmap_engine_matches_text_engine_on_streams(tmp_path):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 2)
+    expected = snapshot(parse(analyzer.LcovReport(), report_path))
+    report = analyzer.MmapLcovReport()
+    with open(report_path, 'rb') as stream:
+        report.parse(stream)
+    assert snapshot(report.files) == expected
+
+
+def test_mmap_engine_reads_padded_and_crlf_lines(tmp_path):
+    report_path = tmp_path / 'coverage.lcov'
+    report_path.write_bytes(b'SF:src/a.c\r\n  DA:1,3\r\nDA:2,0\r\nDA:3,0,abc\r\n'
+                            b'DA:4, 12\r\nLF:3\r\nLH:2\r\nend_of_record\r\n')
+    expected = snapshot(parse(analyzer.LcovReport(), report_path))
+    assert snapshot(parse(analyzer.MmapLcovReport(), report_path)) == expected
+    assert expected[0][4:6] == (2, 3)
+
+
+@pytest.mark.parametrize('track_lines', [True, False])
+def test_cobertura_stream_matches_tree(tmp_path, track_lines):
+    report_path = tmp_path / 'coverage.xml'
+    benchmark.generate_cobertura(report_path, 120, 40, seed=1)
+    tree = analyzer.CoberturaReport(streaming=False, track_lines=track_lines)
+    stream = analyzer.CoberturaReport(streaming=True, track_lines=track_lines)
+    assert len(parse(stream, report_path)) == 120
+    assert snapshot(stream.files) == snapshot(parse(tree, report_path))
+
+
+def test_cobertura_stream_skips_unwanted_classes(tmp_path):
+    report_path = tmp_path / 'coverage.xml'
+    benchmark.generate_cobertura(report_path, 120, 40, seed=2)
+    wanted = analyzer.PathMatcher(include=['src/pkg1/**'])
+    stream = parse(analyzer.CoberturaReport(path_filter=wanted), report_path)
+    tree = parse(analyzer.CoberturaReport(streaming=False), report_path)
+    assert list(stream) == [name for name in tree if name.startswith('src/pkg1/')]
+    assert snapshot(stream) == [row for row in snapshot(tree) if wanted(row[0])]
+
+
+@pytest.mark.parametrize('streaming', [True, False])
+def test_cobertura_summary_uses_line_rates(tmp_path, streaming):
+    report_path = tmp_path / 'coverage.xml'
+    benchmark.generate_cobertura(report_path, 60, 40, seed=3)
+    expected = parse(analyzer.CoberturaReport(streaming=streaming), report_path)
+    report = analyzer.CoberturaReport(streaming=streaming, summary_only=True)
+    assert snapshot(parse(report, report_path), with_hits=False) == \
+        snapshot(expected, with_hits=False)
+    assert report.summary_fallbacks == 0
+    assert all(file_info.line_hits is None for file_info in report.files.values())
+
+    # Without totals on the root the line-rates are not trusted
+    xml = report_path.read_text()
+    report_path.write_text(re.sub(r'<coverage [^>]*>', '<coverage version="1">', xml))
+    report = analyzer.CoberturaReport(streaming=streaming, summary_only=True)
+    assert snapshot(parse(report, report_path)) == snapshot(expected)
+    assert report.summary_fallbacks == 60
+
+    # Totals on a class are taken as they are
+    report_path.write_text(xml.replace('<class name="mod0" ',
+                                       '<class lines-valid="7" lines-covered="5" name="mod0" '))
+    report = analyzer.CoberturaReport(streaming=streaming, summary_only=True)
+    assert parse(report, report_path)['src/pkg0/mod0.py'].lines_total == 7
+    assert report.files['src/pkg0/mod0.py'].lines_covered == 5
+
+
+def test_lcov_summary_trusts_totals_wherever_they_are(tmp_path):
+    report_path = tmp_path / 'coverage.lcov'
+    report_path.write_text('SF:src/a.c\nDA:1,1\nLF:5\nLH:4\nDA:2,0\nDA:3,1\nend_of_record\n'
+                           'SF:src/b.c\nDA:1,1\nDA:2,0\nLF:2\nend_of_record\n')
+    for report in (analyzer.LcovReport(summary_only=True),
+                   analyzer.MmapLcovReport(summary_only=True)):
+        files = parse(report, report_path)
+        assert (files['src/a.c'].lines_covered, files['src/a.c'].lines_total) == (4, 5)
+        # b.c has no LH, so its line data is counted after all
+        assert (files['src/b.c'].lines_covered, files['src/b.c'].lines_total) == (1, 2)
+        assert report.summary_fallbacks == 1
+
+
+def test_benchmark_reports_the_parse_peak_separately(tmp_path):
+    report_path = tmp_path / 'coverage.xml'
+    benchmark.generate_cobertura(report_path, 20, 10)
+    stats = benchmark.measure('cobertura-stream', report_path)
+    assert stats['num_files'] == 20
+    assert 0 < stats['parse_peak_rss_bytes'] <= stats['peak_rss_bytes']
+    assert set(stats['phases']) == {'parse', *benchmark.PHASES}
+
+
+@pytest.fixture
+def lcov_files(tmp_path):
+    return [write_lcov(tmp_path / f'report{seed}.lcov', seed) for seed in range(3)]
+
+
+@pytest.mark.parametrize('num_chunks', [2, 3, 7, 50])
+def test_lcov_chunks_parse_like_the_whole_file(tmp_path, num_chunks):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 4, num_files=60)
+    chunks = analyzer.split_lcov_chunks(str(report_path), num_chunks, min_chunk_size=1)
+    size = report_path.stat().st_size
+    assert chunks[0][0] == 0 and chunks[-1][1] == size
+    assert all(end == start for (_, end), (start, _) in zip(chunks, chunks[1:]))
+    data = report_path.read_bytes()
+    assert all(data[:end].endswith(b'end_of_record\n') for _, end in chunks)
+
+    merged = analyzer.CoverageReport()
+    for start, end in chunks:
+        chunk = analyzer.MmapLcovReport()
+        chunk.parse_range(str(report_path), start, end)
+        merged.merge(chunk.files)
+    assert snapshot(merged.files) == snapshot(parse(analyzer.MmapLcovReport(), report_path))
+
+
+def test_parallel_parse_matches_serial(lcov_files):
+    serial = analyzer.CoverageReport()
+    serial.parse_many([str(path) for path in lcov_files], jobs=1)
+    parallel = analyzer.CoverageReport()
+    parallel.parse_many([str(path) for path in lcov_files], jobs=3)
+    assert snapshot(parallel.files) == snapshot(serial.files)
+
+
+def test_sharded_file_parse_matches_serial(tmp_path, monkeypatch):
+    report_path = str(write_lcov(tmp_path / 'coverage.lcov', 5, num_files=80))
+    serial = analyzer.CoverageReport()
+    serial.parse_many([report_path], jobs=1)
+
+    split = analyzer.split_lcov_chunks
+    monkeypatch.setattr(analyzer, 'split_lcov_chunks',
+                        lambda filepath, num_chunks: split(filepath, num_chunks, 1))
+    sharded = analyzer.CoverageReport()
+    sharded.parse_many([report_path], jobs=4)
+    assert snapshot(sharded.files) == snapshot(serial.files)
+
+
+def test_line_hits_merge_is_a_union():
+    rng = random.Random(5)
+    for _ in range(50):
+        maps = [{rng.randint(0, 80): rng.choice((0, 1, 3, 2 ** 31)) for _ in range(30)}
+                for _ in range(2)]
+        hits = []
+        for lines in maps:
+            line_hits = analyzer.LineHits()
+            for line, count in lines.items():
+                line_hits.add(line, count)
+            hits.append(line_hits.trim())
+        merged = hits[0].merge(hits[1])
+
+        expected = dict(maps[0])
+        for line, count in maps[1].items():
+            expected[line] = min(expected.get(line, 0) + count, analyzer.MAX_HIT_COUNT)
+        assert merged.lines_total == len(expected)
+        assert merged.lines_covered == sum(1 for count in expected.values() if count)
+        assert {line: merged.hits[line] for line in range(len(merged))
+                if merged.instrumented[line]} == expected
+
+
+def test_repeated_records_are_unioned_within_one_report(tmp_path):
+    report_path = tmp_path / 'coverage.lcov'
+    report_path.write_text('SF:src/a.c\nDA:1,1\nDA:2,0\nend_of_record\n'
+                           'SF:src/a.c\nDA:1,0\nDA:2,3\nDA:3,0\nend_of_record\n')
+    summary = json_summary(report_path)
+    assert (summary['lines_covered'], summary['lines_total']) == (2, 3)
+
+
+def test_empty_report_does_not_change_coverage(tmp_path):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 1)
+    empty = tmp_path / 'empty.lcov'
+    empty.write_text('')
+    assert json_summary(report_path, empty) == json_summary(report_path)
+
+
+def test_cached_parse_matches_uncached(tmp_path, lcov_files):
+    inputs = [str(path) for path in lcov_files]
+    uncached = analyzer.CoverageReport()
+    uncached.parse_many(inputs, jobs=1)
+
+    cache = analyzer.ReportCache(str(tmp_path / 'cache'))
+    for _ in range(2):
+        cached = analyzer.CoverageReport()
+        cached.parse_many(inputs, jobs=1, cache=cache)
+        assert snapshot(cached.files) == snapshot(uncached.files)
+    assert len(list((tmp_path / 'cache').glob('*.cov'))) == len(inputs)
+
+
+def test_cache_format_round_trips(lcov_files):
+    files = parse(analyzer.MmapLcovReport(), lcov_files[0])
+    decoded = analyzer.ReportCache._decode(analyzer.ReportCache._encode(files))
+    assert snapshot(decoded) == snapshot(files)
+
+
+def test_cache_misses_after_the_report_changes(tmp_path):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 1)
+    for content_hash in (False, True):
+        cache = analyzer.ReportCache(str(tmp_path / f'cache{content_hash}'),
+                                     content_hash=content_hash)
+        key = cache.key(str(report_path), 'lcov', True)
+        cache.store(key, parse(analyzer.MmapLcovReport(), report_path))
+        assert cache.load(key) is not None
+        assert cache.key(str(report_path), 'lcov', False) != key
+        assert cache.key(str(report_path), 'lcov', True, summary_only=True) != key
+
+    write_lcov(report_path, 2)
+    assert analyzer.ReportCache(str(tmp_path / 'cacheTrue'), content_hash=True).key(
+        str(report_path), 'lcov', True) != key
+
+
+def test_corrupt_cache_entry_is_dropped(tmp_path):
+    cache = analyzer.ReportCache(str(tmp_path))
+    files = parse(analyzer.MmapLcovReport(), write_lcov(tmp_path / 'coverage.lcov', 1))
+    cache.store('entry', files)
+    entry = tmp_path / 'entry.cov'
+    entry.write_bytes(entry.read_bytes()[:40])
+    assert cache.load('entry') is None
+    assert not entry.exists()
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    files = parse(analyzer.MmapLcovReport(), write_lcov(tmp_path / 'coverage.lcov', 1))
+    size = len(analyzer.ReportCache._encode(files))
+    cache = analyzer.ReportCache(str(tmp_path / 'cache'), max_bytes=2 * size)
+    for index, key in enumerate(('first', 'second', 'third')):
+        cache.store(key, files)
+        os.utime(tmp_path / 'cache' / f'{key}.cov', ns=(index, index))
+        cache.evict()
+    assert sorted(path.stem for path in (tmp_path / 'cache').glob('*.cov')) == ['second', 'third']
+
+
+PATCH = '''diff --git a/src/a.c b/src/a.c
+index 1111111..2222222 100644
+--- a/src/a.c
++++ b/src/a.c
+@@ -1,3 +1,4 @@
+ int a;
++int b;
+ int c;
+-int d;
++int e;
+@@ -10,2 +11,3 @@
+ x
++y
+ z
+--- a/src/gone.c
++++ /dev/null
+@@ -1 +0,0 @@
+-gone
+'''
+
+DIFF_LCOV = ('SF:/ci/build/src/a.c\nDA:1,1\nDA:2,0\nDA:3,4\nDA:4,1\nDA:12,0\nend_of_record\n'
+             'SF:/ci/build/src/b.c\nDA:1,1\nend_of_record\n')
+
+
+def test_diff_index_reads_added_lines():
+    diff = analyzer.DiffIndex.from_patch(PATCH.splitlines(True))
+    assert diff.changed_lines == {'src/a.c': {2, 4, 12}}
+    assert diff.lookup('/ci/build/src/a.c') == {2, 4, 12}
+    assert diff.lookup('./src/a.c') == {2, 4, 12}
+    assert diff.lookup('other/a.c.bak') is None
+    assert 'src/b.c' not in diff
+
+
+def test_diff_mode_scores_only_changed_lines(tmp_path):
+    report_path = tmp_path / 'coverage.lcov'
+    report_path.write_text(DIFF_LCOV)
+    patch_path = tmp_path / 'change.patch'
+    patch_path.write_text(PATCH)
+    for engine in ('text', 'mmap'):
+        result = run_cli(report_path, '--diff', patch_path, '--lcov-engine', engine,
+                         '--output', 'json')
+        assert result.returncode == 0, result.stderr
+        document = json.loads(result.stdout)
+        assert [entry['filename'] for entry in document['files']] == ['/ci/build/src/a.c']
+        assert (document['summary']['lines_covered'], document['summary']['lines_total']) == (1, 3)
+
+    result = run_cli(report_path, '--diff', '-', '--output', 'json', input=PATCH)
+    assert json.loads(result.stdout)['summary']['lines_total'] == 3
+
+
+def walk(reader):
+    """Rebuild a JSON value through iter_keys() and read_value()."""
+    if reader.peek() == '{':
+        return {key: walk(reader) for key in reader.iter_keys()}
+    return reader.read_value()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 16, 61, 4096])
+def test_json_stream_reader_matches_json_loads(tmp_path, chunk_size):
+    document = write_coverage_py(tmp_path / 'coverage.json', 6).read_text()
+    reader = analyzer.JsonStreamReader(io.StringIO(document), chunk_size)
+    assert walk(reader) == json.loads(document)
+    assert reader.peek() == ''
+
+    reader = analyzer.JsonStreamReader(io.StringIO(document), chunk_size)
+    keys = []
+    for key in reader.iter_keys():
+        keys.append(key)
+        reader.skip_value()
+    assert keys == list(json.loads(document))
+    assert reader.peek() == ''
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 64, 4096])
+@pytest.mark.parametrize('track_lines', [True, False])
+def test_coverage_py_stream_matches_json_loads(tmp_path, chunk_size, track_lines):
+    report_path = write_coverage_py(tmp_path / 'coverage.json', 7)
+    report = analyzer.CoveragePyReport(track_lines)
+    reader = analyzer.JsonStreamReader(io.StringIO(report_path.read_text()), chunk_size)
+    streamed = analyzer.FileTable()
+    for file_info in report._iter_document(reader):
+        streamed[file_info.filename] = file_info
+
+    expected = analyzer.FileTable()
+    for filename, file_data in json.loads(report_path.read_text())['files'].items():
+        expected[filename] = report._build_entry(filename, file_data)
+    assert snapshot(streamed) == snapshot(expected)
+
+
+def test_coverage_py_report_skips_unwanted_members(tmp_path):
+    report_path = write_coverage_py(tmp_path / 'coverage.json', 8)
+    document = json.loads(report_path.read_text())
+    report = analyzer.CoveragePyReport(summary_only=True)
+    files = parse(report, report_path)
+    assert list(files) == list(document['files'])
+    assert all(file_info.line_hits is None for file_info in files.values())
+
+    contexts = dict(analyzer.CoveragePyReport().iter_contexts(str(report_path)))
+    assert contexts == {name: entry['contexts'] for name, entry in document['files'].items()
+                        if entry['contexts']}
+
+
+@pytest.mark.parametrize('compress, suffix', [
+    (gzip.compress, '.gz'), (bz2.compress, '.bz2'), (lzma.compress, '.xz'),
+])
+def test_compressed_reports_parse_like_plain_ones(tmp_path, compress, suffix):
+    plain = write_lcov(tmp_path / 'coverage.lcov', 1)
+    cobertura = tmp_path / 'coverage.xml'
+    benchmark.generate_cobertura(cobertura, 30, 20)
+    for report_path in (plain, cobertura, write_coverage_py(tmp_path / 'coverage.json', 1)):
+        packed = tmp_path / ('packed' + suffix)
+        packed.write_bytes(compress(report_path.read_bytes()))
+        fmt = analyzer.detect_format(str(packed))
+        assert fmt == analyzer.detect_format(str(report_path))
+        expected = parse(analyzer.create_report(fmt), report_path)
+        for engine in ('text', 'mmap'):
+            assert snapshot(parse(analyzer.create_report(fmt, engine), packed)) == snapshot(expected)
+
+
+def test_stdin_report_matches_file(tmp_path):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 3)
+    expected = json_summary(report_path)
+    for data in (report_path.read_bytes(), gzip.compress(report_path.read_bytes())):
+        result = run_cli('-', '--output', 'json', input=data.decode('latin-1'),
+                         encoding='latin-1')
+        assert result.returncode == 0, result.stderr
+        assert json.loads(result.stdout)['summary'] == expected
+
+
+def test_profile_reports_phases_and_counts(tmp_path):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 1)
+    profile_path = tmp_path / 'profile.json'
+    stats_path = tmp_path / 'profile.stats'
+    result = run_cli(report_path, '--profile', profile_path, '--profile-stats', stats_path,
+                     '--output', 'json', '--output', 'csv')
+    assert result.returncode == 0, result.stderr
+    profile = json.loads(profile_path.read_text())
+    assert {'expand', 'detect', 'parse', 'output'} <= set(profile['phases'])
+    assert profile['phases']['output']['calls'] == 2
+    assert profile['counts']['reports'] == 1
+    assert profile['counts']['files_parsed'] == len(parse(analyzer.LcovReport(), report_path))
+    assert all(phase['wall_seconds'] >= 0 for phase in profile['phases'].values())
+    assert stats_path.stat().st_size > 0
+
+    phases = []
+    profiler = analyzer.Profiler(enabled=False)
+    with profiler.phase('parse'):
+        phases.append('ran')
+    assert phases == ['ran'] and profiler.stop()['phases'] == {}
+
+
+def test_several_outputs_match_single_runs(tmp_path):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 2)
+    outputs = {name: tmp_path / f'report.{name}' for name in ('text', 'json', 'csv')}
+    result = run_cli(report_path, *[arg for name, path in outputs.items()
+                                    for arg in ('--output', f'{name}={path}')])
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == ''
+    for name, path in outputs.items():
+        single = run_cli(report_path, '--output', name)
+        assert path.read_text() == single.stdout
+
+    json.loads(outputs['json'].read_text())
+    rows = outputs['csv'].read_text().splitlines()
+    assert len(rows) == 1 + len(parse(analyzer.LcovReport(), report_path))
+
+
+def test_streamed_output_matches_formatters(tmp_path):
+    report = analyzer.CoverageReport()
+    report.parse_many([str(write_lcov(tmp_path / 'coverage.lcov', 3))], jobs=1)
+    renderer = analyzer.ReportRenderer(report)
+    for name, formatter in (('text', analyzer.format_text_output),
+                            ('json', analyzer.format_json_output),
+                            ('csv', analyzer.format_csv_output)):
+        out = io.StringIO()
+        renderer.write(out, name)
+        assert out.getvalue() == formatter(report)
+        if name == 'json':
+            assert out.getvalue() == json.dumps(json.loads(out.getvalue()), indent=2)
+
+
+def test_file_table_behaves_like_a_dict():
+    rng = random.Random(10)
+    table = analyzer.FileTable()
+    model = {}
+    for step in range(300):
+        name = f'src/mod{rng.randint(0, 40)}.c'
+        if rng.random() < 0.2 and name in model:
+            del table[name]
+            del model[name]
+            continue
+        total = rng.randint(0, 50)
+        covered = rng.randint(0, total)
+        line_hits = None
+        if rng.random() < 0.5:
+            line_hits = analyzer.LineHits()
+            line_hits.add(step % 7, covered)
+        entry = analyzer.FileCoverage(
+            filename=name, line_coverage=covered / total * 100 if total else 0.0,
+            branch_coverage=rng.choice((None, 50.0)), function_coverage=rng.choice((None, 25.0)),
+            lines_covered=covered, lines_total=total, line_hits=line_hits,
+            function_hits=rng.choice((None, {'f': step})))
+        table[name] = entry
+        model[name] = entry
+    assert list(table) == list(model)
+    assert [table[name] for name in table] == list(model.values())
+    assert table.totals() == (sum(entry.lines_covered for entry in model.values()),
+                              sum(entry.lines_total for entry in model.values()))
+
+    names = list(model)
+    assert [names[index] for index in table.order('file')] == sorted(names)
+    assert [names[index] for index in table.order('lines')] == sorted(
+        names, key=lambda name: model[name].lines_total, reverse=True)
+    assert [names[index] for index in table.order('coverage')] == sorted(
+        names, key=lambda name: model[name].line_coverage)
+
+    table.remove(names[::2])
+    assert list(table) == names[1::2]
+    assert [table[name] for name in table] == [model[name] for name in names[1::2]]
+
+
+def settle(watcher):
+    """Poll twice, so that reports unchanged since the first poll are applied."""
+    return watcher.poll() + watcher.poll()
+
+
+def merged(paths):
+    report = analyzer.CoverageReport()
+    report.parse_many([str(path) for path in paths], jobs=1)
+    return snapshot(report.files)
+
+
+def test_watcher_follows_new_changed_and_removed_reports(tmp_path):
+    shards = tmp_path / 'shards'
+    shards.mkdir()
+    first = write_lcov(shards / 'a.lcov', 1)
+    watcher = analyzer.CoverageWatcher([str(shards)], jobs=1)
+    assert watcher.poll() == []
+    assert watcher.poll() == [str(first)]
+    assert snapshot(watcher.report.files) == merged([first])
+
+    second = write_lcov(shards / 'b.lcov', 2)
+    assert settle(watcher) == [str(second)]
+    assert snapshot(watcher.report.files) == merged([first, second])
+
+    write_lcov(first, 3, num_files=20)
+    assert settle(watcher) == [str(first)]
+    # Entries of a changed report are merged again in place, so only the order differs
+    assert sorted(snapshot(watcher.report.files)) == sorted(merged([first, second]))
+
+    second.unlink()
+    assert watcher.poll() == [str(second)]
+    assert snapshot(watcher.report.files) == merged([first])
+    assert watcher.summary()['num_reports'] == 1
+
+
+
+def test_watcher_retries_a_failing_report_then_waits_for_a_change(tmp_path, capsys):
+    shards = tmp_path / 'shards'
+    shards.mkdir()
+    broken = shards / 'a.lcov'
+    broken.write_text('SF:src/a.c\nDA:1,many\nend_of_record\n')
+    watcher = analyzer.CoverageWatcher([str(shards)], jobs=1)
+    assert watcher.poll() == []
+    for _ in range(analyzer.WATCH_PARSE_ATTEMPTS):
+        assert watcher.poll() == []
+    assert capsys.readouterr().err.count('Error parsing coverage report') == \
+        analyzer.WATCH_PARSE_ATTEMPTS
+    assert watcher.poll() == []
+    assert capsys.readouterr().err == ''
+
+    broken.write_text('SF:src/a.c\nDA:1,1\nDA:2,0\nend_of_record\n')
+    assert settle(watcher) == [str(broken)]
+    assert watcher.summary()['lines_covered'] == 1
+
+
+def test_watch_server_serves_report_and_summary(tmp_path):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 4)
+    watcher = analyzer.CoverageWatcher([str(report_path)], jobs=1)
+    settle(watcher)
+    server = analyzer.serve_watcher(watcher, '127.0.0.1:0')
+    try:
+        base = 'http://127.0.0.1:%d' % server.server_address[1]
+        with urllib.request.urlopen(base + '/summary') as response:
+            summary = json.load(response)
+        assert summary['num_reports'] == 1 and summary['version'] == 1
+        with urllib.request.urlopen(base + '/coverage.json') as response:
+            assert response.read().decode('utf-8') == watcher.render('json')
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(base + '/missing')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def write_hits(filepath: Path, files) -> Path:
+    """Write an LCOV report from ``{filename: [hit count per line]}``."""
+    with open(filepath, 'w') as f:
+        for filename, counts in files.items():
+            f.write(f'SF:{filename}\n')
+            f.writelines(f'DA:{line},{count}\n' for line, count in enumerate(counts, 1))
+            f.write('end_of_record\n')
+    return filepath
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-05-01T12:00:00', '2024-05-01T12:00:00+00:00'),
+    ('2024-05-01T14:00:00+02:00', '2024-05-01T12:00:00+00:00'),
+    ('2024-05-01T12:00:00.250Z', '2024-05-01T12:00:00+00:00'),
+    ('2024-05-01', '2024-05-01T00:00:00+00:00'),
+])
+def test_build_times_are_stored_in_utc(value, expected):
+    assert analyzer.utc_timestamp(value) == expected
+
+
+def test_invalid_build_time_is_rejected(tmp_path):
+    report_path = write_hits(tmp_path / 'coverage.lcov', {'src/a.c': [1]})
+    result = run_cli(report_path, '--db', tmp_path / 'coverage.db', '--build-time', 'yesterday')
+    assert result.returncode == 2
+    assert "invalid ISO 8601 time 'yesterday'" in result.stderr
+    assert not (tmp_path / 'coverage.db').exists()
+
+
+def test_database_queries_follow_build_time(tmp_path):
+    db_path = tmp_path / 'coverage.db'
+    builds = [
+        # Ingested out of order, with mixed offsets: b1 is 11:30 UTC
+        ('b2', '2024-05-01T12:00:00', {'src/pay/a.c': [1, 1], 'src/ui/b.c': [1, 0]}),
+        ('b3', '2024-05-01T12:30:00Z', {'src/pay/a.c': [1, 0], 'src/ui/b.c': [1, 1]}),
+        ('b1', '2024-05-01T13:30:00+02:00', {'src/pay/a.c': [0, 0], 'src/ui/b.c': [0, 0]}),
+    ]
+    for build_id, build_time, files in builds:
+        report_path = write_hits(tmp_path / f'{build_id}.lcov', files)
+        result = run_cli(report_path, '--db', db_path, '--build-id', build_id,
+                         '--build-time', build_time, '--output', 'json')
+        assert result.returncode == 0, result.stderr
+
+    def query(*args):
+        result = run_cli('query', '--db', db_path, '--output', 'json', *args)
+        assert result.returncode == 0, result.stderr
+        return json.loads(result.stdout)
+
+    trend = query('trend')
+    assert [row['build_id'] for row in trend] == ['b1', 'b2', 'b3']
+    assert [row['coverage'] for row in trend] == [0.0, 75.0, 75.0]
+    assert [row['lines_covered'] for row in query('trend', '--path', 'src/pay/**')] == [0, 2, 1]
+    assert [row['build_id'] for row in query('trend', '--last', '2')] == ['b2', 'b3']
+
+    regressions = query('regressions')
+    assert [(row['filename'], row['base_build'], row['head_build'], row['delta'])
+            for row in regressions] == [('src/pay/a.c', 'b2', 'b3', -50.0)]
+
+    rollup = query('rollup', '--depth', '2')
+    assert {row['directory']: row['lines_covered'] for row in rollup} == \
+        {'src': 3, 'src/pay': 1, 'src/ui': 2}
+
+
+def test_directory_rollups_aggregate_every_level():
+    tree = analyzer.DirectoryTree()
+    for filename, covered, total in (('src/pay/a.c', 1, 2), ('src/pay/api/b.c', 3, 4),
+                                     ('src/ui/c.c', 0, 2), ('/abs/x/d.c', 1, 1),
+                                     ('top.c', 1, 1)):
+        tree.add(filename, covered, total)
+    options = analyzer.RollupOptions(thresholds={'src/pay': 90.0}, default_threshold=50.0)
+    assert [tuple(rollup) for rollup in tree.rollups(options)] == [
+        ('/abs', 1, 1, 1, 1, 50.0), ('/abs/x', 2, 1, 1, 1, 50.0),
+        ('src', 1, 4, 8, 3, 50.0), ('src/pay', 2, 4, 6, 2, 90.0),
+        ('src/pay/api', 3, 3, 4, 1, 90.0), ('src/ui', 2, 0, 2, 1, 50.0),
+    ]
+    assert [rollup.directory for rollup in tree.rollups(analyzer.RollupOptions(depth=1))] == \
+        ['/abs', 'src']
+    assert tree.root[:3] == [6, 10, 5]
+
+
+def test_directory_rollups_match_grouping_the_files(tmp_path):
+    files = parse(analyzer.LcovReport(), write_lcov(tmp_path / 'coverage.lcov', 6))
+    expected = {}
+    for filename, file_info in files.items():
+        parts = filename.split('/')[:-1]
+        for depth in range(1, len(parts) + 1):
+            totals = expected.setdefault('/'.join(parts[:depth]), [0, 0, 0])
+            totals[0] += file_info.lines_covered
+            totals[1] += file_info.lines_total
+            totals[2] += 1
+    rollups = analyzer.DirectoryTree.from_files(files).rollups()
+    assert {rollup.directory: [rollup.lines_covered, rollup.lines_total, rollup.num_files]
+            for rollup in rollups} == expected
+
+
+def test_rollup_options_reach_every_output(tmp_path):
+    report_path = write_hits(tmp_path / 'coverage.lcov', {'src/pay/a.c': [1, 0],
+                                                          'src/ui/b.c': [1, 1]})
+    result = run_cli(report_path, '--rollup-depth', '2', '--directory-threshold', 'src/ui=90',
+                     '--threshold', '40', '--output', 'json')
+    directories = json.loads(result.stdout)['directories']
+    assert [(row['directory'], row['threshold'], row['below_threshold'])
+            for row in directories] == [('src', 40, False), ('src/pay', 40, False),
+                                        ('src/ui', 90, False)]
+    assert 'Directory Coverage:' in run_cli(report_path, '--rollup-depth', '1').stdout
+
+
+@pytest.mark.parametrize('pattern, path, wanted', [
+    ('src/**', 'src/a.c', True), ('src/**', 'src/x/y.c', True),
+    ('src/**', '/ci/src/a.c', True), ('src/**', 'srcx/a.c', False),
+    ('*.py', 'x/a.py', True), ('tests/*.py', 'tests/a.py', True),
+    ('tests/*.py', 'tests/x/a.py', False), ('**/test_*.py', 'test_a.py', True),
+    ('**/test_*.py', 'x/y/test_a.py', True), ('mod[0-3].c', 'src/mod2.c', True),
+    ('mod[0-3].c', 'src/mod5.c', False), ('mod[!0-3].c', 'src/mod5.c', True),
+    ('mod?.c', 'mod12.c', False), ('re:^src/pkg[12]/', 'src/pkg1/a.c', True),
+    ('re:^src/pkg[12]/', 'x/src/pkg1/a.c', False),
+])
+def test_include_patterns(pattern, path, wanted):
+    assert analyzer.PathMatcher(include=[pattern])(path) is wanted
+    assert analyzer.PathMatcher(exclude=[pattern])(path) is not wanted
+
+
+def test_include_and_exclude_combine():
+    matcher = analyzer.PathMatcher(include=['src/**', 'lib/*.c'], exclude=['**/vendor/**'],
+                                   also=lambda path: not path.endswith('_gen.c'))
+    assert [path for path in ('src/a.c', 'lib/b.c', 'lib/x/c.c', 'src/vendor/d.c',
+                              'src/e_gen.c', 'docs/f.c') if matcher(path)] == \
+        ['src/a.c', 'lib/b.c']
+
+
+
+
+
+def test_cli_filters_match_filtering_afterwards(tmp_path):
+    report_path = write_lcov(tmp_path / 'coverage.lcov', 7)
+    everything = run_cli(report_path, '--output', 'json')
+    files = json.loads(everything.stdout)['files']
+    for engine in ('text', 'mmap'):
+        result = run_cli(report_path, '--lcov-engine', engine, '--include', 'src/pkg1/**',
+                         '--include', 'src/pkg2/**', '--exclude', 'mod1*.c',
+                         '--exclude-pattern', 'mod2\\d', '--output', 'json')
+        assert result.returncode == 0, result.stderr
+        expected = [entry for entry in files
+                    if entry['filename'].startswith(('src/pkg1/', 'src/pkg2/'))
+                    and not re.search(r'/mod1[^/]*\.c$|mod2\d', entry['filename'])]
+        assert expected and json.loads(result.stdout)['files'] == expected
+
+
+@pytest.mark.parametrize('test_ids', [[0], [3, 900], list(range(0, 200, 3)), [7, 8, 9, 4000]])
+def test_test_sets_round_trip(test_ids):
+    blob = analyzer._encode_test_set(test_ids)
+    # Whichever of the array and the bitset is smaller is stored
+    array_size, bitset_size = len(test_ids) * 4, test_ids[-1] // 8 + 1
+    assert blob == (b'A' if array_size < bitset_size else b'B') + blob[1:]
+    assert len(blob) - 1 == min(array_size, bitset_size)
+    assert analyzer._bitset_ids(analyzer._decode_test_set(blob)) == test_ids
+
+
+def expected_tests(report_path: Path, filename: str, lines) -> list:
+    """The tests whose contexts cover any of ``lines`` of ``filename``."""
+    contexts = json.loads(report_path.read_text())['files'][filename]['contexts']
+    return sorted({label.split('|')[0] for line in lines
+                   for label in contexts.get(str(line), []) if label})
+
+
+def test_test_index_selects_tests_of_changed_lines(tmp_path):
+    report_path = write_coverage_py(tmp_path / 'coverage.json', 5)
+    index = analyzer.TestIndex(str(tmp_path / 'tests.db'))
+    try:
+        counts = index.build([str(report_path)])
+        files = json.loads(report_path.read_text())['files']
+        assert counts['files'] == sum(1 for entry in files.values() if entry['contexts'])
+        assert counts['tests'] == 4
+        # Rebuilding replaces the index instead of adding to it
+        assert index.build([str(report_path)]) == counts
+
+        for filename, lines in (('src/pkg1/mod4.py', {5, 6, 7}),
+                                ('src/pkg2/mod8.py', set(range(1, 300))),
+                                ('src/pkg0/mod3.py', {1000})):
+            # Diff paths only need to share a suffix with the indexed paths
+            diff = analyzer.DiffIndex({'repo/' + filename: lines})
+            assert index.select(diff) == expected_tests(report_path, filename, lines)
+    finally:
+        index.close()
+
+
+@pytest.mark.parametrize('spec, expected', [
+    ('src/app.py:10', ('src/app.py', {10})),
+    ('src/app.py:10,14-16', ('src/app.py', {10, 14, 15, 16})),
+    ('C:/src/app.py:3', ('C:/src/app.py', {3})),
+])
+def test_parse_line_spec(spec, expected):
+    assert analyzer.parse_line_spec(spec) == expected
+
+
+@pytest.mark.parametrize('spec', ['src/app.py', ':10', 'src/app.py:ten', 'src/app.py:1-x'])
+def test_parse_line_spec_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        analyzer.parse_line_spec(spec)
+
+
+def test_index_cli(tmp_path):
+    report_path = write_coverage_py(tmp_path / 'coverage.json', 6)
+    index_path = tmp_path / 'tests.db'
+    result = run_cli('index', 'build', '--index', index_path, report_path)
+    assert result.returncode == 0, result.stderr
+    assert re.match(r'Indexed \d+ files, 4 tests \(\d+ distinct test sets', result.stdout)
+
+    patch = tmp_path / 'change.patch'
+    patch.write_text('--- a/src/pkg0/mod0.py\n+++ b/src/pkg0/mod0.py\n@@ -1,0 +1,300 @@\n'
+                     + '+x\n' * 300)
+    result = run_cli('index', 'select', '--index', index_path, '--diff', patch,
+                     'src/pkg1/mod1.py:1-299', '--output', 'json')
+    assert result.returncode == 0, result.stderr
+    expected = sorted(set(expected_tests(report_path, 'src/pkg0/mod0.py', range(1, 301)))
+                      | set(expected_tests(report_path, 'src/pkg1/mod1.py', range(1, 300))))
+    assert json.loads(result.stdout) == {"tests": expected}
+
+    assert run_cli('index', 'select', '--index', index_path).returncode == 2
+    assert run_cli('index', 'select', '--index', index_path, 'app.py').returncode == 1
+    assert run_cli('index', 'select', '--index', tmp_path / 'missing.db',
+                   'app.py:1').returncode == 1
+
+
+@pytest.mark.parametrize('budget', [1, 2000, 50000, 10 ** 9])
+def test_memory_budget_matches_in_memory_merge(lcov_files, budget):
+    inputs = [str(path) for path in lcov_files] * 2
+    in_memory = analyzer.CoverageReport()
+    in_memory.parse_many(inputs, jobs=1)
+
+    spilled = analyzer.CoverageReport()
+    spilled.parse_many(inputs, jobs=1, memory_budget=budget)
+    assert snapshot(spilled.files, with_hits=False) == snapshot(in_memory.files, with_hits=False)
+
+    kept = analyzer.CoverageReport()
+    kept.parse_many(inputs, jobs=1, memory_budget=budget, keep_line_hits=True)
+    assert snapshot(kept.files) == snapshot(in_memory.files)
+
+
+def test_spilling_merge_writes_runs_beyond_the_budget(lcov_files):
+    merge = analyzer.SpillingMerge(2000)
+    for path in lcov_files:
+        merge.merge(parse(analyzer.LcovReport(), path))
+    assert len(merge.runs) > 1
+    files = merge.finish()
+    expected = analyzer.CoverageReport()
+    expected.parse_many([str(path) for path in lcov_files], jobs=1)
+    assert snapshot(files, with_hits=False) == snapshot(expected.files, with_hits=False)
+    assert all(file_info.line_hits is None for file_info in files.values())
+
+
+@pytest.mark.parametrize('value, size', [
+    ('512', 512), ('4K', 4096), ('1.5m', 1536 * 1024), ('2GB', 2 * 1024 ** 3),
+])
+def test_parse_size(value, size):
+    assert analyzer.parse_size(value) == size
+
+
+def test_memory_budget_cli(tmp_path, lcov_files):
+    expected = json_summary(*lcov_files)
+    assert json_summary(*lcov_files, '--memory-budget', '1K', '--jobs', '2') == expected
+    result = run_cli(*lcov_files, '--memory-budget', '0')
+    assert result.returncode == 2 and 'size must be positive' in result.stderr
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('src/old/a.py', 'src/new/a.py'),
+    ('./src/old/deep/b.py', 'src/new/deep/b.py'),
+    ('src\\old\\a.py', 'src/new/a.py'),
+    ('src/old/special.py', 'lib/special.py'),
+    ('src/older/a.py', 'src/older/a.py'),
+    ('/ci/work/src/x.py', 'src/x.py'),
+])
+def test_path_map(path, expected):
+    path_map = analyzer.PathMap([('src/old/', 'src/new'), ('src/old/special.py', 'lib/special.py'),
+                                 ('/ci/work', '')])
+    assert path_map(path) == expected
+
+
+def write_compare_reports(tmp_path):
+    """Base and head LCOV reports with a renamed, a dropped, a removed and an added file."""
+    base = tmp_path / 'base.lcov'
+    base.write_text('SF:/ci/work/src/old.c\nDA:1,1\nDA:2,1\nend_of_record\n'
+                    'SF:/ci/work/src/b.c\nDA:1,1\nDA:2,1\nDA:3,1\nDA:4,1\nend_of_record\n'
+                    'SF:/ci/work/src/gone.c\nDA:1,1\nend_of_record\n')
+    head = tmp_path / 'head.lcov'
+    head.write_text('SF:src/new.c\nDA:1,1\nDA:2,1\nend_of_record\n'
+                    'SF:src/b.c\nDA:1,1\nDA:2,0\nDA:3,1\nDA:4,1\nend_of_record\n'
+                    'SF:src/added.c\nDA:1,0\nend_of_record\n')
+    return base, head
+
+
+def test_compare_joins_mapped_paths(tmp_path):
+    base, head = write_compare_reports(tmp_path)
+    result = run_cli('compare', '--base', base, '--head', head, '--path-map', '/ci/work=',
+                     '--path-map', '/ci/work/src/old.c=src/new.c', '--output', 'json', '--max-drop', '30')
+    assert result.returncode == 0, result.stderr
+    document = json.loads(result.stdout)
+    statuses = {entry['filename']: (entry['status'], entry['change'])
+                for entry in document['files']}
+    assert statuses == {'src/new.c': ('unchanged', 0.0), 'src/b.c': ('changed', -25.0),
+                        'src/added.c': ('added', None), '/ci/work/src/gone.c': ('removed', None)}
+    assert document['violations'] == [] and not document['summary']['failed']
+
+    result = run_cli('compare', '--base', base, '--head', head, '--path-map', '/ci/work=',
+                     '--max-drop', '20')
+    assert result.returncode == 1
+    assert '1 file(s) lost more than 20.0 pp of coverage' in result.stdout
+
+
+def test_compare_fail_fast_stops_at_the_first_drop(tmp_path):
+    base, head = write_compare_reports(tmp_path)
+    result = run_cli('compare', '--base', base, '--head', head, '--path-map', '/ci/work=',
+                     '--max-drop', '20', '--fail-fast')
+    assert result.returncode == 1
+    assert 'Coverage of src/b.c dropped by 25.00 pp (100.00% -> 75.00%)' in result.stderr
+    assert result.stdout == ''
+    assert run_cli('compare', '--base', base, '--head', head, '--fail-fast').returncode == 2
+
+
+def test_compare_fail_fast_waits_for_every_record_of_a_file(tmp_path):
+    # Each record of a.c covers half of it; together they cover all of it
+    report_path = tmp_path / 'coverage.lcov'
+    report_path.write_text('SF:src/a.c\nDA:1,1\nDA:2,0\nend_of_record\n'
+                           'SF:src/a.c\nDA:1,0\nDA:2,1\nend_of_record\n'
+                           'SF:src/b.c\nDA:1,1\nend_of_record\n')
+    for engine in ('mmap', 'text'):
+        result = run_cli('compare', '--base', report_path, '--head', report_path,
+                         '--max-drop', '0', '--fail-fast', '--lcov-engine', engine,
+                         '--output', 'json')
+        assert result.returncode == 0, result.stderr
+        summary = json.loads(result.stdout)['summary']
+        assert summary['head_coverage'] == summary['base_coverage'] == 100.0